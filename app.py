@@ -1,9 +1,12 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 from openai import OpenAI
 import sys
 import pkg_resources
 import requests
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlparse
+from collections import deque
 from apscheduler.schedulers.background import BackgroundScheduler
 import time
 import os
@@ -13,12 +16,27 @@ import os
 import google.generativeai as genai
 import random
 import json
-from psycopg2 import pool
+from psycopg2 import pool, extras
 import redis
 from datetime import datetime, timedelta
 from isodate import parse_duration
 from datetime import datetime, timedelta, timezone
 import isodate
+from prometheus_client import Counter as MetricCounter, Histogram, CollectorRegistry, REGISTRY, generate_latest, multiprocess, CONTENT_TYPE_LATEST
+import zlib
+import html
+import hashlib
+import unicodedata
+import atexit
+import functools
+import socket
+from collections import Counter
+import threading
+import queue
+from zoneinfo import ZoneInfo
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from captions import caption_format, iter_caption_segments
 
 
 #-------------------------------------------------- Configurations -------------------------------------------------
@@ -29,7 +47,78 @@ client = OpenAI()
 
 DATABASE_URL = os.getenv("YOUTUBE_STATISTICS_DB_URL")
 
-connection_pool = pool.SimpleConnectionPool(
+# Prometheus metrics. Under gunicorn, PROMETHEUS_MULTIPROC_DIR (set in gunicorn.conf.py) makes
+# every worker write its samples to shared files that /metrics merges
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80, 160)
+
+SUMMARIZE_STAGE_SECONDS = Histogram(
+    "summarize_stage_seconds", "Time spent in each /summarize stage", ["stage"], buckets=STAGE_BUCKETS)
+TRANSCRIPT_PROVIDER_SECONDS = Histogram(
+    "transcript_provider_seconds", "Transcript provider call latency", ["provider"], buckets=STAGE_BUCKETS)
+TRANSCRIPT_PROVIDER_CALLS = MetricCounter(
+    "transcript_provider_calls_total", "Transcript provider calls by outcome (success, failure, quota)", ["provider", "outcome"])
+LLM_CALLS = MetricCounter(
+    "llm_calls_total", "LLM calls by purpose and outcome", ["call", "outcome"])
+# One result per lookup: hit, negative_hit, db_hit (read through from Postgres) or miss (nowhere)
+SUMMARY_CACHE_LOOKUPS = MetricCounter(
+    "summary_cache_lookups_total", "Summary cache lookups by result", ["result"])
+POPULAR_VIDEOS_SECONDS = Histogram(
+    "popular_videos_seconds", "/popular_videos latency by cache result", ["result"], buckets=STAGE_BUCKETS)
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_seconds", "Time spent waiting for a free connection in the Postgres pool",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5))
+DB_POOL_TIMEOUTS = MetricCounter(
+    "db_pool_timeouts_total", "Postgres pool checkouts that gave up waiting for a free connection")
+SCHEDULER_JOB_SECONDS = Histogram(
+    "scheduler_job_seconds", "Scheduled job duration by outcome", ["job", "outcome"], buckets=STAGE_BUCKETS)
+LLM_TOKENS = MetricCounter(
+    "llm_tokens_total", "LLM tokens by purpose and kind (prompt, output)", ["call", "kind"])
+FAQ_CACHE_LOOKUPS = MetricCounter(
+    "faq_cache_lookups_total", "FAQ question cache lookups by result", ["result"])
+SUMMARY_OUTCOMES = MetricCounter(
+    "summary_outcomes_total", "Structured summaries by result (complete, repaired, failed)", ["outcome"])
+SUMMARY_REPAIRS = MetricCounter(
+    "summary_repairs_total", "Single-section summary repairs by section and outcome", ["section", "outcome"])
+PRESUMMARIZE_RUNS = MetricCounter(
+    "presummarize_runs_total", "Background pre-summarization attempts by outcome", ["outcome"])
+SUMMARY_JOBS = MetricCounter(
+    "summary_jobs_total", "Queued summary jobs by outcome (queued, deduplicated, done, failed, retried)", ["outcome"])
+TRANSCRIPT_TOKENS = Histogram(
+    "transcript_tokens", "Estimated transcript tokens as fetched (raw), normalized, and sent after the budget", ["stage"],
+    buckets=(500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000))
+
+class InstrumentedConnectionPool(pool.ThreadedConnectionPool):
+    """
+    ThreadedConnectionPool whose checkouts wait up to DB_POOL_CHECKOUT_TIMEOUT for a free
+    connection (the base class raises PoolError at once) and record how long they waited.
+    """
+
+    def __init__(self, minconn, maxconn, *args, **kwargs):
+        super().__init__(minconn, maxconn, *args, **kwargs)
+        self._available = threading.Semaphore(maxconn)
+
+    def getconn(self, key=None):
+        start = time.perf_counter()
+        acquired = self._available.acquire(timeout=DB_POOL_CHECKOUT_TIMEOUT)
+        DB_POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - start)
+        if not acquired:
+            DB_POOL_TIMEOUTS.inc()
+            raise pool.PoolError(f"No free connection within {DB_POOL_CHECKOUT_TIMEOUT}s")
+        try:
+            return super().getconn(key)
+        except Exception:
+            self._available.release()
+            raise
+
+    def putconn(self, conn=None, key=None, close=False):
+        try:
+            super().putconn(conn, key, close)
+        finally:
+            self._available.release()
+
+# Threaded pool: pipeline stages touch the DB from worker threads
+DB_POOL_CHECKOUT_TIMEOUT = float(os.getenv("DB_POOL_CHECKOUT_TIMEOUT", "5"))
+connection_pool = InstrumentedConnectionPool(
     minconn=1,
     maxconn=10,
     dsn=DATABASE_URL
@@ -37,6 +126,8 @@ connection_pool = pool.SimpleConnectionPool(
 
 redis_url = os.getenv("REDIS_URL")
 redis_client = redis.from_url(redis_url, decode_responses=True)
+# Raw bytes client for compressed values
+redis_binary_client = redis.from_url(redis_url)
 
 #stuff for trending videos
 youtube_data_key = os.getenv("youtube_data_api_key")
@@ -88,6 +179,11 @@ youtube_channels_data = [
 ]
 
 TOP_X = 5
+YOUTUBE_SEARCH_WORKERS = 4
+YOUTUBE_DETAILS_BATCH_SIZE = 50      # max IDs videos.list accepts per call
+YOUTUBE_SEARCH_COST = 100            # quota units
+YOUTUBE_VIDEOS_COST = 1
+TRENDING_UPSERT_PAGE_SIZE = 1000     # rows per multi-row upsert statement
 MIN_DURATION_SECONDS = 240
 MAX_DURATION_SECONDS = 2670
 
@@ -109,6 +205,53 @@ model = genai.GenerativeModel(
   generation_config=generation_config,
 )
 
+# Structured summaries: gemini_summary asks for JSON constrained to this schema, and a section that
+# comes back missing or malformed is re-requested on its own with a section-only schema
+SUMMARY_SECTION_SCHEMAS = {
+    "description": {"type": "STRING"},
+    "key_points": {
+        "type": "ARRAY",
+        "items": {
+            "type": "OBJECT",
+            "properties": {"heading": {"type": "STRING"}, "explanation": {"type": "STRING"}},
+            "required": ["heading", "explanation"],
+        },
+    },
+    "faqs": {
+        "type": "ARRAY",
+        "items": {
+            "type": "OBJECT",
+            "properties": {"question": {"type": "STRING"}, "answer": {"type": "STRING"}},
+            "required": ["question", "answer"],
+        },
+    },
+}
+# "two_pass" generates the viewer questions from the title first and then answers them in the summary
+# call; "single_pass" has the summary call write and answer the questions itself (one model call).
+# Selectable per request with "mode"; the streaming route always uses two_pass, since it sends the
+# questions before the summary.
+SUMMARY_MODES = ("two_pass", "single_pass")
+SUMMARY_MODE = os.getenv("SUMMARY_MODE", "two_pass")
+SINGLE_PASS_FAQ_INSTRUCTION = (
+    "faqs: the 3 questions a typical viewer would most likely have about the video's content from its title, "
+    "*before* watching it, most important first and ideally tying into the title, each with a concise answer "
+    "based *only* on the transcript."
+)
+SUMMARY_JSON_SECTIONS = ("description", "key_points", "faqs")
+SUMMARY_SECTION_INSTRUCTIONS = {
+    "description": "description: a description of the video in roughly 4 detailed sentences.",
+    "key_points": "key_points: the key points from the transcript, each with a short heading and a 4-5 line "
+                  "explanation offering detailed context and examples as needed.",
+    "faqs": "faqs: one entry per question, in the order given, with the question and a concise answer based "
+            "*only* on the transcript. If you're not sure, do your best to provide a response for the user.",
+}
+# Section repairs don't resend the transcript: each gets its instruction, the sections that did come
+# back, and at most REPAIR_TRANSCRIPT_TOKENS of transcript (the passages sharing the most words with
+# the questions for FAQs, evenly spaced passages otherwise). A description is rebuilt from the key
+# points alone when they came back.
+REPAIR_TRANSCRIPT_TOKENS = int(os.getenv("REPAIR_TRANSCRIPT_TOKENS", "8000"))
+REPAIR_PASSAGE_TOKENS = 250
+
 errors_messages = [
             "Our little AI tried its best... then took a nap. Please try again 💤",
             "Whoops! The summary went on a snack break and forgot to come back 🍪",
@@ -136,6 +279,350 @@ cache = {
 }
 CACHE_TTL = 8640
 
+# Summarize pipeline: independent stages run concurrently on this pool
+pipeline_executor = ThreadPoolExecutor(max_workers=int(os.getenv("PIPELINE_MAX_WORKERS", "16")))
+
+# Seconds each stage may run before the whole request is abandoned
+STAGE_TIMEOUTS = {
+    "metadata": 15,
+    "faqs": 30,
+    "transcript": 45,
+    "summary": 120,
+}
+DEFAULT_STAGE_TIMEOUT = 60
+
+# Single-flight: concurrent cache misses for one video share a single pipeline run across workers
+SINGLE_FLIGHT_LOCK_TTL = 15          # seconds; the leader renews it while working
+SINGLE_FLIGHT_RENEW_INTERVAL = 5
+# How long a waiter waits on the leader before doing the work itself: longer than the slowest run
+# the stage timeouts allow (metadata, then the slower of FAQs and transcript, then the summary)
+SINGLE_FLIGHT_WAIT = (
+    STAGE_TIMEOUTS["metadata"] + max(STAGE_TIMEOUTS["faqs"], STAGE_TIMEOUTS["transcript"])
+    + STAGE_TIMEOUTS["summary"] + SINGLE_FLIGHT_LOCK_TTL
+)
+SINGLE_FLIGHT_RESULT_TTL = 30
+
+# Only delete/extend a lock if we still own it
+release_lock_script = redis_client.register_script("""
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+""")
+renew_lock_script = redis_client.register_script("""
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+""")
+# Takes the leader lease if it's free and only then bumps the fencing counter; returns the new
+# token, or nil when another process holds the lease
+acquire_leadership_script = redis_client.register_script("""
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return nil
+end
+local token = redis.call('INCR', KEYS[2])
+redis.call('SET', KEYS[1], ARGV[1] .. ':' .. token, 'EX', ARGV[2])
+return token
+""")
+
+# Transcript providers: rolling health stats shared through Redis drive a hedged race
+transcript_executor = ThreadPoolExecutor(max_workers=int(os.getenv("TRANSCRIPT_MAX_WORKERS", "16")))
+PROVIDER_STATS_WINDOW = 50           # samples kept per provider
+PROVIDER_MIN_SUCCESS_RATE = 0.5      # below this a provider is treated as degraded
+HEDGE_DEFAULT_DELAY = 3.0            # seconds, used until a provider has latency samples
+HEDGE_MIN_DELAY = 0.5
+HEDGE_MAX_DELAY = 10.0
+TRANSCRIPT_RACE_TIMEOUT = 40
+
+# Summary cache: DB hits are written back to Redis, and "not in DB" is remembered briefly
+SUMMARY_CACHE_TTL = 3600
+SUMMARY_CACHE_JITTER = 600           # spreads expiries so read-through entries don't all lapse together
+SUMMARY_NEGATIVE_TTL = 60
+SUMMARY_CACHE_COUNTERS = ["hit", "negative_hit", "miss", "db_hit"]
+
+# Popular videos' summaries live under a generation prefix (cache:summary:v<gen>:<video_id>); the
+# refresh job fills a new generation and flips this pointer atomically, old generations just expire.
+# Read-through and pre-summarized entries (cache:summary:rt:<video_id>) and negative entries don't
+# belong to a generation, so a flip doesn't drop them; lookups try the generation first
+SUMMARY_GENERATION_KEY = "cache:summary:generation"
+SUMMARY_GENERATION_COUNTER_KEY = "cache:summary:generation_counter"
+
+# Readers re-read the generation pointer at most this often. One that is a few seconds behind a
+# flip still reads the previous generation, whose entries stay until they expire
+SUMMARY_GENERATION_CACHE_SECONDS = 5
+summary_generation = {"value": None, "fetched_at": 0.0}
+
+# Publishes a generation: the popular pages and the generation pointer, but only if ARGV[1] is
+# still the latest fencing token, so a leader that lost its lease mid-refresh can't overwrite the
+# new leader's generation. KEYS: fencing counter, pages list, first page, generation pointer.
+# ARGV: fencing token, generation, pages TTL, then one JSON page per element.
+publish_generation_script = redis_client.register_script("""
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[2])
+if #ARGV > 3 then
+    redis.call('RPUSH', KEYS[2], unpack(ARGV, 4))
+    redis.call('EXPIRE', KEYS[2], ARGV[3])
+    redis.call('SET', KEYS[3], ARGV[4], 'EX', 3600)
+end
+redis.call('SET', KEYS[4], ARGV[2])
+return 1
+""")
+
+# One round trip: look up the summary or its negative entry and bump the matching counter.
+# KEYS: summary key, negative key, hit/negative_hit/miss counters. Returns {status[, summary]}
+summary_cache_lookup_script = redis_client.register_script("""
+local cached = redis.call('GET', KEYS[1]) or redis.call('GET', KEYS[6])
+if cached then
+    redis.call('INCR', KEYS[3])
+    return {1, cached}
+end
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    redis.call('INCR', KEYS[4])
+    return {2}
+end
+redis.call('INCR', KEYS[5])
+return {0}
+""")
+
+# Write-behind: /log_status and /increment_count append to a Redis stream and a scheduled
+# flusher batches them into Postgres. Entries are only acked after the DB commit, so a crashed
+# flusher's batch stays pending and is reclaimed by the next flush.
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "false").lower() == "true"
+WRITE_BEHIND_FLUSH_SIZE = int(os.getenv("WRITE_BEHIND_FLUSH_SIZE", "500"))
+WRITE_BEHIND_FLUSH_INTERVAL = int(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "10"))  # seconds
+WRITE_BEHIND_CLAIM_IDLE_MS = 60000   # pending this long means its flusher died
+WRITE_BEHIND_STREAM = "writebehind:events"
+WRITE_BEHIND_GROUP = "writebehind-flushers"
+WRITE_BEHIND_CONSUMER = f"{socket.gethostname()}-{os.getpid()}"
+
+# Map-reduce summarization: transcripts over TRANSCRIPT_TOKEN_BUDGET are split at sentence
+# boundaries into at most SUMMARY_MAX_CHUNKS chunks of at least SUMMARY_CHUNK_TOKENS, condensed
+# concurrently, and the notes feed the normal summary prompt. Everything within the budget is one
+# call, which is faster than a map plus a reduce round trip. Only what's left past
+# TRANSCRIPT_MAX_TOKENS (a full set of chunks) is cut.
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "100000"))
+SUMMARY_MAX_CHUNKS = int(os.getenv("SUMMARY_MAX_CHUNKS", "8"))
+TRANSCRIPT_MAX_TOKENS = SUMMARY_CHUNK_TOKENS * SUMMARY_MAX_CHUNKS
+CHARS_PER_TOKEN = 4                  # rough estimate for English text
+summary_map_executor = ThreadPoolExecutor(max_workers=int(os.getenv("SUMMARY_MAP_WORKERS", "4")))
+
+# Outbound HTTP: one session, a keep-alive pool per upstream host, (connect, read) timeouts
+# and GET retries tuned per host. Retries happen in http_get rather than the adapter so each
+# attempt is charged to the budget. Transcript providers don't retry; the hedged race covers them.
+# "budget" is the upstream's cost model, enforced across workers by acquire_budget(): a per-second
+# token bucket (one token per request) plus daily/monthly unit caps. Keep the caps in line with
+# the subscribed plans. max_wait is how long a caller may block on the rate limit before failing.
+UPSTREAMS = {
+    "youtube.googleapis.com": {
+        "timeout": (3.05, 10), "retries": 2,
+        "budget": {"per_second": 10, "burst": 10, "daily": 10000, "monthly": None, "max_wait": 5},
+    },
+    "yt-api.p.rapidapi.com": {
+        "timeout": (3.05, 10), "retries": 2,
+        "budget": {"per_second": 5, "burst": 10, "daily": None, "monthly": 15000, "max_wait": 2},
+    },
+    "www.youtube.com": {"timeout": (3.05, 15), "retries": 2},
+    "youtube-transcripts.p.rapidapi.com": {
+        "timeout": (3.05, 20), "retries": 0,
+        "budget": {"per_second": 5, "burst": 5, "daily": None, "monthly": 10000, "max_wait": 0},
+    },
+    "youtube-transcript3.p.rapidapi.com": {
+        "timeout": (3.05, 20), "retries": 0,
+        "budget": {"per_second": 5, "burst": 5, "daily": None, "monthly": 10000, "max_wait": 0},
+    },
+    "youtube-transcripts-api.p.rapidapi.com": {"timeout": (3.05, 20), "retries": 0},
+    "youtubetextconverter.p.rapidapi.com": {"timeout": (3.05, 20), "retries": 0},
+    "renderbackend-xfh6.onrender.com": {"timeout": (3.05, 30), "retries": 1},
+}
+DEFAULT_UPSTREAM = {"timeout": (3.05, 15), "retries": 1}
+HTTP_POOL_SIZE = 20
+HTTP_RETRY_BACKOFF = 0.5             # seconds, doubled per attempt
+HTTP_RETRY_STATUSES = {429, 500, 502, 503, 504}
+# YouTube Data API quota resets at midnight Pacific time, so daily budgets count Pacific days
+QUOTA_DAY_TIMEZONE = ZoneInfo("America/Los_Angeles")
+HTTP_STATS_WINDOW = 200
+
+def make_http_adapter():
+    return HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE, max_retries=0)
+
+http_session = requests.Session()
+http_session.mount("https://", make_http_adapter())
+for host in UPSTREAMS:
+    http_session.mount(f"https://{host}/", make_http_adapter())
+
+http_stats = {}
+http_stats_lock = threading.Lock()
+
+# Token bucket + unit caps in one atomic step. Returns {1} when granted, {0, wait_ms} when
+# rate limited, {-1, window} when a daily/monthly cap would be exceeded
+acquire_budget_script = redis_client.register_script("""
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local now_ms = tonumber(ARGV[4])
+local daily_limit = tonumber(ARGV[5])
+local monthly_limit = tonumber(ARGV[6])
+
+if daily_limit > 0 and tonumber(redis.call('GET', KEYS[2]) or '0') + cost > daily_limit then
+    return {-1, 'daily'}
+end
+if monthly_limit > 0 and tonumber(redis.call('GET', KEYS[3]) or '0') + cost > monthly_limit then
+    return {-1, 'monthly'}
+end
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now_ms
+tokens = math.min(burst, tokens + math.max(0, now_ms - ts) * rate / 1000)
+if tokens < 1 then
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now_ms)
+    return {0, math.ceil((1 - tokens) * 1000 / rate)}
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens - 1), 'ts', now_ms)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst * 1000 / rate) + 1000)
+redis.call('INCRBY', KEYS[2], cost)
+redis.call('EXPIRE', KEYS[2], 2 * 86400)
+redis.call('INCRBY', KEYS[3], cost)
+redis.call('EXPIRE', KEYS[3], 32 * 86400)
+return {1}
+""")
+
+# Transcript store: compressed in Redis, durable in Postgres
+TRANSCRIPT_LANGUAGE = "en"
+TRANSCRIPT_CACHE_TTL = 7 * 24 * 3600
+
+# Transcript normalization: caption artifacts are stripped before anything reaches an LLM.
+# TRANSCRIPT_TOKEN_BUDGET is the most sent to a summary call in one piece; longer transcripts are
+# condensed first (see SUMMARY_CHUNK_TOKENS)
+TRANSCRIPT_TOKEN_BUDGET = int(os.getenv("TRANSCRIPT_TOKEN_BUDGET", "120000"))
+CAPTION_OVERLAP_WINDOW = 20          # words of already-kept text compared against each new segment
+CAPTION_MIN_OVERLAP = 2              # shorter overlaps are treated as coincidence ("the the")
+NON_SPEECH_PATTERN = re.compile(
+    r"\[[^\]]*\]"                                         # [Music], [Applause], [inaudible]
+    r"|\((?:music|applause|laughter|laughs|laughing|inaudible|silence|cheering|crosstalk)[^)]*\)"
+    r"|[♪♫]+"
+    r"|^\s*(?:>>|-)\s*",                                  # speaker change markers
+    re.IGNORECASE
+)
+# <font>, <c>, <i> styling tags are stripped before unescaping, so escaped speech ("&lt;3") survives.
+# Double-escaped captions only turn their tags into markup on unescape; those known tags go after.
+CAPTION_TAG_PATTERN = re.compile(r"<[^>]+>")
+CAPTION_ESCAPED_TAG_PATTERN = re.compile(r"</?(?:font|c|i|b|u|v|span)(?:[\s.][^>]*)?>", re.IGNORECASE)
+FILLER_PATTERN = re.compile(r"\b(?:um+|uh+|erm|hmm+)\b[,.]?\s*", re.IGNORECASE)
+
+# FAQ questions only depend on the title, so they're cached by a hash of the normalized title:
+# Redis in front of the faq_questions table. Trending titles are precomputed on ingest.
+FAQ_CACHE_TTL = 30 * 24 * 3600
+FAQ_PRECOMPUTE_WORKERS = 4
+
+# Scheduler leader election: every process runs the scheduler, but jobs only do work in the
+# process holding the Redis lease. The lease is renewed by a heartbeat; if the leader dies another
+# process takes over within LEADER_LEASE_TTL + LEADER_HEARTBEAT_INTERVAL seconds. Each acquired
+# lease carries a fencing token from a counter that only moves on acquire, so the counter always
+# holds the current leader's token; the cache generation flip checks it (publish_generation_script).
+# Job schedules live in Redis, not in the process: every LEADER_JOB_CHECK_INTERVAL the leader runs
+# any job whose last success is older than its interval, so a new leader picks up overdue jobs at once.
+# A running job holds a LEADER_JOB_CLAIM_TTL claim, renewed while it runs, so a run that died with
+# its leader is retried within seconds; a failed run is retried after LEADER_JOB_RETRY_DELAY.
+LEADER_KEY = "scheduler:leader"
+LEADER_FENCING_KEY = "scheduler:fencing"
+LEADER_LEASE_TTL = 10
+LEADER_HEARTBEAT_INTERVAL = 3
+LEADER_JOB_CHECK_INTERVAL = 30
+LEADER_JOB_CLAIM_TTL = 15
+LEADER_JOB_RETRY_DELAY = 5 * 60
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+leader_lease = None                  # "<worker id>:<fencing token>" while this process leads
+
+# Background pre-summarization: newly inserted trending videos are queued on a Redis stream and
+# the scheduler leader summarizes them (PRESUMMARIZE_CONCURRENCY at a time, at most
+# PRESUMMARIZE_DAILY_LIMIT per UTC day), so the videos the homepage promotes are already cached.
+# A batch that hits an upstream quota stays pending and is reclaimed on a later run.
+PRESUMMARIZE_ENABLED = os.getenv("PRESUMMARIZE_ENABLED", "true").lower() == "true"
+PRESUMMARIZE_CONCURRENCY = int(os.getenv("PRESUMMARIZE_CONCURRENCY", "2"))
+PRESUMMARIZE_DAILY_LIMIT = int(os.getenv("PRESUMMARIZE_DAILY_LIMIT", "200"))
+PRESUMMARIZE_BATCH_SIZE = PRESUMMARIZE_CONCURRENCY * 4
+PRESUMMARIZE_INTERVAL = 60           # seconds
+PRESUMMARIZE_CLAIM_IDLE_MS = 15 * 60 * 1000
+PRESUMMARIZE_STREAM = "presummarize:queue"
+PRESUMMARIZE_GROUP = "presummarizers"
+presummarize_executor = ThreadPoolExecutor(max_workers=PRESUMMARIZE_CONCURRENCY)
+
+# Job-queue mode: POST /summarize with async=true queues a job on a Redis stream and returns its
+# id; worker.py processes the queue (SUMMARY_JOB_CONCURRENCY jobs per process) and clients poll
+# GET /jobs/<id> or follow /jobs/<id>/events. One job per video and mode is queued or running at a time.
+SUMMARY_JOB_STREAM = "summarize:jobs"
+SUMMARY_JOB_GROUP = "summarize-workers"
+SUMMARY_JOB_CONCURRENCY = int(os.getenv("SUMMARY_JOB_CONCURRENCY", "4"))
+SUMMARY_JOB_TTL = 24 * 3600          # how long a job's status and result stay readable
+SUMMARY_JOB_CLAIM_IDLE_MS = 10 * 60 * 1000   # well past the longest pipeline run
+SUMMARY_JOB_MAX_ATTEMPTS = 3
+SUMMARY_JOB_RETRY_BACKOFF = 30      # seconds before a retry, doubled for each attempt
+SUMMARY_JOB_DELAYED_KEY = "summarize:jobs:delayed"   # retries waiting out their backoff, scored by due time
+SUMMARY_JOB_EVENTS_TIMEOUT = 300     # seconds an events stream stays open
+# On the Flask route a follower holds a sync worker, so its stream closes sooner; EventSource
+# clients reconnect after SUMMARY_JOB_EVENTS_RETRY_MS and pick up the current status
+SUMMARY_JOB_SYNC_EVENTS_TIMEOUT = int(os.getenv("SUMMARY_JOB_SYNC_EVENTS_TIMEOUT", "20"))
+SUMMARY_JOB_EVENTS_RETRY_MS = 1000
+
+# Queue a job unless one is already active for the video. KEYS[4] is the hash of the job the caller
+# read as active (ARGV[6], '' for none); if the active job changed since, returns {-1, ''} and the
+# caller reads it again. Otherwise returns {created, job id}
+enqueue_summary_job_script = redis_client.register_script("""
+local existing = redis.call('GET', KEYS[1])
+if (existing or '') ~= ARGV[6] then
+    return {-1, ''}
+end
+if existing and redis.call('EXISTS', KEYS[4]) == 1 then
+    return {0, existing}
+end
+redis.call('HSET', KEYS[2], 'job_id', ARGV[1], 'video_id', ARGV[2], 'mode', ARGV[3],
+    'status', 'queued', 'stages_done', '', 'attempts', 0, 'created_at', ARGV[4], 'updated_at', ARGV[4])
+redis.call('EXPIRE', KEYS[2], ARGV[5])
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[5])
+redis.call('XADD', KEYS[3], '*', 'job_id', ARGV[1], 'video_id', ARGV[2], 'mode', ARGV[3])
+return {1, ARGV[1]}
+""")
+
+# Move retries whose backoff is over (score <= ARGV[1]) back onto the stream, at most ARGV[2]
+requeue_summary_jobs_script = redis_client.register_script("""
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, member in ipairs(due) do
+    local job = cjson.decode(member)
+    redis.call('XADD', KEYS[2], '*', 'job_id', job.job_id, 'video_id', job.video_id, 'mode', job.mode)
+    redis.call('ZREM', KEYS[1], member)
+end
+return #due
+""")
+
+# Scheduled jobs run in the web processes; worker.py turns them off
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
+
+# Popular videos: a candidate pool kept in Redis (a sorted set of recent videos per channel,
+# scored by publish time) is updated as trending rows are written. The refresh job turns it into
+# POPULAR_PAGE_COUNT pre-shuffled, channel-diverse pages, so serving one is a single LINDEX.
+POPULAR_WINDOW_DAYS = 30
+POPULAR_PAGE_SIZE = 8
+POPULAR_PAGE_COUNT = 20
+POPULAR_PAGES_TTL = 2 * 3600
+POPULAR_CHANNELS_KEY = "popular:channels"
+POPULAR_TITLES_KEY = "popular:titles"
+POPULAR_PAGES_KEY = "cache:popular_videos:pages"
+
+class QuotaExceededError(requests.exceptions.RequestException):
+    """An upstream's rate limit or daily/monthly budget won't allow the call.
+
+    Subclasses RequestException so call sites that already treat a failed request as
+    "try something else" (the transcript race) route around an exhausted provider.
+    """
+
+class StageTimeoutError(Exception):
+    """A pipeline stage did not finish within its timeout."""
+
 #------------------------------------------------- Python Functions -------------------------------------------------
 
 #100 units per search (expensive)
@@ -151,7 +638,7 @@ def get_top_videos(channel_id, max_results=3):
         'type': 'video',
         'key': youtube_data_key
     }
-    response = requests.get(url, params=params)
+    response = http_get(url, cost=YOUTUBE_SEARCH_COST, params=params)
     response.raise_for_status()
     data = response.json()
 
@@ -169,7 +656,7 @@ def get_video_details(video_ids):
         'id': ','.join(video_ids),
         'key': youtube_data_key
     }
-    response = requests.get(url, params=params)
+    response = http_get(url, cost=YOUTUBE_VIDEOS_COST, params=params)
     response.raise_for_status()
     data = response.json()
 
@@ -194,54 +681,130 @@ def get_video_details(video_ids):
     return results
 
 def parse_duration(iso_duration):
-    """Convert ISO 8601 YouTube duration (PT#M#S) to total minutes."""
-    match = re.match(r'PT(?:(\d+)M)?(?:(\d+)S)?', iso_duration)
+    """Convert ISO 8601 YouTube duration (P#DT#H#M#S) to total minutes."""
+    match = re.match(r'P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$', iso_duration or "")
     if not match:
         return 0
-    minutes = int(match.group(1) or 0)
-    seconds = int(match.group(2) or 0)
-    return minutes + seconds / 60  # returns float minutes
+    days = int(match.group(1) or 0)
+    hours = int(match.group(2) or 0)
+    minutes = int(match.group(3) or 0)
+    seconds = int(match.group(4) or 0)
+    return days * 1440 + hours * 60 + minutes + seconds / 60  # returns float minutes
 
 def daily_trending_videos(channels=None, min_duration_minutes=4, top_x_per_channel=3):
     channels_to_use = channels or youtube_channels_data  # fallback to default global list
     all_videos = []
-
-    for channel in channels_to_use:
-        channel_id = channel["channelId"]
-        top_video_ids = get_top_videos(channel_id, max_results=top_x_per_channel)
-
-        for vid_id in top_video_ids:
-            details_list = get_video_details(vid_id)
-            if not details_list:
+    searches = 0
+    detail_calls = 0
+
+    # Channel searches are independent, so run them side by side
+    with ThreadPoolExecutor(max_workers=YOUTUBE_SEARCH_WORKERS) as executor:
+        futures = {
+            executor.submit(get_top_videos, channel["channelId"], top_x_per_channel): channel
+            for channel in channels_to_use
+        }
+        channel_for_video = {}
+        for future in futures:
+            channel = futures[future]
+            searches += 1
+            try:
+                top_video_ids = future.result()
+            except Exception as e:
+                print(f"Failed to fetch top videos for {channel['channelName']}: {e}")
                 continue
+            for vid_id in top_video_ids:
+                channel_for_video.setdefault(vid_id, channel)
+
+        # One videos.list call covers up to 50 IDs
+        video_ids = list(channel_for_video)
+        batches = [video_ids[i:i + YOUTUBE_DETAILS_BATCH_SIZE] for i in range(0, len(video_ids), YOUTUBE_DETAILS_BATCH_SIZE)]
+        details_list = []
+        for batch, future in [(batch, executor.submit(get_video_details, batch)) for batch in batches]:
+            detail_calls += 1
+            try:
+                details_list.extend(future.result())
+            except Exception as e:
+                print(f"Failed to fetch details for {len(batch)} videos: {e}")
+
+    for details in details_list:
+        vid_id = details["id"]
+        channel = channel_for_video.get(vid_id, {})
+        duration_minutes = parse_duration(details["duration"])
+
+        if duration_minutes >= min_duration_minutes:
+            video_info = {
+                "id": vid_id,
+                "title": details["title"],
+                "channelTitle": details.get("channelTitle", channel.get("channelName")),
+                "channel_id": details.get("channelId") or channel.get("channelId"),
+                "duration_minutes": round(duration_minutes, 2),
+                "views": int(details.get("viewCount") or 0),
+                "likes": int(details.get("likeCount") or 0),
+                "comments": int(details.get("commentCount") or 0),
+                "published_at": details.get("publishedAt") or datetime.now(timezone.utc).isoformat()
+            }
+            all_videos.append(video_info)
 
-            details = details_list[0]
-            duration_minutes = parse_duration(details["duration"])
-
-            if duration_minutes >= min_duration_minutes:
-                video_info = {
-                    "id": vid_id,
-                    "title": details["title"],
-                    "channelTitle": details.get("channelTitle", channel["channelName"]),
-                    "channel_id": details.get("channelId") or channel["channelId"],
-                    "duration_minutes": round(duration_minutes, 2),
-                    "views": int(details.get("viewCount") or 0),
-                    "likes": int(details.get("likeCount") or 0),
-                    "comments": int(details.get("commentCount") or 0),
-                    "published_at": details.get("publishedAt") or datetime.now(timezone.utc).isoformat()
-                }
-                all_videos.append(video_info)
+    quota_units = searches * YOUTUBE_SEARCH_COST + detail_calls * YOUTUBE_VIDEOS_COST
+    print(f"YouTube Data API quota used: {quota_units} units "
+          f"({searches} searches, {detail_calls} detail calls for {len(channel_for_video)} videos)")
 
     all_videos.sort(key=lambda x: x["views"], reverse=True)
     return all_videos
 
+def bulk_upsert_trending_videos(cursor, video_list, fetched_at=None):
+    """
+    Upsert trending videos with multi-row INSERT ... ON CONFLICT statements (TRENDING_UPSERT_PAGE_SIZE
+    rows per statement) instead of one round trip per row.
+    :return: (inserted video_ids, updated row count)
+    """
+    fetched_at = fetched_at or datetime.now(timezone.utc)
+
+    # A single statement can't touch the same row twice, so keep the last entry per video
+    rows = {}
+    for video in video_list:
+        rows[video["id"]] = (
+            video["id"],
+            video["title"],
+            video.get("channel_id"),  # if you store channel_id
+            video["channelTitle"],       # channel_name
+            video["duration_minutes"],
+            video.get("views", 0),
+            video.get("likes", 0),
+            video.get("comments", 0),
+            video.get("published_at"),   # optional
+            fetched_at
+        )
+
+    # xmax = 0 only for freshly inserted rows
+    results = extras.execute_values(cursor, """
+        INSERT INTO trending_videos
+            (video_id, title, channel_id, channel_name, duration_minutes, views, likes, comments, published_at, fetched_at)
+        VALUES %s
+        ON CONFLICT (video_id)
+        DO UPDATE SET
+            title = EXCLUDED.title,
+            channel_name = EXCLUDED.channel_name,
+            channel_id = EXCLUDED.channel_id,
+            duration_minutes = EXCLUDED.duration_minutes,
+            views = EXCLUDED.views,
+            likes = EXCLUDED.likes,
+            comments = EXCLUDED.comments,
+            fetched_at = EXCLUDED.fetched_at
+        RETURNING video_id, (xmax = 0) AS inserted
+    """, list(rows.values()), page_size=TRENDING_UPSERT_PAGE_SIZE, fetch=True)
+
+    inserted_ids = [video_id for video_id, was_inserted in results if was_inserted]
+    return inserted_ids, len(results) - len(inserted_ids)
+
 def insert_trending_videos(video_list):
     """
     Insert or update a list of trending videos into the database using connection pooling.
     :param video_list: List of dictionaries from daily_trending_videos()
+    :return: {"inserted": n, "updated": n}, or None if nothing was written
     """
     if not video_list:
-        return
+        return None
 
     conn = None
     try:
@@ -249,45 +812,138 @@ def insert_trending_videos(video_list):
         conn = connection_pool.getconn()
         cur = conn.cursor()
 
-        for video in video_list:
-            cur.execute("""
-                INSERT INTO trending_videos 
-                    (video_id, title, channel_id, channel_name, duration_minutes, views, likes, comments, published_at, fetched_at)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (video_id)
-                DO UPDATE SET
-                    title = EXCLUDED.title,
-                    channel_name = EXCLUDED.channel_name,
-                    channel_id = EXCLUDED.channel_id,
-                    duration_minutes = EXCLUDED.duration_minutes,
-                    views = EXCLUDED.views,
-                    likes = EXCLUDED.likes,
-                    comments = EXCLUDED.comments,
-                    fetched_at = EXCLUDED.fetched_at
-            """, (
-                video["id"],
-                video["title"],
-                video.get("channel_id"),  # if you store channel_id
-                video["channelTitle"],       # channel_name
-                video["duration_minutes"],
-                video.get("views", 0),
-                video.get("likes", 0),
-                video.get("comments", 0),
-                video.get("published_at"),   # optional
-                datetime.now(timezone.utc)
-            ))
+        step_start = time.time()
+        inserted_ids, updated = bulk_upsert_trending_videos(cur, video_list)
 
         conn.commit()
         cur.close()
+        print(f"Trending videos upserted: {len(inserted_ids)} inserted, {updated} updated in {time.time() - step_start:.2f}s")
     except Exception as e:
         print("Error inserting trending videos:", e)
         if conn:
             conn.rollback()
+        return None
     finally:
         if conn:
             # Return connection to the pool
             connection_pool.putconn(conn)
 
+    # The rows are committed; a pool failure only delays them reaching /popular_videos
+    try:
+        add_to_popular_pool(video_list)
+    except Exception as e:
+        print(f"Error adding trending videos to the popular pool: {e}")
+
+    # Questions first, so pre-summarization finds them cached
+    try:
+        precompute_faqs([video["title"] for video in video_list])
+    except Exception as e:
+        print(f"Error precomputing FAQs: {e}")
+    enqueue_presummarize(inserted_ids)
+    return {"inserted": len(inserted_ids), "updated": updated}
+
+def popular_pool_key(channel_id):
+    return f"popular:pool:{channel_id}"
+
+def parse_published_at(published_at):
+    if isinstance(published_at, datetime):
+        return published_at.timestamp()
+    return datetime.fromisoformat(str(published_at).replace("Z", "+00:00")).timestamp()
+
+def add_to_popular_pool(video_list):
+    """Incrementally add trending videos to the per-channel candidate pool."""
+    pipe = redis_client.pipeline()
+    for video in video_list:
+        channel_id = video.get("channel_id")
+        if not channel_id or not video.get("published_at"):
+            continue
+        pipe.sadd(POPULAR_CHANNELS_KEY, channel_id)
+        pipe.zadd(popular_pool_key(channel_id), {video["id"]: parse_published_at(video["published_at"])})
+        pipe.hset(POPULAR_TITLES_KEY, video["id"], video["title"])
+    pipe.execute()
+
+def rebuild_popular_pool():
+    """Reload the candidate pool from trending_videos (used when Redis has lost it)."""
+    conn = connection_pool.getconn()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT video_id, title, channel_id, published_at
+            FROM trending_videos
+            WHERE published_at >= NOW() - make_interval(days => %s)
+        """, (POPULAR_WINDOW_DAYS,))
+        rows = cursor.fetchall()
+        cursor.close()
+    finally:
+        connection_pool.putconn(conn)
+
+    add_to_popular_pool([
+        {"id": video_id, "title": title, "channel_id": channel_id, "published_at": published_at}
+        for video_id, title, channel_id, published_at in rows
+    ])
+    print(f"Rebuilt popular pool with {len(rows)} videos.")
+
+def load_popular_pool():
+    """Recent candidates per channel as {channel_id: [(video_id, title), ...]}, pruning expired ones."""
+    channel_ids = list(redis_client.smembers(POPULAR_CHANNELS_KEY))
+    if not channel_ids:
+        rebuild_popular_pool()
+        channel_ids = list(redis_client.smembers(POPULAR_CHANNELS_KEY))
+
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=POPULAR_WINDOW_DAYS)).timestamp()
+    pipe = redis_client.pipeline()
+    for channel_id in channel_ids:
+        pipe.zrangebyscore(popular_pool_key(channel_id), "-inf", f"({cutoff}")
+        pipe.zremrangebyscore(popular_pool_key(channel_id), "-inf", f"({cutoff}")
+        pipe.zrange(popular_pool_key(channel_id), 0, -1)
+    results = pipe.execute()
+
+    expired = [video_id for i in range(len(channel_ids)) for video_id in results[i * 3]]
+    members = {channel_id: results[i * 3 + 2] for i, channel_id in enumerate(channel_ids)}
+    if expired:
+        redis_client.hdel(POPULAR_TITLES_KEY, *expired)
+
+    video_ids = [video_id for ids in members.values() for video_id in ids]
+    titles = dict(zip(video_ids, redis_client.hmget(POPULAR_TITLES_KEY, video_ids))) if video_ids else {}
+    return {
+        channel_id: [(video_id, titles[video_id]) for video_id in ids]
+        for channel_id, ids in members.items() if ids
+    }
+
+def build_popular_pages(pool=None, num_pages=POPULAR_PAGE_COUNT, page_size=POPULAR_PAGE_SIZE):
+    """
+    Shuffle the pool into pages: one random video from each of up to page_size random channels,
+    topped up with other recent videos when there are fewer channels than slots.
+    """
+    pool = load_popular_pool() if pool is None else pool
+    pages = []
+    for _ in range(num_pages):
+        channel_ids = random.sample(list(pool), k=len(pool))
+        picks = [random.choice(pool[channel_id]) for channel_id in channel_ids[:page_size]]
+        if len(picks) < page_size:
+            picked = set(picks)
+            remaining = [video for videos in pool.values() for video in videos if video not in picked]
+            picks += random.sample(remaining, k=min(page_size - len(picks), len(remaining)))
+        pages.append([{"video_id": video_id, "youtube_title": title} for video_id, title in picks])
+    return pages
+
+def get_popular_page(page=None):
+    """A cached page of popular videos, random unless a page number is given; None on a cache miss."""
+    index = random.randrange(POPULAR_PAGE_COUNT) if page is None else page % POPULAR_PAGE_COUNT
+    cached = redis_client.lindex(POPULAR_PAGES_KEY, index)
+    if cached is None and index:
+        # Fewer pages than expected (e.g. a tiny pool); fall back to the first one
+        cached = redis_client.lindex(POPULAR_PAGES_KEY, 0)
+    return json.loads(cached) if cached else None
+
+def store_popular_pages(pages, pipe):
+    pipe.delete(POPULAR_PAGES_KEY)
+    if pages:
+        pipe.rpush(POPULAR_PAGES_KEY, *[json.dumps(page) for page in pages])
+        pipe.expire(POPULAR_PAGES_KEY, POPULAR_PAGES_TTL)
+        # Cache the result with TTL (1 hour)
+        pipe.set("cache:popular_videos", json.dumps(pages[0]), ex=3600)
+
 def fetch_and_store_trending(youtube_channels=youtube_channels_data, num_channels=5, min_duration=4, top_x=2):
     
     sampled_channels = random.sample(youtube_channels, k=min(num_channels, len(youtube_channels)))
@@ -302,15 +958,69 @@ def fix_bullet_spacing(text):
     fixed_text = re.sub(r'(?m)(^-\s[^\n]+?)(\n(?!\n)|(?=\Z))', r'\1\n\n', text)
     return fixed_text
 
-def get_cached_summary(video_id):
-    # Check Redis first
-    redis_key = f"cache:summary:{video_id}"
-    cached = redis_client.get(redis_key)
-    if cached:
+def summary_cache_key(generation, video_id):
+    return f"cache:summary:v{generation}:{video_id}"
+
+def get_summary_generation():
+    if time.time() - summary_generation["fetched_at"] > SUMMARY_GENERATION_CACHE_SECONDS:
+        summary_generation["value"] = redis_client.get(SUMMARY_GENERATION_KEY) or "0"
+        summary_generation["fetched_at"] = time.time()
+    return summary_generation["value"]
+
+def summary_read_through_key(video_id):
+    return f"cache:summary:rt:{video_id}"
+
+def summary_cache_lookup_keys(generation, video_id):
+    return [
+        summary_cache_key(generation, video_id),
+        f"cache:summary_none:{video_id}",
+        "stats:summary_cache:hit",
+        "stats:summary_cache:negative_hit",
+        "stats:summary_cache:miss",
+        summary_read_through_key(video_id),
+    ]
+
+def summary_cache_ttl():
+    return SUMMARY_CACHE_TTL + random.randint(0, SUMMARY_CACHE_JITTER)
+
+def json_column(value):
+    """A JSONB column's value: psycopg2 hands it back decoded, asyncpg as text."""
+    return json.loads(value) if isinstance(value, str) else value
+
+def summary_from_row(youtube_title, description, key_points, faqs):
+    return {
+        "youtube_title": youtube_title,
+        "description": description,
+        "keypoints": key_points,
+        "faqs": json_column(faqs),
+    }
+
+def summary_lookup_result(lookup, redis_key):
+    """(True, summary) when the lookup script answered from Redis (summary is None on a negative hit), else (False, None)."""
+    if lookup[0] == 1:
         print(f"Cache hit for {redis_key}")
-        return json.loads(cached)
+        SUMMARY_CACHE_LOOKUPS.labels(result="hit").inc()
+        return True, json.loads(lookup[1])
+    if lookup[0] == 2:
+        print(f"Negative cache hit for {redis_key}")
+        SUMMARY_CACHE_LOOKUPS.labels(result="negative_hit").inc()
+        return True, None
 
     print(f"Cache miss for {redis_key} — querying DB...")
+    return False, None
+
+def queue_summary_write_back(pipe, video_id, summary):
+    """Queue the read-through write of a summary found in the DB on `pipe`."""
+    pipe.set(summary_read_through_key(video_id), json.dumps(summary), ex=summary_cache_ttl())
+    pipe.incr("stats:summary_cache:db_hit")
+
+def get_cached_summary(video_id):
+    # Check Redis first
+    keys = summary_cache_lookup_keys(get_summary_generation(), video_id)
+    answered, summary = summary_lookup_result(summary_cache_lookup_script(keys=keys), keys[0])
+    if answered:
+        return summary
+
     conn = connection_pool.getconn()
     try:
         cursor = conn.cursor()
@@ -325,21 +1035,30 @@ def get_cached_summary(video_id):
         )
         result = cursor.fetchone()
         cursor.close()
-        if result:
-            youtube_title, description, keypoints, faqs_jsonb = result
-            faqs = faqs_jsonb  # already a dict
-            summary = {
-                "youtube_title": youtube_title,
-                "description": description,
-                "keypoints": keypoints,
-                "faqs": faqs,
-            }
-            return summary
-        else:
-            return None
     finally:
         connection_pool.putconn(conn)
-    
+
+    if not result:
+        redis_client.set(keys[1], "1", ex=SUMMARY_NEGATIVE_TTL)
+        SUMMARY_CACHE_LOOKUPS.labels(result="miss").inc()
+        return None
+
+    summary = summary_from_row(*result)
+    pipe = redis_client.pipeline()
+    queue_summary_write_back(pipe, video_id, summary)
+    pipe.execute()
+    SUMMARY_CACHE_LOOKUPS.labels(result="db_hit").inc()
+    return summary
+
+def get_summary_cache_stats():
+    values = redis_client.mget([f"stats:summary_cache:{name}" for name in SUMMARY_CACHE_COUNTERS])
+    stats = {name: int(value or 0) for name, value in zip(SUMMARY_CACHE_COUNTERS, values)}
+    lookups = stats["hit"] + stats["negative_hit"] + stats["miss"]
+    stats["hit_ratio"] = round(stats["hit"] / lookups, 4) if lookups else None
+    # Share of Redis misses that Postgres could answer
+    stats["db_hit_ratio"] = round(stats["db_hit"] / stats["miss"], 4) if stats["miss"] else None
+    return stats
+
 def insert_summary(title, url, video_id, description, key_points, faqs):
     try:
         conn = connection_pool.getconn()
@@ -355,6 +1074,7 @@ def insert_summary(title, url, video_id, description, key_points, faqs):
 
         conn.commit()
         cursor.close()
+        redis_client.delete(f"cache:summary_none:{video_id}")
     except Exception as e:
         print(f"Failed to insert log: {e}")
         return False
@@ -407,80 +1127,595 @@ def increment_times_summarized(video_id):
         connection_pool.putconn(conn)
     return True
 
-#TODO: if there's no transcript llm should return "failed"
-def gemini_summary(transcript, faqs):
+def record_http_call(host, latency, ok):
+    with http_stats_lock:
+        stats = http_stats.setdefault(host, {"requests": 0, "errors": 0, "latencies": deque(maxlen=HTTP_STATS_WINDOW)})
+        stats["requests"] += 1
+        stats["errors"] += 0 if ok else 1
+        stats["latencies"].append(latency)
+
+def quota_keys(host, now=None):
+    now = now or datetime.now(timezone.utc)
+    return [
+        f"quota:{host}:bucket",
+        f"quota:{host}:day:{now.astimezone(QUOTA_DAY_TIMEZONE):%Y%m%d}",
+        f"quota:{host}:month:{now:%Y%m}",
+    ]
+
+def acquire_budget(host, cost=1):
+    """
+    Take one request token and `cost` units from the host's shared budget, waiting up to the
+    upstream's max_wait for the rate limit. Raises QuotaExceededError when it can't.
+    Fails open when Redis is unreachable: the upstreams enforce their own limits (429s are
+    retried like any other), so a Redis blip shouldn't turn every upstream call into an error.
+    """
+    budget = UPSTREAMS.get(host, {}).get("budget")
+    if not budget:
+        return
+
+    deadline = time.time() + budget["max_wait"]
+    while True:
+        try:
+            result = acquire_budget_script(keys=quota_keys(host), args=[
+                budget["per_second"],
+                budget["burst"],
+                cost,
+                int(time.time() * 1000),
+                budget["daily"] or 0,
+                budget["monthly"] or 0,
+            ])
+        except redis.RedisError as e:
+            print(f"Budget check for {host} failed, allowing the call: {e}")
+            return
+        if result[0] == 1:
+            return
+        if result[0] == -1:
+            raise QuotaExceededError(f"{host} {result[1]} budget exhausted")
+
+        wait_seconds = int(result[1]) / 1000
+        if time.time() + wait_seconds > deadline:
+            raise QuotaExceededError(f"{host} rate limit reached ({budget['per_second']}/s)")
+        time.sleep(wait_seconds)
+
+def get_quota_usage():
+    """Current rate-bucket and daily/monthly consumption for every budgeted upstream."""
+    hosts = [host for host, upstream in UPSTREAMS.items() if upstream.get("budget")]
+    pipe = redis_client.pipeline()
+    for host in hosts:
+        bucket_key, daily_key, monthly_key = quota_keys(host)
+        pipe.hget(bucket_key, "tokens")
+        pipe.get(daily_key)
+        pipe.get(monthly_key)
+    values = pipe.execute()
+
+    usage = {}
+    for i, host in enumerate(hosts):
+        budget = UPSTREAMS[host]["budget"]
+        tokens, daily_used, monthly_used = values[i * 3:i * 3 + 3]
+        usage[host] = {
+            "rate_per_second": budget["per_second"],
+            "tokens_available": round(float(tokens), 2) if tokens is not None else budget["burst"],
+            "daily_used": int(daily_used or 0),
+            "daily_limit": budget["daily"],
+            "monthly_used": int(monthly_used or 0),
+            "monthly_limit": budget["monthly"],
+        }
+    return usage
+
+def http_get(url, cost=1, **kwargs):
+    """
+    GET through the shared session with the upstream's timeout, retrying connection errors,
+    timeouts and 429/5xx up to the upstream's retries. Every attempt charges `cost` units to
+    its budget. Raises what requests raises (QuotaExceededError included), and records per-host
+    latency and errors (transport failures and 5xx/429 responses).
+    """
+    host = urlparse(url).hostname
+    upstream = UPSTREAMS.get(host, DEFAULT_UPSTREAM)
+    kwargs.setdefault("timeout", upstream["timeout"])
+
+    retries = upstream["retries"]
+    for attempt in range(retries + 1):
+        acquire_budget(host, cost)
+        start = time.time()
+        try:
+            response = http_session.get(url, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            record_http_call(host, time.time() - start, ok=False)
+            if attempt == retries:
+                raise
+        except requests.exceptions.RequestException:
+            record_http_call(host, time.time() - start, ok=False)
+            raise
+        else:
+            record_http_call(host, time.time() - start, ok=response.status_code < 500 and response.status_code != 429)
+            if response.status_code not in HTTP_RETRY_STATUSES or attempt == retries:
+                return response
+        time.sleep(HTTP_RETRY_BACKOFF * 2 ** attempt)
+
+def get_http_stats():
+    """Per-host outbound call stats for this process."""
+    with http_stats_lock:
+        snapshot = {host: (stats["requests"], stats["errors"], sorted(stats["latencies"])) for host, stats in http_stats.items()}
+    return {
+        host: {
+            "requests": requests_made,
+            "errors": errors,
+            "error_rate": round(errors / requests_made, 4) if requests_made else None,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+            "p95_ms": round(percentile(latencies, 95) * 1000, 1) if latencies else None,
+        }
+        for host, (requests_made, errors, latencies) in snapshot.items()
+    }
+
+def enqueue_write(event_type, **fields):
     try:
-        answers_dict = {}
-        # Start the chat session and send the message to the model
-        chat_session = model.start_chat()
-        response = chat_session.send_message(f"""
-        I will send you a transcript from a youtube video, aswell as questions and I need you to do 3 things for me:
-        - Give me a description of the transcript
-        - Give me key points from the transcript
-        - Answer some questions that users want to know
-                                             
-        Format the response exactly as follows:
-
-        **Description:**
-        This video provides an in-depth discussion on a specific topic, explaining key ideas and insights in a structured and engaging way. This will be roughly 4 detailed sentences.
-
-        **Key Points:**
-
-        - First Key Point: Briefly explain this key idea in 4-5 lines, offering detailed context and examples as needed.\n
-        - Another Key Point: Provide a short, 4-5 line explanation of this concept, including relevant details.\n
-        - Additional Key Point: Summarize another insight from the discussion in 4-5 lines, providing clear context.\n
-        - More Key Points as Needed: Continue listing key points from the transcript, keeping each explanation around 4-5 lines.\n
-
-        **Answer Section:**
-        ANSWER1: Answer for Question 1
-        ANSWER2: Answer for Question 2
-        ANSWER3: Answer for Question 3
-
-        ### **Formatting Rules:**
-        - The words **"Description"**, **"Key Points"** and **"Answer Section:"** must be bold and appear exactly as written. The phrase "Key Points" should not have any text before or after them.
-        - **Do not introduce extra labels or sections other than what is above.
-        - Each key point must follow this format:
-        `- [Short, bold subheading]: [Explanation in 4-5 lines]`
-        - Use a dash (`-`) to list key points. **Do not use numbers or asterisks.**
-        - Ensure the structure remains consistent across responses.
-        You will be given 3 questions after the transcript. Provide a concise answer to the questions given based *only* on the provided transcript. 
-        Only include the answer in the response. Separated each answer by the delimiter '---ANSWER_SEPARATOR---'.**
-        If you're not sure about a question, do your best to provide a response for the user.
-
-        Here are the questions, and the transcript will be below: {', '.join(faqs.values())}
+        redis_client.xadd(WRITE_BEHIND_STREAM, {"type": event_type, **{k: "" if v is None else str(v) for k, v in fields.items()}})
+    except redis.RedisError as e:
+        print(f"Failed to queue {event_type} write: {e}")
+        return False
+    return True
+
+def parse_status_code(value):
+    """Status code from a /log_status body or a queued entry as an int; None when it's missing."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool):
+        raise ValueError(f"invalid status code {value!r}")
+    status_code = int(value)
+    if not 100 <= status_code <= 599:
+        raise ValueError(f"invalid status code {value!r}")
+    return status_code
+
+def ensure_write_behind_group():
+    try:
+        redis_client.xgroup_create(WRITE_BEHIND_STREAM, WRITE_BEHIND_GROUP, id="0", mkstream=True)
+    except redis.ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+def write_batch(entries):
+    """Apply a batch of queued writes in one transaction: one multi-row INSERT, one UPDATE."""
+    logs = []
+    increments = Counter()
+    for entry_id, fields in entries:
+        if fields.get("type") == "log":
+            # A bad entry would fail the batch on every redelivery; drop it and ack it with the rest
+            try:
+                status_code = parse_status_code(fields.get("status_code"))
+            except (TypeError, ValueError) as e:
+                print(f"Dropping queued log {entry_id}: {e}")
+                continue
+            logs.append((fields.get("video_title") or None, fields.get("video_url") or None, status_code))
+        elif fields.get("type") == "increment" and fields.get("video_id"):
+            increments[fields["video_id"]] += 1
+
+    conn = connection_pool.getconn()
+    try:
+        cursor = conn.cursor()
+        if logs:
+            extras.execute_values(cursor, """
+                INSERT INTO logs (video_title, video_url, status_code)
+                VALUES %s
+            """, logs)
+        if increments:
+            extras.execute_values(cursor, """
+                UPDATE summaries
+                SET times_summarized = summaries.times_summarized + counts.n
+                FROM (VALUES %s) AS counts (video_id, n)
+                WHERE summaries.video_id = counts.video_id
+            """, list(increments.items()))
+        conn.commit()
+        cursor.close()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        connection_pool.putconn(conn)
+
+    return len(logs), len(increments)
+
+def read_write_behind_batch():
+    # Batches a dead flusher read but never acked come first
+    _, entries, *_ = redis_client.xautoclaim(
+        WRITE_BEHIND_STREAM, WRITE_BEHIND_GROUP, WRITE_BEHIND_CONSUMER,
+        min_idle_time=WRITE_BEHIND_CLAIM_IDLE_MS, count=WRITE_BEHIND_FLUSH_SIZE
+    )
+    entries = [entry for entry in entries if entry[1]]
+    if entries:
+        return entries
+
+    response = redis_client.xreadgroup(
+        WRITE_BEHIND_GROUP, WRITE_BEHIND_CONSUMER, {WRITE_BEHIND_STREAM: ">"},
+        count=WRITE_BEHIND_FLUSH_SIZE
+    )
+    return response[0][1] if response else []
+
+def flush_write_behind():
+    """Drain the write-behind stream in batches of WRITE_BEHIND_FLUSH_SIZE."""
+    try:
+        ensure_write_behind_group()
+
+        while True:
+            entries = read_write_behind_batch()
+            if not entries:
+                return
+
+            log_count, video_count = write_batch(entries)
+
+            entry_ids = [entry_id for entry_id, _ in entries]
+            pipe = redis_client.pipeline()
+            pipe.xack(WRITE_BEHIND_STREAM, WRITE_BEHIND_GROUP, *entry_ids)
+            pipe.xdel(WRITE_BEHIND_STREAM, *entry_ids)
+            pipe.execute()
+            print(f"Flushed {len(entries)} queued writes: {log_count} logs, {video_count} counter updates")
+
+            if len(entries) < WRITE_BEHIND_FLUSH_SIZE:
+                return
+
+    except Exception as e:
+        print(f"Error flushing queued writes: {e}")
+
+def summary_section_schema(sections):
+    return {
+        "type": "OBJECT",
+        "properties": {section: SUMMARY_SECTION_SCHEMAS[section] for section in sections},
+        "required": list(sections),
+    }
+
+def section_instructions(sections, title=None):
+    return "\n".join(
+        f"        - {SINGLE_PASS_FAQ_INSTRUCTION if section == 'faqs' and title else SUMMARY_SECTION_INSTRUCTIONS[section]}"
+        for section in sections
+    )
+
+def format_question_list(questions, title=None):
+    if title:
+        return f"\n        Here is the video title: {title}\n"
+    return "\n        Here are the questions:\n" + "\n".join(
+        f"        {i}. {question}" for i, question in enumerate(questions, 1)
+    ) + "\n"
+
+def build_summary_json_prompt(transcript, questions, sections=SUMMARY_JSON_SECTIONS, title=None):
+    """With a title instead of questions (single-pass mode), the model writes the FAQ questions too."""
+    instructions = section_instructions(sections, title)
+    question_list = format_question_list(questions, title) if "faqs" in sections else ""
+    return f"""
+        I will send you a transcript from a youtube video and I need you to summarize it.
+        Respond with JSON containing:
+{instructions}
+{question_list}
         Here is the transcript: {transcript}
-        """)
+        """
 
-        summary_with_faqs = response.text
+def select_passages(transcript, query="", max_tokens=REPAIR_TRANSCRIPT_TOKENS):
+    """
+    Up to max_tokens of the transcript, in transcript order: the passages sharing the most words
+    with `query`, or evenly spaced passages when there's no query.
+    """
+    if estimate_tokens(transcript) <= max_tokens:
+        return transcript
+
+    passages = split_transcript(transcript, REPAIR_PASSAGE_TOKENS)
+    keep = max(1, max_tokens // REPAIR_PASSAGE_TOKENS)
+    query_words = {word for word in re.findall(r"\w+", query.lower()) if len(word) > 3}
+    if query_words:
+        scores = [len(query_words & set(re.findall(r"\w+", passage.lower()))) for passage in passages]
+        chosen = sorted(sorted(range(len(passages)), key=lambda i: -scores[i])[:keep])
+    else:
+        chosen = sorted({i * len(passages) // keep for i in range(keep)})
+    return "\n...\n".join(passages[i] for i in chosen)
 
-        # Extract the description and key points from the response using regular expressions
-        description_match = re.search(r"\*\*Description:\*\*(.*?)\*\*Key Points:\*\*", summary_with_faqs, re.DOTALL)
-        key_points_match = re.search(r"\*\*Key Points:\*\*(.*?)(?=\n\n\*\*Answer Section:\*\*|$)", summary_with_faqs, re.DOTALL)
-        answer_pattern = r"ANSWER\d+:\s(.*?)(?:\s---ANSWER_SEPARATOR---|$)"
+def build_section_repair_prompt(section, transcript, questions, sections=None, title=None):
+    """
+    Prompt for one section that came back missing or malformed: its instruction, the valid
+    `sections` as context and only the transcript passages the section needs.
+    """
+    sections = sections or {}
+    context = []
+    if section != "description" and sections.get("description"):
+        context.append(f"Here is the video's description: {sections['description']}")
+    if section == "description" and sections.get("key_points"):
+        context.append(f"Here are the video's key points:\n{sections['key_points']}")
+    else:
+        query = (title or " ".join(questions)) if section == "faqs" else ""
+        context.append(f"Here are excerpts from the transcript:\n{select_passages(transcript, query)}")
+
+    question_list = format_question_list(questions, title) if section == "faqs" else ""
+    context_text = "\n\n".join(f"        {part}" for part in context)
+    return f"""
+        I need one part of a summary of a youtube video.
+        Respond with JSON containing:
+{section_instructions((section,), title)}
+{question_list}
+{context_text}
+        """
+
+def request_summary_json(prompt, sections, call):
+    chat_session = model.start_chat()
+    response = chat_session.send_message(prompt, generation_config={
+        **generation_config,
+        "response_mime_type": "application/json",
+        "response_schema": summary_section_schema(sections),
+    })
+    LLM_CALLS.labels(call=call, outcome="success").inc()
+    record_llm_usage(call, response)
+    return json.loads(response.text)
+
+def record_llm_usage(call, response):
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        LLM_TOKENS.labels(call=call, kind="prompt").inc(usage.prompt_token_count or 0)
+        LLM_TOKENS.labels(call=call, kind="output").inc(usage.candidates_token_count or 0)
+
+def render_key_points(key_points):
+    return "\n\n".join(f"- **{point['heading'].strip()}**: {point['explanation'].strip()}" for point in key_points)
+
+def validate_summary_sections(data, questions):
+    """
+    Check a JSON summary section by section.
+    :return: (valid sections with key points rendered to markdown, {question: answer} for the
+        answered questions, the questions still unanswered)
+    """
+    data = data if isinstance(data, dict) else {}
+    sections = {}
+
+    description = data.get("description")
+    if isinstance(description, str) and description.strip():
+        sections["description"] = description.strip()
+
+    key_points = data.get("key_points")
+    if isinstance(key_points, list):
+        points = [
+            point for point in key_points
+            if isinstance(point, dict)
+            and isinstance(point.get("heading"), str) and point["heading"].strip()
+            and isinstance(point.get("explanation"), str) and point["explanation"].strip()
+        ]
+        if points:
+            sections["key_points"] = render_key_points(points)
+
+    answers = {}
+    faqs = data.get("faqs")
+    if isinstance(faqs, list):
+        # Answers are matched to questions by position, as the prompt asks for them in order
+        for question, entry in zip(questions, faqs):
+            answer = entry.get("answer") if isinstance(entry, dict) else None
+            if isinstance(answer, str) and answer.strip():
+                answers[question] = answer.strip()
+
+    return sections, answers, [question for question in questions if question not in answers]
+
+def single_pass_questions(data):
+    """The questions the model wrote for itself in a single-pass (or single-pass FAQ repair) response."""
+    faqs = data.get("faqs") if isinstance(data, dict) else None
+    return [
+        entry["question"].strip() for entry in faqs or []
+        if isinstance(entry, dict) and isinstance(entry.get("question"), str) and entry["question"].strip()
+    ]
 
-        description = description_match.group(1).strip() if description_match else ""
-        key_points = key_points_match.group(1).strip() if key_points_match else ""
-        matches = re.findall(answer_pattern, summary_with_faqs, re.DOTALL)
+def plan_summary_repairs(data, questions, single_pass=False):
+    """
+    Validate a full JSON summary and work out which sections need a repair call.
+    :return: (questions, valid sections, {question: answer}, sections to repair), or None when
+        nothing usable came back. In single-pass mode the questions are the ones the model wrote.
+    """
+    if single_pass:
+        questions = single_pass_questions(data)
+    sections, answers, unanswered = validate_summary_sections(data, questions)
+    missing = [section for section in ("description", "key_points") if section not in sections]
+    if (not answers) if single_pass else unanswered:
+        missing.append("faqs")
+    if not sections and not answers:
+        print("Summary JSON had no usable sections")
+        SUMMARY_OUTCOMES.labels(outcome="failed").inc()
+        return None
+    return questions, sections, answers, missing
+
+def repair_questions(section, questions, answers):
+    """The questions a repair call for `section` needs: only the unanswered ones for FAQs."""
+    return [question for question in questions if question not in answers] if section == "faqs" else questions
+
+def parse_section_repair(section, data, questions, title=None):
+    """The validated value of a repaired section, or None. Single-pass FAQs (title given) bring their own questions."""
+    if section == "faqs" and title:
+        questions = single_pass_questions(data)
+    sections, answers, _ = validate_summary_sections(data, questions)
+    return (answers or None) if section == "faqs" else sections.get(section)
+
+def finish_summary(questions, sections, answers, missing, repairs, single_pass=False):
+    """Merge the repairs (one per missing section, None if it failed), record the outcome and shape the summary."""
+    for section, repaired in zip(missing, repairs):
+        if repaired and section == "faqs" and single_pass:
+            answers = repaired
+        elif repaired and section == "faqs":
+            answers.update(repaired)
+        elif repaired:
+            sections[section] = repaired
+
+    if single_pass:
+        complete = "description" in sections and "key_points" in sections and bool(answers)
+    else:
+        complete = "description" in sections and "key_points" in sections and all(q in answers for q in questions)
+        # Keep the order the questions were asked in
+        answers = {question: answers[question] for question in questions if question in answers}
+    SUMMARY_OUTCOMES.labels(outcome="failed" if not complete else "repaired" if missing else "complete").inc()
+
+    return {
+        "description": sections.get("description", ""),
+        "key_points": sections.get("key_points", ""),
+        "faqs": answers,
+    }
 
-        for i, answer in enumerate(matches):
-            answers_dict[faqs[f"q{i+1}"]] = answer.strip()
+def repair_summary_section(section, transcript, questions, sections=None, title=None):
+    """
+    Re-request one section with a small section-only prompt and schema (build_section_repair_prompt);
+    `sections` are the ones that came back valid, `title` marks a single-pass FAQ repair.
+    Returns the section's validated value or None.
+    """
+    print(f"Repairing summary section: {section}")
+    try:
+        data = request_summary_json(build_section_repair_prompt(section, transcript, questions, sections, title), (section,), "repair")
+        value = parse_section_repair(section, data, questions, title)
+    except Exception as e:
+        print(f"Error repairing summary section {section}: {e}")
+        LLM_CALLS.labels(call="repair", outcome="error").inc()
+        value = None
 
-        return {
-            "description": description,
-            "key_points": key_points,
-            "faqs": answers_dict
-        }
+    SUMMARY_REPAIRS.labels(section=section, outcome="success" if value else "failed").inc()
+    return value
 
+#TODO: if there's no transcript llm should return "failed"
+def gemini_summary(transcript, faqs):
+    """
+    Summarize with schema-constrained JSON output. Sections that come back missing or malformed
+    are repaired one at a time (FAQs only for the unanswered questions) instead of regenerating
+    the whole summary; if nothing usable comes back at all, returns None.
+    """
+    questions = list((faqs or {}).values())
+    try:
+        data = request_summary_json(build_summary_json_prompt(transcript, questions), SUMMARY_JSON_SECTIONS, "summary")
     except Exception as e:
         print(f"Error occurred while fetching the summary and FAQs: {e}")
+        LLM_CALLS.labels(call="summary", outcome="error").inc()
+        SUMMARY_OUTCOMES.labels(outcome="failed").inc()
         return None
 
-def generate_faqs(title):
+    plan = plan_summary_repairs(data, questions)
+    if not plan:
+        return None
+    questions, sections, answers, missing = plan
+
+    repairs = [
+        repair_summary_section(section, transcript, repair_questions(section, questions, answers), sections)
+        for section in missing
+    ]
+    return finish_summary(questions, sections, answers, missing, repairs)
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def split_transcript(transcript, max_tokens=SUMMARY_CHUNK_TOKENS):
+    """Split a transcript into windows of at most max_tokens, breaking at sentence boundaries."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    chunks = []
+    current = ""
+
+    for sentence in re.split(r"(?<=[.!?])\s+", transcript):
+        # Auto-generated captions often have no punctuation; fall back to word boundaries
+        pieces = [sentence]
+        if len(sentence) > max_chars:
+            pieces, piece = [], ""
+            for word in sentence.split():
+                if piece and len(piece) + len(word) + 1 > max_chars:
+                    pieces.append(piece)
+                    piece = ""
+                piece = f"{piece} {word}" if piece else word
+            pieces.append(piece)
+
+        for piece in pieces:
+            if current and len(current) + len(piece) + 1 > max_chars:
+                chunks.append(current)
+                current = ""
+            current = f"{current} {piece}" if current else piece
+
+    if current:
+        chunks.append(current)
+    return chunks
+
+def build_chunk_prompt(chunk, index, total):
+    return f"""
+    Below is part {index + 1} of {total} of a YouTube video transcript.
+    Write dense notes covering every topic, claim, example, name and number in this part, in the order they come up.
+    Use a dash (`-`) for each note. Do not add an introduction or conclusion.
+
+    Here is the transcript part: {chunk}
+    """
+
+def summarize_chunk(chunk, index, total):
+    chat_session = model.start_chat()
+    response = chat_session.send_message(build_chunk_prompt(chunk, index, total))
+    LLM_CALLS.labels(call="chunk", outcome="success").inc()
+    record_llm_usage("chunk", response)
+    return response.text.strip()
+
+def plan_transcript_chunks(transcript):
+    """
+    Chunks for the map step, or [] when the transcript fits TRANSCRIPT_TOKEN_BUDGET. Chunks grow
+    past SUMMARY_CHUNK_TOKENS as needed so there are never more than SUMMARY_MAX_CHUNKS.
+    """
+    tokens = estimate_tokens(transcript)
+    if tokens <= TRANSCRIPT_TOKEN_BUDGET:
+        return []
+
+    chunks = split_transcript(transcript, max(SUMMARY_CHUNK_TOKENS, -(-tokens // SUMMARY_MAX_CHUNKS)))
+    # Sentence packing can spill into one extra chunk; fold it into the last one
+    if len(chunks) > SUMMARY_MAX_CHUNKS:
+        chunks[SUMMARY_MAX_CHUNKS - 1:] = [" ".join(chunks[SUMMARY_MAX_CHUNKS - 1:])]
+    return chunks
+
+def condense_transcript(transcript):
+    """
+    Map step: transcripts that fit in one call pass through unchanged; longer ones are
+    split and each chunk is turned into notes concurrently on summary_map_executor.
+    """
+    chunks = plan_transcript_chunks(transcript)
+    if not chunks:
+        return transcript
+
+    step_start = time.time()
+    futures = [summary_map_executor.submit(summarize_chunk, chunk, i, len(chunks)) for i, chunk in enumerate(chunks)]
+    notes = [future.result() for future in futures]
+    print(f"Time to condense {len(chunks)} transcript chunks: {time.time() - step_start:.2f}s")
+
+    return join_chunk_notes(notes)
+
+def join_chunk_notes(notes):
+    """Reduce input: the map step's notes in transcript order."""
+    return "\n\n".join(f"Notes for part {i + 1} of {len(notes)}:\n{part}" for i, part in enumerate(notes))
+
+def gemini_summary_single_pass(transcript, title):
+    """
+    Single-pass mode: one JSON call writes the description, key points and the viewer questions
+    (derived from the title) with their answers. Repairs work as in gemini_summary; missing FAQs
+    are re-requested whole, since there are no fixed questions to fill in.
+    """
     try:
-        # Start the chat session and send the message to the model
-        chat_session = model.start_chat()
+        data = request_summary_json(build_summary_json_prompt(transcript, [], title=title), SUMMARY_JSON_SECTIONS, "summary_single_pass")
+    except Exception as e:
+        print(f"Error occurred while fetching the single-pass summary: {e}")
+        LLM_CALLS.labels(call="summary_single_pass", outcome="error").inc()
+        SUMMARY_OUTCOMES.labels(outcome="failed").inc()
+        return None
+
+    plan = plan_summary_repairs(data, [], single_pass=True)
+    if not plan:
+        return None
+    questions, sections, answers, missing = plan
 
-        response = chat_session.send_message(f"""
+    repairs = [repair_summary_section(section, transcript, questions, sections, title) for section in missing]
+    return finish_summary(questions, sections, answers, missing, repairs, single_pass=True)
+
+def summarize_transcript(transcript, faqs, mode="two_pass", title=None):
+    """
+    Map-reduce entry point: cap the transcript, condense it if over budget, then reduce with the
+    regular summary prompt. In single_pass mode faqs is unused and the summary call writes the
+    questions from the title itself.
+    """
+    transcript = prepare_transcript(transcript)
+    if not transcript:
+        return None
+    try:
+        condensed = condense_transcript(transcript)
+    except Exception as e:
+        print(f"Error occurred while condensing the transcript: {e}")
+        LLM_CALLS.labels(call="chunk", outcome="error").inc()
+        return None
+    if mode == "single_pass":
+        return gemini_summary_single_pass(condensed, title)
+    return gemini_summary(condensed, faqs)
+
+def build_faqs_prompt(title):
+    return f"""
         You are a journalist whose job is to identify the most important questions a typical viewer would have upon seeing a YouTube video title.\n
         Given the YouTube video title below, identify the top 3 most likely questions a user would have about the video's content *before* watching it.\n
         You are to write them in order of most important, focusing on quesions that ideally tie into the title of the video.
@@ -488,23 +1723,149 @@ def generate_faqs(title):
         Return the three questions, with each question on a new line and preceded by the delimiter '---QUESTION---'. Do not include any other introductory or concluding text.
 
         Here is the Title: {title}
-        """)
+        """
 
-        faqs_string = response.text.strip()
-        faqs_list = [q.replace('---QUESTION---', '').strip() for q in faqs_string.split('\n') if '---QUESTION---' in q]
+def parse_faqs_response(faqs_string):
+    faqs_list = [q.replace('---QUESTION---', '').strip() for q in faqs_string.strip().split('\n') if '---QUESTION---' in q]
 
-        faq_dict = {
-            "q1": faqs_list[0],
-            "q2": faqs_list[1],
-            "q3": faqs_list[2]
-        }
+    return {
+        "q1": faqs_list[0],
+        "q2": faqs_list[1],
+        "q3": faqs_list[2]
+    }
+
+def generate_faqs(title):
+    try:
+        # Start the chat session and send the message to the model
+        chat_session = model.start_chat()
+
+        response = chat_session.send_message(build_faqs_prompt(title))
+
+        faq_dict = parse_faqs_response(response.text)
+        LLM_CALLS.labels(call="faqs", outcome="success").inc()
+        record_llm_usage("faqs", response)
 
         return faq_dict
 
     except Exception as e:
         print(f"Error occurred while fetching the faqs: {e}")
+        LLM_CALLS.labels(call="faqs", outcome="error").inc()
+        return None
+
+def title_hash(title):
+    """Hash of the title with case, entities, unicode forms and whitespace normalized away."""
+    normalized = " ".join(unicodedata.normalize("NFKC", html.unescape(title)).casefold().split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+def faq_cache_key(key_hash):
+    return f"cache:faqs:{key_hash}"
+
+def get_cached_faqs(title):
+    key_hash = title_hash(title)
+    redis_key = faq_cache_key(key_hash)
+    try:
+        cached = redis_client.get(redis_key)
+        if cached:
+            FAQ_CACHE_LOOKUPS.labels(result="hit").inc()
+            return json.loads(cached)
+    except redis.RedisError as e:
+        print(f"Failed to read FAQ cache: {e}")
+
+    conn = connection_pool.getconn()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT questions FROM faq_questions WHERE title_hash = %s", (key_hash,))
+        row = cursor.fetchone()
+        cursor.close()
+    except Exception as e:
+        print(f"Failed to read stored FAQs: {e}")
+        conn.rollback()
+        row = None
+    finally:
+        connection_pool.putconn(conn)
+
+    if not row:
+        FAQ_CACHE_LOOKUPS.labels(result="miss").inc()
         return None
 
+    FAQ_CACHE_LOOKUPS.labels(result="db_hit").inc()
+    try:
+        redis_client.set(redis_key, json.dumps(row[0]), ex=FAQ_CACHE_TTL)
+    except redis.RedisError as e:
+        print(f"Failed to write FAQ cache: {e}")
+    return row[0]
+
+def store_faqs(titled_faqs):
+    """Persist {title: faq_dict} in one statement and one pipeline."""
+    rows = {title_hash(title): (title_hash(title), title, json.dumps(faqs)) for title, faqs in titled_faqs.items()}
+    if not rows:
+        return
+
+    conn = connection_pool.getconn()
+    try:
+        cursor = conn.cursor()
+        extras.execute_values(cursor, """
+            INSERT INTO faq_questions (title_hash, title, questions)
+            VALUES %s
+            ON CONFLICT (title_hash)
+            DO UPDATE SET questions = EXCLUDED.questions, created_at = NOW()
+        """, list(rows.values()))
+        conn.commit()
+        cursor.close()
+    except Exception as e:
+        print(f"Failed to store FAQs: {e}")
+        conn.rollback()
+    finally:
+        connection_pool.putconn(conn)
+
+    try:
+        pipe = redis_client.pipeline()
+        for key_hash, _, questions in rows.values():
+            pipe.set(faq_cache_key(key_hash), questions, ex=FAQ_CACHE_TTL)
+        pipe.execute()
+    except redis.RedisError as e:
+        print(f"Failed to write FAQ cache: {e}")
+
+def get_faqs(title):
+    """FAQ questions for a title: cached if we've seen the title before, otherwise generated and stored."""
+    faqs = get_cached_faqs(title)
+    if faqs:
+        return faqs
+
+    faqs = generate_faqs(title)
+    if faqs:
+        store_faqs({title: faqs})
+    return faqs
+
+def precompute_faqs(titles):
+    """Generate and store questions for the titles that don't have any yet, FAQ_PRECOMPUTE_WORKERS at a time."""
+    titles = list(dict.fromkeys(title for title in titles if title))
+    if not titles:
+        return
+
+    conn = connection_pool.getconn()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT title_hash FROM faq_questions WHERE title_hash = ANY(%s)",
+            ([title_hash(title) for title in titles],)
+        )
+        known = {row[0] for row in cursor.fetchall()}
+        cursor.close()
+    finally:
+        connection_pool.putconn(conn)
+
+    missing = [title for title in titles if title_hash(title) not in known]
+    if not missing:
+        return
+
+    step_start = time.time()
+    with ThreadPoolExecutor(max_workers=FAQ_PRECOMPUTE_WORKERS) as executor:
+        generated = dict(zip(missing, executor.map(generate_faqs, missing)))
+    store_faqs({title: faqs for title, faqs in generated.items() if faqs})
+    print(f"Precomputed FAQs for {sum(1 for faqs in generated.values() if faqs)}/{len(missing)} new titles "
+          f"in {time.time() - step_start:.2f}s")
+
 #Functions
 def extract_video_id(url):
     patterns = [
@@ -534,7 +1895,7 @@ def get_video_title(video_id):
     }
 
     try:
-        response = requests.get(url, headers=headers, params=querystring)
+        response = http_get(url, headers=headers, params=querystring)
         response.raise_for_status()
         
         data = response.json()
@@ -554,6 +1915,19 @@ def get_video_title(video_id):
         print(f"Error extracting title: {e}")
         return None
 
+def parse_video_info(data):
+    """[title, English caption URL or None, duration] from a yt-api video/info response."""
+    title = data["title"]
+    duration= data["lengthSeconds"]
+
+    subtitles_data = data.get('subtitles', {}).get('subtitles', [])
+    for subtitle in subtitles_data:
+        if subtitle.get('languageName') == 'English' or subtitle.get('languageCode') == 'en':
+            subs = subtitle.get('url')
+            return [title, subs, duration]
+
+    return [title, None, duration]
+
 #https://rapidapi.com/ytjar/api/yt-api
 def get_video_title_and_xmlUrl(video_id):
     url = "https://yt-api.p.rapidapi.com/video/info"
@@ -564,36 +1938,32 @@ def get_video_title_and_xmlUrl(video_id):
     params = {"id": video_id}
 
     try:
-        response = requests.get(url, headers=headers, params=params)
+        response = http_get(url, headers=headers, params=params)
         response.raise_for_status()
-        data = response.json()
-        title = data["title"]
-        duration= data["lengthSeconds"]
-
-        subtitles_data = data.get('subtitles', {}).get('subtitles', [])
-        for subtitle in subtitles_data:
-            if subtitle.get('languageName') == 'English' or subtitle.get('languageCode') == 'en':
-                subs = subtitle.get('url')
-                return [title, subs, duration]
-
-        return [title, None, duration]
+        return parse_video_info(response.json())
+    except QuotaExceededError:
+        raise
     except (requests.exceptions.RequestException, KeyError):
         return None
 
 def get_transcript_from_xml_url(xml_url):
   try:
-    response = requests.get(xml_url)
-
-    if response.status_code == 200:
-      root = ET.fromstring(response.text)
-
-      text = ' '.join([elem.text for elem in root.iter() if elem.text])
+    # Parse the caption track as it downloads instead of buffering the whole document
+    response = http_get(xml_url, stream=True)
+    try:
+      if response.status_code == 200:
+        response.raw.decode_content = True
+        fmt = caption_format(xml_url, response.headers.get("Content-Type", ""))
 
-      return {"transcript": text}
-    else:
-      return ""
-  except (requests.exceptions.RequestException, ET.ParseError) as e:
-    return {"error": f"Error processing XML: {str(e)}"}
+        # Segments are normalized as they're parsed, so only the merged text is ever held in memory
+        return normalize_transcript(iter_caption_segments(response.raw, fmt))
+      else:
+        return None
+    finally:
+      response.close()
+  except (requests.exceptions.RequestException, ET.ParseError, ValueError) as e:
+    print(f"Error processing XML: {e}")
+    return None
 
 #https://rapidapi.com/8v2FWW4H6AmKw89/api/youtube-transcripts
 def Youtube_Transcripts(video_id):
@@ -606,17 +1976,17 @@ def Youtube_Transcripts(video_id):
     params = {"videoId": video_id, "chunkSize": "500"}
     print("0")
     try:
-        response = requests.get(rapid_api_url, headers=headers, params=params)
+        response = http_get(rapid_api_url, headers=headers, params=params)
         response.raise_for_status()
 
         if response.status_code == 200:
-            transcript = [item["text"] for item in response.json().get("content", [])]
-            ans = " ".join(transcript)
-            return ans
+            return [item["text"] for item in response.json().get("content", [])]
         else:
             print("Error: Could not fetch transcript")
             return None
 
+    except QuotaExceededError:
+        raise
     except requests.exceptions.RequestException as e:
         print(f"Request failed: {e}")
         return None
@@ -634,7 +2004,7 @@ def Youtube_Transcript(video_id):
             "x-rapidapi-host": "youtube-transcript3.p.rapidapi.com"
         }
 
-        response = requests.get(url, headers=headers, params=querystring)
+        response = http_get(url, headers=headers, params=querystring)
     
         transcript = response.json().get("transcript", [])
         
@@ -643,8 +2013,11 @@ def Youtube_Transcript(video_id):
         return text
 
 
+    except QuotaExceededError:
+        raise
     except Exception as e:
-        return jsonify({"error": "An error occurred.", "details": str(e)}), 500
+        print(f"Request failed: {e}")
+        return None
 
 #https://rapidapi.com/timetravellershq/api/youtube-transcripts-api
 #this might not be working
@@ -658,7 +2031,7 @@ def Youtube_Transcripts_API_failing(video_id):
         "x-rapidapi-host": "youtube-transcripts-api.p.rapidapi.com"
     }
 
-    response = requests.get(url, headers=headers, params=querystring)
+    response = http_get(url, headers=headers, params=querystring)
 
     if response.status_code == 200:
         transcript = [item['text'] for item in response.json().get('content', [])]
@@ -687,7 +2060,7 @@ def YouTubeTextConverter_failing(video_id):
     }
 
     try:
-        response = requests.get(url, headers=headers, params=querystring)
+        response = http_get(url, headers=headers, params=querystring)
         
         response.raise_for_status()
 
@@ -701,33 +2074,429 @@ def YouTubeTextConverter_failing(video_id):
         print(f"Request failed: {e}")
         return None
 
-current_transcript_index = 0
 transcript_functions.append(Youtube_Transcripts)
 transcript_functions.append(Youtube_Transcript)
 # transcript_functions.append(Youtube_Transcripts_API_failing)
 # transcript_functions.append(YouTubeTextConverter_failing)
 
-def roundRobinTranscript(video_id):
-    global current_transcript_index
-    max_attempts = len(transcript_functions)
+def is_valid_transcript(transcript):
+    return bool(transcript) and isinstance(transcript, (str, list))
 
-    for attempt in range(max_attempts):
-        current_function = transcript_functions[current_transcript_index]
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
 
-        current_transcript_index = (current_transcript_index + 1) % len(transcript_functions)
+def provider_samples_key(provider_name):
+    return f"transcript_provider:samples:{provider_name}"
 
-        try:
-            transcript = current_function(video_id)
-            if transcript:
-                return transcript
-        except Exception as e:
-            print(f"Error occurred while trying {current_function.__name__}: {e}")
+def queue_provider_sample(pipe, provider_name, ok, latency):
+    """Queue one call's outcome on `pipe`, keeping the last PROVIDER_STATS_WINDOW."""
+    key = provider_samples_key(provider_name)
+    pipe.lpush(key, f"{int(ok)}:{latency:.3f}")
+    pipe.ltrim(key, 0, PROVIDER_STATS_WINDOW - 1)
+
+def observe_provider_call(provider_name, ok, latency):
+    TRANSCRIPT_PROVIDER_SECONDS.labels(provider=provider_name).observe(latency)
+    TRANSCRIPT_PROVIDER_CALLS.labels(provider=provider_name, outcome="success" if ok else "failure").inc()
+
+def record_provider_sample(provider_name, ok, latency):
+    try:
+        pipe = redis_client.pipeline()
+        queue_provider_sample(pipe, provider_name, ok, latency)
+        pipe.execute()
+    except redis.RedisError as e:
+        print(f"Failed to record stats for {provider_name}: {e}")
+
+def get_provider_stats(functions=None):
+    """Rolling success rate and p50/p95 latency of successful calls, per transcript provider."""
+    functions = functions or transcript_functions
+    try:
+        pipe = redis_client.pipeline()
+        for func in functions:
+            pipe.lrange(provider_samples_key(func.__name__), 0, -1)
+        all_samples = pipe.execute()
+    except redis.RedisError as e:
+        print(f"Failed to read transcript provider stats: {e}")
+        all_samples = [[] for _ in functions]
+
+    stats = {}
+    for func, samples in zip(functions, all_samples):
+        parsed = [(flag == "1", float(latency)) for flag, latency in (sample.split(":") for sample in samples)]
+        latencies = sorted(latency for ok, latency in parsed if ok)
+        stats[func.__name__] = {
+            "samples": len(parsed),
+            "success_rate": sum(ok for ok, _ in parsed) / len(parsed) if parsed else None,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+        }
+    return stats
+
+def rank_transcript_providers():
+    """Healthy providers fastest-first, then degraded ones by success rate."""
+    stats = get_provider_stats()
+
+    def sort_key(func):
+        provider = stats[func.__name__]
+        rate = provider["success_rate"]
+        healthy = rate is None or rate >= PROVIDER_MIN_SUCCESS_RATE
+        p50 = provider["p50"] if provider["p50"] is not None else HEDGE_DEFAULT_DELAY
+        return (not healthy, -(rate or 0) if not healthy else p50)
+
+    ranked = sorted(transcript_functions, key=sort_key)
+    return ranked, stats
+
+def hedge_delay(provider_stats):
+    if provider_stats["p95"] is None:
+        return HEDGE_DEFAULT_DELAY
+    return min(HEDGE_MAX_DELAY, max(HEDGE_MIN_DELAY, provider_stats["p95"]))
+
+def run_transcript_provider(func, video_id):
+    start = time.time()
+    try:
+        transcript = func(video_id)
+    except QuotaExceededError as e:
+        # Our own budget turned the call away; the provider wasn't tried, so it's not a health sample
+        print(f"Skipped {func.__name__}: {e}")
+        TRANSCRIPT_PROVIDER_CALLS.labels(provider=func.__name__, outcome="quota").inc()
+        return None
+    except Exception as e:
+        print(f"Error occurred while trying {func.__name__}: {e}")
+        transcript = None
+    ok = is_valid_transcript(transcript)
+    elapsed = time.time() - start
+    record_provider_sample(func.__name__, ok, elapsed)
+    observe_provider_call(func.__name__, ok, elapsed)
+    return transcript
+
+def hedgedTranscript(video_id):
+    """
+    Race the transcript providers. The fastest healthy provider starts first; if it hasn't
+    answered within its p95 latency (or fails), the next one is fired alongside it.
+    The first valid transcript wins and the remaining calls are cancelled.
+    """
+    ranked, stats = rank_transcript_providers()
+    print("Transcript provider order:", [func.__name__ for func in ranked])
+
+    deadline = time.time() + TRANSCRIPT_RACE_TIMEOUT
+    running = {}
+    queue = list(ranked)
+    launch_next = False
+
+    try:
+        while queue or running:
+            if queue and (not running or launch_next):
+                func = queue.pop(0)
+                running[transcript_executor.submit(run_transcript_provider, func, video_id)] = func
+                delay = hedge_delay(stats[func.__name__])
+
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            timeout = min(delay, remaining) if queue else remaining
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            # Hedge when the current provider is slow or one of the in-flight calls failed
+            launch_next = True
+            for future in done:
+                func = running.pop(future)
+                transcript = future.result()
+                if is_valid_transcript(transcript):
+                    print(f"Transcript from {func.__name__}")
+                    return transcript
+    finally:
+        for future in running:
+            future.cancel()
 
     print("Failed to retrieve transcript using all available methods.")
-    return None  # Or raise an exception here if you prefer
+    return None
+
+def run_stage_graph(stages, timeouts=STAGE_TIMEOUTS, on_stage=None):
+    """
+    Run a small dependency graph of pipeline stages on pipeline_executor.
+    :param stages: dict of name -> (func, [dependency names]); func is called with the
+                   dependency results as positional args, in the order listed
+    :param on_stage: optional callback, called with each stage's name as it finishes
+    :return: (results, timings) dicts keyed by stage name
+    Stages start as soon as their dependencies finish. If any stage raises or runs past
+    its timeout, stages that haven't started are cancelled and the error is re-raised.
+    """
+    pending = dict(stages)
+    results = {}
+    timings = {}
+    started = {}
+    running = {}
+
+    try:
+        while pending or running:
+            for name, (func, deps) in list(pending.items()):
+                if all(dep in results for dep in deps):
+                    args = [results[dep] for dep in deps]
+                    started[name] = time.time()
+                    running[pipeline_executor.submit(func, *args)] = name
+                    del pending[name]
+
+            if not running:
+                raise ValueError(f"Unsatisfiable stage dependencies: {', '.join(pending)}")
+
+            deadline = min(started[name] + timeouts.get(name, DEFAULT_STAGE_TIMEOUT) for name in running.values())
+            done, _ = wait(running, timeout=max(0, deadline - time.time()), return_when=FIRST_COMPLETED)
+
+            if not done:
+                expired = [name for name in running.values()
+                           if time.time() >= started[name] + timeouts.get(name, DEFAULT_STAGE_TIMEOUT)]
+                raise StageTimeoutError(f"Stage timed out: {', '.join(expired)}")
+
+            for future in done:
+                name = running.pop(future)
+                timings[name] = time.time() - started[name]
+                print(f"Time to {name}: {timings[name]:.2f}s")
+                SUMMARIZE_STAGE_SECONDS.labels(stage=name).observe(timings[name])
+                results[name] = future.result()
+                if on_stage:
+                    on_stage(name)
+    finally:
+        # Threads that are already running can't be interrupted, but nothing queued should start
+        for future in running:
+            future.cancel()
+
+    return results, timings
+
+def fetch_video_metadata(video_id):
+    metadata = get_video_title_and_xmlUrl(video_id) #TODO: Eventually switch to youtube api
+    if metadata is None:
+        raise ValueError(f"Could not fetch video metadata for {video_id}")
+
+    title, xml_url, duration = metadata
+    print(f"Youtube Title: {title}, Video Duration: {duration}")
+    print(f"Video ID: {video_id}")
+
+    return metadata
+
+def transcript_segments(transcript):
+    """
+    Flatten the shapes the transcript sources return (str, a list or iterator of str, dicts or
+    (start, duration, text) tuples, {"transcript": ...}) into segment texts, lazily, so a streaming
+    caption parser is consumed one segment at a time. Caption timestamps stop here: transcripts are
+    stored and summarized as plain text, and split_transcript chunks by sentences, not by time.
+    """
+    if isinstance(transcript, dict):
+        transcript = transcript.get("transcript", transcript.get("content"))
+    if isinstance(transcript, str):
+        yield transcript
+        return
+    if transcript is None:
+        return
+    for part in transcript:
+        yield part.get("text", "") if isinstance(part, dict) else part[-1] if isinstance(part, tuple) else str(part)
+
+def clean_caption_segment(segment):
+    segment = CAPTION_TAG_PATTERN.sub(" ", segment)
+    # Captions are often double-escaped ("&amp;#39;"), so unescape until the text is stable
+    for _ in range(2):
+        unescaped = html.unescape(segment)
+        if unescaped == segment:
+            break
+        segment = unescaped
+    segment = CAPTION_ESCAPED_TAG_PATTERN.sub(" ", segment)
+    segment = NON_SPEECH_PATTERN.sub(" ", segment)
+    segment = FILLER_PATTERN.sub("", segment)
+    return segment.split()
+
+def merge_caption_segments(segments):
+    """
+    Join caption segments, dropping the words a segment repeats from the end of the text before it.
+    Rolling auto-captions re-emit the previous line at the start of each new one. Only overlaps of
+    at least CAPTION_MIN_OVERLAP words count, and a segment always keeps at least one word, so a
+    segment that just repeats the tail ("yes", "yes") is speech, not a rolled-over line.
+    """
+    words = []
+    keys = []
+    for segment in segments:
+        segment_words = clean_caption_segment(segment)
+        if not segment_words:
+            continue
+        segment_keys = [re.sub(r"[^\w']", "", word.lower()) for word in segment_words]
+
+        overlap = 0
+        tail = keys[-CAPTION_OVERLAP_WINDOW:]
+        for size in range(min(len(tail), len(segment_keys) - 1), CAPTION_MIN_OVERLAP - 1, -1):
+            if tail[-size:] == segment_keys[:size]:
+                overlap = size
+                break
+
+        words.extend(segment_words[overlap:])
+        keys.extend(segment_keys[overlap:])
+    return " ".join(words)
+
+def fit_token_budget(text, max_tokens=TRANSCRIPT_MAX_TOKENS):
+    """Cut text to max_tokens, at the last sentence (or word) boundary before the limit."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    boundary = max(cut.rfind(". "), cut.rfind("? "), cut.rfind("! "))
+    if boundary < max_chars // 2:
+        boundary = cut.rfind(" ")
+    return cut[:boundary + 1].strip() if boundary > 0 else cut
+
+def normalize_transcript(transcript):
+    """
+    Decode, de-duplicate and strip caption artifacts from any provider's transcript; returns text or None.
+    Runs once per fetch, before the transcript is stored, so it also records the raw and normalized sizes.
+    """
+    raw_chars = 0
+
+    def counted(segments):
+        nonlocal raw_chars
+        for segment in segments:
+            raw_chars += len(segment) + 1
+            yield segment
+
+    text = merge_caption_segments(counted(transcript_segments(transcript)))
+    if not text:
+        return None
+
+    raw_tokens = raw_chars // CHARS_PER_TOKEN + 1
+    normalized_tokens = estimate_tokens(text)
+    print(f"Transcript tokens: {raw_tokens} raw, {normalized_tokens} normalized")
+    TRANSCRIPT_TOKENS.labels(stage="raw").observe(raw_tokens)
+    TRANSCRIPT_TOKENS.labels(stage="normalized").observe(normalized_tokens)
+    return text
+
+def prepare_transcript(text, max_tokens=TRANSCRIPT_MAX_TOKENS):
+    """Cap a normalized transcript (what fetch_transcript returns) at what the summary pipeline will take."""
+    if not text:
+        return None
+
+    normalized_tokens = estimate_tokens(text)
+    text = fit_token_budget(text, max_tokens)
+    sent_tokens = estimate_tokens(text)
+    if sent_tokens < normalized_tokens:
+        print(f"Transcript truncated: {normalized_tokens} -> {sent_tokens} tokens")
+    TRANSCRIPT_TOKENS.labels(stage="sent").observe(sent_tokens)
+    return text
+
+def transcript_cache_key(video_id, language=TRANSCRIPT_LANGUAGE):
+    return f"cache:transcript:{video_id}:{language}"
+
+def compress_transcript(transcript):
+    return zlib.compress(transcript.encode("utf-8"))
+
+def decompress_transcript(data):
+    return zlib.decompress(data).decode("utf-8")
+
+def get_stored_transcript(video_id, language=TRANSCRIPT_LANGUAGE):
+    redis_key = transcript_cache_key(video_id, language)
+    try:
+        cached = redis_binary_client.get(redis_key)
+        if cached:
+            print(f"Transcript cache hit for {redis_key}")
+            return decompress_transcript(cached)
+    except (redis.RedisError, zlib.error) as e:
+        print(f"Failed to read transcript cache: {e}")
+
+    conn = connection_pool.getconn()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            '''
+            SELECT transcript
+            FROM transcripts
+            WHERE video_id = %s AND language = %s
+            ''',
+            (video_id, language)
+        )
+        row = cursor.fetchone()
+        cursor.close()
+    except Exception as e:
+        print(f"Failed to read stored transcript: {e}")
+        conn.rollback()
+        row = None
+    finally:
+        connection_pool.putconn(conn)
+
+    if not row:
+        return None
+
+    print(f"Transcript DB hit for {video_id}")
+    try:
+        redis_binary_client.set(redis_key, compress_transcript(row[0]), ex=TRANSCRIPT_CACHE_TTL)
+    except redis.RedisError as e:
+        print(f"Failed to write transcript cache: {e}")
+    return row[0]
+
+def store_transcript(video_id, transcript, source, language=TRANSCRIPT_LANGUAGE):
+    try:
+        redis_binary_client.set(transcript_cache_key(video_id, language), compress_transcript(transcript), ex=TRANSCRIPT_CACHE_TTL)
+    except redis.RedisError as e:
+        print(f"Failed to write transcript cache: {e}")
+
+    conn = connection_pool.getconn()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            '''
+            INSERT INTO transcripts (video_id, language, transcript, source, fetched_at)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (video_id, language)
+            DO UPDATE SET
+                transcript = EXCLUDED.transcript,
+                source = EXCLUDED.source,
+                fetched_at = EXCLUDED.fetched_at
+            ''',
+            (video_id, language, transcript, source, datetime.now(timezone.utc))
+        )
+        conn.commit()
+        cursor.close()
+    except Exception as e:
+        print(f"Failed to store transcript: {e}")
+        conn.rollback()
+        return False
+    finally:
+        connection_pool.putconn(conn)
+    return True
+
+def fetch_transcript(video_id, xml_url):
+    """Read-through transcript lookup: store first, then the caption XML, then the provider race."""
+    step_start = time.time()
+    transcript = get_stored_transcript(video_id)
+    print(f"Time to check transcript store: {time.time() - step_start:.2f}s")
+    if transcript:
+        return transcript
+
+    # Get transcript from XML URL if available
+    if xml_url:
+        print(f"There is an XML URL: {xml_url}\n")
+        step_start = time.time()
+        transcript = get_transcript_from_xml_url(xml_url)
+        print(f"Time to get transcript: {time.time() - step_start:.2f}s")
+        if transcript:
+            print("XML Succeeded")
+            store_transcript(video_id, transcript, "xml")
+            return transcript
+        print("XML FAILED")
+    else:
+        print("There is NO XML URL")
+
+    # Fallback transcript if no XML transcript
+    print("Fallback transcript fetch through api")
+    step_start = time.time()
+    transcript = normalize_transcript(hedgedTranscript(video_id))
+    print(f"Time to get fallback transcript: {time.time() - step_start:.2f}s")
+
+    #TODO: throw exception if there's still no summary
+    if transcript:
+        store_transcript(video_id, transcript, "provider")
+    return transcript
 
 def get_video_summary(transcript):
     print("\n\nTALKING TO GPT RIGHT NOW!!!!!!\n\n")
+    # No map step here, so the whole transcript has to fit one call
+    transcript = prepare_transcript(transcript, TRANSCRIPT_TOKEN_BUDGET)
+    if not transcript:
+        return None
     try:
         completion = client.chat.completions.create(
             model="gpt-4o-mini",
@@ -778,7 +2547,7 @@ def get_video_summary(transcript):
 
 def ping_self():
     try:
-        response = requests.get(
+        response = http_get(
             "https://renderbackend-xfh6.onrender.com/ping",
             headers={"User-Agent": "Flask-Ping-Bot"}
         )
@@ -789,126 +2558,794 @@ def ping_self():
     except Exception as e:
         print(f"Error while pinging the server: {e}")
 
-def update_popular_videos_cache():
+def refresh_popular_and_summaries_cache():
+    """
+    Rebuild the popular video pages and their cached summaries as one new cache generation.
+    Summaries for every video on any page are written under the new generation prefix, then the
+    pages and the generation pointer are set by one fenced script, so readers switch over
+    atomically and never see an empty cache. Entries from older generations are left to expire.
+    """
     try:
-        print("Updating popular videos cache...")
+        print("Refreshing popular videos and summaries cache...")
+
+        pages = build_popular_pages()
+        video_ids = list({video["video_id"] for page in pages for video in page})
 
         conn = connection_pool.getconn()
-        cursor = conn.cursor()
+        try:
+            cursor = conn.cursor()
+            # Fetch summaries for these video IDs from the database
+            cursor.execute("""
+                SELECT video_id, youtube_title, description, key_points, faqs
+                FROM summaries
+                WHERE video_id = ANY(%s);
+            """, (video_ids,))
+            summary_rows = cursor.fetchall()
+            cursor.close()
+        finally:
+            connection_pool.putconn(conn)
 
-        cursor.execute("""
-           WITH recent_videos AS (
-                SELECT *
-                FROM trending_videos
-                WHERE published_at >= NOW() - INTERVAL '30 days'
-            ),
-            unique_channel_videos AS (
-                SELECT DISTINCT ON (channel_id) video_id, title, channel_id
-                FROM recent_videos
-                ORDER BY channel_id, RANDOM()  -- pick random video per channel
-            ),
-            first_8 AS (
-                SELECT *
-                FROM unique_channel_videos
-                ORDER BY RANDOM()   -- randomize channel selection
-                LIMIT 8
+        print(f"Built {len(pages)} popular pages over {len(video_ids)} videos, fetched {len(summary_rows)} summaries from the database.")
+
+        token = fencing_token()
+        if not token:
+            print("Skipping cache refresh: this process is not the scheduler leader")
+            return
+
+        generation = redis_client.incr(SUMMARY_GENERATION_COUNTER_KEY)
+        pipe = redis_client.pipeline(transaction=False)
+        for video_id, *columns in summary_rows:
+            pipe.set(summary_cache_key(generation, video_id), json.dumps(summary_from_row(*columns)), ex=summary_cache_ttl())
+        pipe.execute()
+
+        # Nothing reads the new generation's keys until this flips the pointer
+        published = publish_generation_script(
+            keys=[LEADER_FENCING_KEY, POPULAR_PAGES_KEY, "cache:popular_videos", SUMMARY_GENERATION_KEY],
+            args=[token, generation, POPULAR_PAGES_TTL, *[json.dumps(page) for page in pages]],
+        )
+        if not published:
+            print(f"Cache generation {generation} not published: fencing token {token} is stale")
+            return
+        summary_generation.update(value=str(generation), fetched_at=time.time())
+
+        print(f"✅ Cache generation {generation} is live.")
+
+    except Exception as e:
+        print(f"❌ Error refreshing popular videos and summaries cache: {e}")
+
+def build_summary_payload(video_id, title, response):
+    """Validate a parsed model response and shape it into the /summarize JSON; returns (payload, status)."""
+    # Fix spacing and extract parts
+    step_start = time.time()
+    description = response["description"]
+    key_points = fix_bullet_spacing(response["key_points"])
+    faqs = response["faqs"]
+    print(f"Time to validate output: {time.time() - step_start:.2f}s")
+    SUMMARIZE_STAGE_SECONDS.labels(stage="parse").observe(time.time() - step_start)
+
+    # Exception handling for missing data
+    missing_fields = []
+    if not description:
+        missing_fields.append("description")
+    if not key_points:
+        missing_fields.append("key_points")
+    if not faqs:
+        missing_fields.append("faqs")
+
+    if missing_fields:
+        missing_str = ", ".join(missing_fields)
+        return {
+            "message": random.choice(errors_messages),
+            "error": f"Missing fields: {missing_str}",
+            "video_id": video_id
+        }, 400
+
+    return {
+        "title": title,
+        "description": description,
+        "key_points": key_points,
+        "faqs": faqs,
+        "video_id": video_id,
+        "needs_logging": True,
+    }, 200
+
+def cached_summary_payload(video_id, cached):
+    return {
+        "title": cached["youtube_title"],
+        "description": cached["description"],
+        "key_points": cached["keypoints"],
+        "faqs": cached["faqs"],
+        "video_id": video_id,
+        "needs_logging": False,
+    }
+
+def check_summary_inputs(video_id, transcript, faq_dict, mode):
+    """The summary stage's inputs, or a ValueError naming the one that came back empty."""
+    if not transcript:
+        raise ValueError(f"No transcript available for {video_id}")
+    if mode != "single_pass" and not faq_dict:
+        raise ValueError(f"Could not generate viewer questions for {video_id}")
+    return transcript, faq_dict
+
+def log_pipeline_timings(pipeline_start, timings):
+    pipeline_time = time.time() - pipeline_start
+    stage_total = sum(timings.values())
+    print(f"Pipeline wall-clock: {pipeline_time:.2f}s | Sum of stages: {stage_total:.2f}s | "
+          f"Saved by overlap: {stage_total - pipeline_time:.2f}s")
+
+def error_payload(e):
+    return {
+        "error": str(e),
+        "message": random.choice(errors_messages),
+    }
+
+def summary_error(e):
+    """(payload, status) for a failed run: 503 when our own budget turned it away, else 400."""
+    return error_payload(e), 503 if isinstance(e, QuotaExceededError) else 400
+
+def summarize_video(video_id, mode=None, on_stage=None):
+    """
+    Cache-miss path of /summarize. Returns (payload, status) rather than a Flask response
+    so the result can be shared with coalesced waiters in other workers.
+    :param mode: one of SUMMARY_MODES, defaults to SUMMARY_MODE
+    :param on_stage: passed to run_stage_graph, for progress reporting
+    """
+    mode = mode or SUMMARY_MODE
+    try:
+        # Metadata gates both FAQs (needs the title) and the transcript (needs the caption URL),
+        # which then run side by side; the summary waits on both
+        pipeline_start = time.time()
+        stages = {
+            "metadata": (lambda: fetch_video_metadata(video_id), []),
+            "faqs": (lambda metadata: get_faqs(metadata[0]), ["metadata"]),
+            "transcript": (lambda metadata: fetch_transcript(video_id, metadata[1]), ["metadata"]),
+            "summary": (
+                lambda faq_dict, transcript: summarize_transcript(
+                    *check_summary_inputs(video_id, transcript, faq_dict, mode)),
+                ["faqs", "transcript"]
             ),
-            remaining AS (
-                SELECT video_id, title
-                FROM recent_videos
-                WHERE video_id NOT IN (SELECT video_id FROM first_8)
+        }
+        if mode == "single_pass":
+            # No separate FAQ call; the summary takes the title straight from the metadata
+            del stages["faqs"]
+            stages["summary"] = (
+                lambda metadata, transcript: summarize_transcript(
+                    *check_summary_inputs(video_id, transcript, None, mode), mode, metadata[0]),
+                ["metadata", "transcript"]
             )
-            SELECT video_id, title AS youtube_title
-            FROM first_8
-            UNION ALL
-            SELECT video_id, title AS youtube_title
-            FROM remaining
-            LIMIT 8;
-        """)
+        results, timings = run_stage_graph(stages, on_stage=on_stage)
+        log_pipeline_timings(pipeline_start, timings)
+
+        title = results["metadata"][0]
+        response = results["summary"]
+
+        return build_summary_payload(video_id, title, response)
+    except Exception as e:
+        return summary_error(e)
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def summary_result_event(payload, status):
+    return sse_event("done" if status == 200 else "error", payload)
+
+def summarize_video_stream(video_id, refresh=False, mode=None):
+    """
+    Streaming variant of /summarize as Server-Sent Events: a "stage" event as each pipeline stage
+    finishes, then "done" with the same JSON the non-streaming route returns, or "error". It runs
+    through single_flight like /summarize, so streams and requests for the same video and mode
+    share one run; a stream that joins another worker's run gets no stage events, only the result.
+    """
+    mode = mode or SUMMARY_MODE
+    start_total = time.time()
+    try:
+        if not refresh:
+            cached = get_cached_summary(video_id)
+            if cached:
+                yield sse_event("done", cached_summary_payload(video_id, cached))
+                return
+
+        events = queue.Queue()
+
+        def on_stage(name):
+            events.put(("stage", {"stage": name}))
+
+        def run():
+            try:
+                result = single_flight(video_id, mode, lambda: summarize_video(video_id, mode, on_stage))
+            except Exception as e:
+                result = error_payload(e), 500
+            events.put(("result", result))
+
+        threading.Thread(target=run, daemon=True).start()
+        while True:
+            try:
+                event, data = events.get(timeout=15.0)
+            except queue.Empty:
+                # Keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+                continue
+            if event == "result":
+                yield summary_result_event(*data)
+                break
+            yield sse_event(event, data)
+        print(f"Total processing time: {time.time() - start_total:.2f}s")
+
+    except Exception as e:
+        yield sse_event("error", error_payload(e))
+
+def keep_lock_alive(lock_key, token, ttl, interval, stop_event):
+    while not stop_event.wait(interval):
+        if not renew_lock_script(keys=[lock_key], args=[token, ttl]):
+            print(f"Lost lock {lock_key}")
+            return
+
+def single_flight_keys(video_id, mode):
+    """Lock key, result key prefix and channel of a video's run in `mode`."""
+    # The modes produce different summaries, so only requests for the same mode coalesce
+    flight = f"{video_id}:{mode or SUMMARY_MODE}"
+    return f"singleflight:lock:{flight}", f"singleflight:result:{flight}", f"singleflight:channel:{flight}"
+
+def single_flight_message(token, payload, status):
+    return json.dumps({"token": token, "payload": payload, "status": status})
+
+def single_flight_result(message, leader):
+    """(payload, status) from a result message, or None if it's from another run than `leader`'s."""
+    result = json.loads(message)
+    if result.get("token") != leader:
+        return None
+    return result["payload"], result["status"]
+
+def single_flight(video_id, mode, compute):
+    """
+    Coalesce concurrent work for the same video and summary mode across threads and worker
+    processes. The first caller takes a Redis lock and runs compute(); everyone else subscribes
+    to the result channel and gets the same (payload, status) back. If the leader dies (its
+    lock expires without a result) or the wait runs out, the waiter runs compute() itself.
+    Results are stored under the leader's token (the lock's value), so a waiter only ever takes
+    the result of the run it is waiting on, never one left over from an earlier run.
+    """
+    lock_key, result_prefix, channel = single_flight_keys(video_id, mode)
+    token = str(uuid.uuid4())
+
+    def lead():
+        stop_event = threading.Event()
+        threading.Thread(
+            target=keep_lock_alive,
+            args=(lock_key, token, SINGLE_FLIGHT_LOCK_TTL, SINGLE_FLIGHT_RENEW_INTERVAL, stop_event),
+            daemon=True
+        ).start()
+        try:
+            payload, status = compute()
+            message = single_flight_message(token, payload, status)
+            redis_client.set(f"{result_prefix}:{token}", message, ex=SINGLE_FLIGHT_RESULT_TTL)
+            redis_client.publish(channel, message)
+            return payload, status
+        finally:
+            stop_event.set()
+            release_lock_script(keys=[lock_key], args=[token])
+
+    if redis_client.set(lock_key, token, nx=True, ex=SINGLE_FLIGHT_LOCK_TTL):
+        print(f"Single-flight leader for {video_id}")
+        return lead()
+
+    print(f"Single-flight waiting on leader for {video_id}")
+    pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(channel)
+    try:
+        leader = redis_client.get(lock_key)
+        deadline = time.time() + SINGLE_FLIGHT_WAIT
+        while time.time() < deadline:
+            # Checked after subscribing so a result published in between isn't missed
+            message = redis_client.get(f"{result_prefix}:{leader}") if leader else None
+            if message:
+                return single_flight_result(message, leader)
+
+            event = pubsub.get_message(timeout=1.0)
+            result = single_flight_result(event["data"], leader) if event else None
+            if result:
+                return result
+
+            current = redis_client.get(lock_key)
+            if current:
+                # Still running, possibly under a leader that took over from a dead one
+                leader = current
+                continue
+            if leader and redis_client.exists(f"{result_prefix}:{leader}"):
+                continue
+            if redis_client.set(lock_key, token, nx=True, ex=SINGLE_FLIGHT_LOCK_TTL):
+                print(f"Single-flight leader for {video_id} died, taking over")
+                return lead()
+    finally:
+        pubsub.close()
+
+    print(f"Single-flight wait expired for {video_id}, running pipeline directly")
+    return compute()
+
+def enqueue_presummarize(video_ids):
+    if not PRESUMMARIZE_ENABLED or not video_ids:
+        return
+    try:
+        pipe = redis_client.pipeline()
+        for video_id in video_ids:
+            pipe.xadd(PRESUMMARIZE_STREAM, {"video_id": video_id})
+        pipe.execute()
+        print(f"Queued {len(video_ids)} trending videos for pre-summarization")
+    except redis.RedisError as e:
+        print(f"Failed to queue videos for pre-summarization: {e}")
+
+def ensure_presummarize_group():
+    try:
+        redis_client.xgroup_create(PRESUMMARIZE_STREAM, PRESUMMARIZE_GROUP, id="0", mkstream=True)
+    except redis.ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+def read_presummarize_batch(count):
+    # Entries a previous run left pending (quota hit, process died) come first
+    _, entries, *_ = redis_client.xautoclaim(
+        PRESUMMARIZE_STREAM, PRESUMMARIZE_GROUP, WORKER_ID,
+        min_idle_time=PRESUMMARIZE_CLAIM_IDLE_MS, count=count
+    )
+    entries = [entry for entry in entries if entry[1]]
+    if entries:
+        return entries
+
+    response = redis_client.xreadgroup(
+        PRESUMMARIZE_GROUP, WORKER_ID, {PRESUMMARIZE_STREAM: ">"}, count=count
+    )
+    return response[0][1] if response else []
+
+def get_summarized_video_ids(video_ids):
+    conn = connection_pool.getconn()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT DISTINCT video_id FROM summaries WHERE video_id = ANY(%s)", (video_ids,))
         rows = cursor.fetchall()
         cursor.close()
+    finally:
         connection_pool.putconn(conn)
+    return {video_id for (video_id,) in rows}
+
+def presummarize_video(video_id):
+    """Summarize one video through the regular pipeline, store it and warm its cache entry; returns the outcome."""
+    # Coalesces with a user who clicks the same video while it's being summarized
+    payload, status = single_flight(video_id, SUMMARY_MODE, lambda: summarize_video(video_id))
+    if status == 503:
+        return "quota"
+    if status != 200:
+        print(f"Pre-summarization failed for {video_id}: {payload.get('error')}")
+        return "failed"
+
+    url = f"https://www.youtube.com/watch?v={video_id}"
+    if not insert_summary(payload["title"], url, video_id, payload["description"], payload["key_points"], payload["faqs"]):
+        return "failed"
+
+    summary_data = {
+        "youtube_title": payload["title"],
+        "description": payload["description"],
+        "keypoints": payload["key_points"],
+        "faqs": payload["faqs"],
+    }
+    redis_client.set(summary_read_through_key(video_id), json.dumps(summary_data), ex=summary_cache_ttl())
+    return "summarized"
 
-        results = [{"video_id": row[0], "youtube_title": row[1]} for row in rows]
+def presummarize_trending():
+    """Drain the pre-summarization queue within today's cap; stops early if an upstream quota runs out."""
+    try:
+        ensure_presummarize_group()
+        counter_key = f"presummarize:count:{datetime.now(timezone.utc):%Y%m%d}"
 
-        # Cache the result with TTL (1 hour)
-        redis_client.set("cache:popular_videos", json.dumps(results), ex=3600)
+        while True:
+            remaining = PRESUMMARIZE_DAILY_LIMIT - int(redis_client.get(counter_key) or 0)
+            if remaining <= 0:
+                print("Pre-summarization daily limit reached")
+                return
 
-        print("Popular videos cache updated successfully.")
+            entries = read_presummarize_batch(min(PRESUMMARIZE_BATCH_SIZE, remaining))
+            if not entries:
+                return
+
+            video_ids = [fields["video_id"] for _, fields in entries]
+            already_summarized = get_summarized_video_ids(video_ids)
+            pending = [video_id for video_id in dict.fromkeys(video_ids) if video_id not in already_summarized]
+
+            step_start = time.time()
+            outcomes = dict(zip(pending, presummarize_executor.map(presummarize_video, pending)))
+            for video_id in already_summarized:
+                outcomes[video_id] = "skipped"
+            for outcome in outcomes.values():
+                PRESUMMARIZE_RUNS.labels(outcome=outcome).inc()
+
+            pipe = redis_client.pipeline()
+            pipe.incrby(counter_key, sum(1 for outcome in outcomes.values() if outcome in ("summarized", "failed")))
+            pipe.expire(counter_key, 2 * 86400)
+            # Quota failures stay pending for a later run; everything else is done
+            done_ids = [entry_id for entry_id, fields in entries if outcomes.get(fields["video_id"]) != "quota"]
+            if done_ids:
+                pipe.xack(PRESUMMARIZE_STREAM, PRESUMMARIZE_GROUP, *done_ids)
+                pipe.xdel(PRESUMMARIZE_STREAM, *done_ids)
+            pipe.execute()
+            print(f"Pre-summarized batch in {time.time() - step_start:.2f}s: {dict(Counter(outcomes.values()))}")
+
+            if "quota" in outcomes.values():
+                print("Upstream quota exhausted, pausing pre-summarization")
+                return
 
     except Exception as e:
-        print(f"Error updating popular videos cache: {e}")
+        print(f"Error pre-summarizing trending videos: {e}")
+
+def summary_job_stages(mode):
+    return ["metadata", "transcript", "summary"] if mode == "single_pass" else ["metadata", "faqs", "transcript", "summary"]
+
+def summary_job_status(job):
+    """The status payload for a job's hash: status, progress and (once finished) result."""
+    status = {
+        "job_id": job["job_id"],
+        "video_id": job["video_id"],
+        "mode": job["mode"],
+        "status": job["status"],
+        "progress": {
+            "stages_done": [stage for stage in job.get("stages_done", "").split(",") if stage],
+            "stages": summary_job_stages(job["mode"]),
+        },
+        "attempts": int(job.get("attempts", 0)),
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
+    if "result" in job:
+        status["result"] = json.loads(job["result"])
+        status["result_status"] = int(job["result_status"])
+    return status
+
+def summary_job_channel(job_id):
+    return f"job:channel:{job_id}"
 
-def update_redis_summaries_cache():
+def get_summary_job(job_id):
+    """The job's status payload, or None for unknown or expired jobs."""
+    job = redis_client.hgetall(f"job:{job_id}")
+    return summary_job_status(job) if job else None
+
+def update_summary_job(job_id, **fields):
+    """Update the job's hash and publish its new status to anyone following /jobs/<id>/events."""
     try:
-        print("Updating summaries cache for top 8 popular videos...")
+        fields["updated_at"] = datetime.now(timezone.utc).isoformat()
+        redis_client.hset(f"job:{job_id}", mapping=fields)
+        redis_client.publish(summary_job_channel(job_id), json.dumps(get_summary_job(job_id)))
+    except redis.RedisError as e:
+        print(f"Failed to update job {job_id}: {e}")
+
+def summary_job_active_key(video_id, mode):
+    # The modes produce different summaries, so a job only dedupes with one for the same mode
+    return f"job:active:{video_id}:{mode}"
+
+def submit_summary_job(video_id, mode):
+    """Queue a summary job for the video and mode, or join the one already queued or running; returns (payload, status)."""
+    new_job_id = uuid.uuid4().hex
+    active_key = summary_job_active_key(video_id, mode)
+    created = -1
+    while created < 0:
+        # The script checks the active job's hash, so its key is read first and passed in
+        active_job_id = redis_client.get(active_key) or ""
+        created, job_id = enqueue_summary_job_script(
+            keys=[active_key, f"job:{new_job_id}", SUMMARY_JOB_STREAM, f"job:{active_job_id or new_job_id}"],
+            args=[new_job_id, video_id, mode, datetime.now(timezone.utc).isoformat(), SUMMARY_JOB_TTL, active_job_id]
+        )
+    SUMMARY_JOBS.labels(outcome="queued" if created else "deduplicated").inc()
+    print(f"{'Queued' if created else 'Joined'} {mode} summary job {job_id} for {video_id}")
 
-        # Clear old summary cache keys
-        for key in redis_client.scan_iter("cache:summary:*"):
-            redis_client.delete(key)
-        print("🧹 Cleared old summary cache keys.")
+    payload = get_summary_job(job_id)
+    payload["status_url"] = f"/jobs/{job_id}"
+    payload["events_url"] = f"/jobs/{job_id}/events"
+    return payload, 202
 
-        # Fetch popular videos from Redis
-        popular_videos_json = redis_client.get("cache:popular_videos")
-        if not popular_videos_json:
-            print("❌ No popular videos found in cache.")
-            return
+def ensure_summary_job_group():
+    try:
+        redis_client.xgroup_create(SUMMARY_JOB_STREAM, SUMMARY_JOB_GROUP, id="0", mkstream=True)
+    except redis.ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+def read_summary_jobs(count, block_ms=1000):
+    # Jobs a dead worker left pending come first
+    _, entries, *_ = redis_client.xautoclaim(
+        SUMMARY_JOB_STREAM, SUMMARY_JOB_GROUP, WORKER_ID,
+        min_idle_time=SUMMARY_JOB_CLAIM_IDLE_MS, count=count
+    )
+    entries = [entry for entry in entries if entry[1]]
+    if entries:
+        return entries
+
+    response = redis_client.xreadgroup(
+        SUMMARY_JOB_GROUP, WORKER_ID, {SUMMARY_JOB_STREAM: ">"}, count=count, block=block_ms
+    )
+    return response[0][1] if response else []
+
+def finish_summary_job_entry(entry_id):
+    pipe = redis_client.pipeline()
+    pipe.xack(SUMMARY_JOB_STREAM, SUMMARY_JOB_GROUP, entry_id)
+    pipe.xdel(SUMMARY_JOB_STREAM, entry_id)
+    pipe.execute()
+
+def retry_summary_job(entry_id, fields, attempts):
+    """Queue the job again once its backoff is over and ack this delivery."""
+    delay = SUMMARY_JOB_RETRY_BACKOFF * 2 ** (attempts - 1)
+    member = json.dumps({"job_id": fields["job_id"], "video_id": fields["video_id"], "mode": fields["mode"]})
+    pipe = redis_client.pipeline()
+    pipe.zadd(SUMMARY_JOB_DELAYED_KEY, {member: time.time() + delay})
+    pipe.xack(SUMMARY_JOB_STREAM, SUMMARY_JOB_GROUP, entry_id)
+    pipe.xdel(SUMMARY_JOB_STREAM, entry_id)
+    pipe.execute()
+    print(f"Summary job {fields['job_id']} will retry in {delay}s")
+
+def finish_summary_job(entry_id, job_id, video_id, mode, payload, status):
+    """Store the job's result, done or failed, and ack its entry."""
+    update_summary_job(
+        job_id,
+        status="done" if status == 200 else "failed",
+        result=json.dumps(payload),
+        result_status=status,
+    )
+    SUMMARY_JOBS.labels(outcome="done" if status == 200 else "failed").inc()
+    # Later requests for the video start a new job (or hit the cache once the client logs it)
+    release_lock_script(keys=[summary_job_active_key(video_id, mode)], args=[job_id])
+    finish_summary_job_entry(entry_id)
+
+def run_summary_job(entry_id, fields):
+    job_id, video_id, mode = fields["job_id"], fields["video_id"], fields["mode"]
+    job_key = f"job:{job_id}"
+
+    # Expired, or finished by a worker that died before acking
+    if redis_client.hget(job_key, "status") in (None, "done", "failed"):
+        finish_summary_job_entry(entry_id)
+        return
 
-        popular_videos = json.loads(popular_videos_json)
-        video_ids = [v["video_id"] for v in popular_videos]
+    attempts = redis_client.hincrby(job_key, "attempts", 1)
+    if attempts > SUMMARY_JOB_MAX_ATTEMPTS:
+        # Redelivered after its last attempt died mid-run
+        print(f"Summary job {job_id} gave up after {SUMMARY_JOB_MAX_ATTEMPTS} attempts")
+        finish_summary_job(entry_id, job_id, video_id, mode, {"error": "Summary job ran out of attempts"}, 500)
+        return
 
-        if not video_ids:
-            print("❌ No video IDs found in popular videos.")
-            return
+    update_summary_job(job_id, status="running", stages_done="", worker=WORKER_ID)
+    stages_done = []
 
-        # Fetch summaries for these video IDs from the database
-        conn = connection_pool.getconn()
-        cursor = conn.cursor()
+    def on_stage(name):
+        stages_done.append(name)
+        update_summary_job(job_id, stages_done=",".join(stages_done))
 
-        cursor.execute("""
-            SELECT video_id, youtube_title, description, key_points, faqs
-            FROM summaries
-            WHERE video_id = ANY(%s);
-        """, (video_ids,))
-        rows = cursor.fetchall()
+    retryable = False
+    try:
+        # Coalesces with a /summarize request for the same video that's already running
+        payload, status = single_flight(video_id, mode, lambda: summarize_video(video_id, mode, on_stage))
+        # Upstream quota
+        retryable = status == 503
+    except Exception as e:
+        print(f"Summary job {job_id} failed: {e}")
+        payload, status, retryable = {"error": str(e)}, 500, True
 
-        print(f"Fetched {len(rows)} summaries from the database.")
+    if retryable and attempts < SUMMARY_JOB_MAX_ATTEMPTS:
+        SUMMARY_JOBS.labels(outcome="retried").inc()
+        update_summary_job(job_id, status="queued")
+        retry_summary_job(entry_id, fields, attempts)
+        return
 
-        for row in rows:
-            video_id, youtube_title, description, key_points, faqs_jsonb = row
-            redis_key = f"cache:summary:{video_id}"
+    finish_summary_job(entry_id, job_id, video_id, mode, payload, status)
 
-            summary_data = {
-                "youtube_title": youtube_title,
-                "description": description,
-                "keypoints": key_points,
-                "faqs": faqs_jsonb,
-            }
+def run_summary_job_worker(stop_event, concurrency=SUMMARY_JOB_CONCURRENCY):
+    """Process queued summary jobs, at most `concurrency` at a time, until stop_event is set."""
+    ensure_summary_job_group()
+    print(f"Summary job worker {WORKER_ID} started ({concurrency} at a time)")
+    running = set()
 
-            redis_client.set(redis_key, json.dumps(summary_data), ex=3600)
-            print(f"✅ Cached: {redis_key}")
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while not stop_event.is_set():
+            done = {future for future in running if future.done()}
+            for future in done:
+                if future.exception():
+                    print(f"Summary job failed: {future.exception()}")
+            running -= done
 
-        cursor.close()
-        connection_pool.putconn(conn)
+            if len(running) >= concurrency:
+                wait(running, timeout=1.0, return_when=FIRST_COMPLETED)
+                continue
+
+            try:
+                requeue_summary_jobs_script(
+                    keys=[SUMMARY_JOB_DELAYED_KEY, SUMMARY_JOB_STREAM], args=[time.time(), concurrency]
+                )
+                entries = read_summary_jobs(concurrency - len(running))
+            except redis.RedisError as e:
+                print(f"Failed to read summary jobs: {e}")
+                stop_event.wait(1.0)
+                continue
 
-        print("Summaries cache updated successfully.")
+            for entry_id, fields in entries:
+                running.add(executor.submit(run_summary_job, entry_id, fields))
 
-    except Exception as e:
-        print(f"❌ Error updating summaries cache: {e}")
+        print(f"Summary job worker {WORKER_ID} stopping, finishing {len(running)} running jobs")
+
+def summary_job_events(job_id, timeout=SUMMARY_JOB_EVENTS_TIMEOUT):
+    """SSE stream of a job's status: the current one, then every update until it finishes or `timeout` passes."""
+    pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(summary_job_channel(job_id))
+    try:
+        # Read after subscribing so an update published in between isn't missed
+        job = get_summary_job(job_id)
+        if not job:
+            yield sse_event("error", {"error": f"Unknown job {job_id}"})
+            return
+
+        yield f"retry: {SUMMARY_JOB_EVENTS_RETRY_MS}\n\n"
+        yield sse_event("status", job)
+        deadline = time.time() + timeout
+        while job["status"] not in ("done", "failed") and time.time() < deadline:
+            event = pubsub.get_message(timeout=min(15.0, max(deadline - time.time(), 0.1)))
+            if not event:
+                # Keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+                continue
+            job = json.loads(event["data"]) or job
+            yield sse_event("status", job)
+    finally:
+        pubsub.close()
+
+def scheduler_heartbeat():
+    """Renew the leader lease if this process holds it, otherwise try to acquire it."""
+    global leader_lease
+    try:
+        if leader_lease:
+            if renew_lock_script(keys=[LEADER_KEY], args=[leader_lease, LEADER_LEASE_TTL]):
+                return
+            print(f"Scheduler leadership lost by {WORKER_ID}")
+            leader_lease = None
+
+        fencing_token = acquire_leadership_script(keys=[LEADER_KEY, LEADER_FENCING_KEY], args=[WORKER_ID, LEADER_LEASE_TTL])
+        if fencing_token:
+            leader_lease = f"{WORKER_ID}:{fencing_token}"
+            print(f"Scheduler leadership acquired by {WORKER_ID} (fencing token {fencing_token})")
+    except redis.RedisError as e:
+        print(f"Scheduler heartbeat failed: {e}")
+        leader_lease = None
+
+def release_leadership():
+    if leader_lease:
+        release_lock_script(keys=[LEADER_KEY], args=[leader_lease])
+
+def fencing_token():
+    """This process's fencing token while it leads, else None."""
+    lease = leader_lease
+    return lease.rsplit(":", 1)[1] if lease else None
+
+def leader_only(job, interval):
+    """
+    Wrap a scheduled job so it only runs in the leader process, at most once per `interval`
+    seconds across all leaders after a successful run, and record each run.
+    """
+    cooldown_key = f"scheduler:jobs:{job.__name__}:cooldown"
+    claim_key = f"scheduler:jobs:{job.__name__}:claim"
+
+    @functools.wraps(job)
+    def run():
+        lease = leader_lease
+        # Re-check the lease in Redis so a process that just lost it doesn't run the job
+        if not lease or redis_client.get(LEADER_KEY) != lease:
+            return
+        # Set after each run; while it exists the job isn't due yet
+        if redis_client.exists(cooldown_key):
+            return
+        if not redis_client.set(claim_key, lease, nx=True, ex=LEADER_JOB_CLAIM_TTL):
+            return
+
+        stop_event = threading.Event()
+        threading.Thread(
+            target=keep_lock_alive,
+            args=(claim_key, lease, LEADER_JOB_CLAIM_TTL, LEADER_JOB_CLAIM_TTL / 3, stop_event),
+            daemon=True
+        ).start()
+        start = time.time()
+        outcome, error = "success", ""
+        try:
+            job()
+        except Exception as e:
+            outcome, error = "failed", str(e)
+            print(f"Job {job.__name__} failed: {e}")
+        finally:
+            stop_event.set()
+            cooldown = interval if outcome == "success" else min(interval, LEADER_JOB_RETRY_DELAY)
+            redis_client.set(cooldown_key, outcome, ex=cooldown)
+            release_lock_script(keys=[claim_key], args=[lease])
+            SCHEDULER_JOB_SECONDS.labels(job=job.__name__, outcome=outcome).observe(time.time() - start)
+            redis_client.hset(f"scheduler:jobs:{job.__name__}", mapping={
+                "last_run": datetime.now(timezone.utc).isoformat(),
+                "duration_seconds": round(time.time() - start, 3),
+                "outcome": outcome,
+                "error": error,
+                "worker": WORKER_ID,
+                "fencing_token": lease.rsplit(":", 1)[1],
+            })
+    return run
+
+def get_job_registry():
+    job_names = [job.name for job in scheduler.get_jobs() if job.name != scheduler_heartbeat.__name__]
+    pipe = redis_client.pipeline()
+    pipe.get(LEADER_KEY)
+    for name in job_names:
+        pipe.hgetall(f"scheduler:jobs:{name}")
+    leader, *runs = pipe.execute()
+    return {
+        "leader": leader,
+        "this_worker": WORKER_ID,
+        "jobs": {name: run or None for name, run in zip(job_names, runs)},
+    }
 
 #-------------------------------------------------- Runs on start ------------------------------------------------
-#empty for now, here is a cat
+def ensure_tables():
+    """
+    Create the tables and indexes added alongside the app's own schema if they don't exist yet.
+    Each statement commits on its own, so one failing (e.g. trending_videos not created yet)
+    doesn't roll back the others.
+    """
+    statements = [
+        """
+        CREATE TABLE IF NOT EXISTS transcripts (
+            video_id TEXT NOT NULL,
+            language TEXT NOT NULL,
+            transcript TEXT NOT NULL,
+            source TEXT,
+            fetched_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (video_id, language)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS trending_videos_published_at_idx ON trending_videos (published_at)",
+        """
+        CREATE TABLE IF NOT EXISTS faq_questions (
+            title_hash TEXT PRIMARY KEY,
+            title TEXT NOT NULL,
+            questions JSONB NOT NULL,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+        """,
+    ]
+    conn = connection_pool.getconn()
+    try:
+        for statement in statements:
+            try:
+                cursor = conn.cursor()
+                cursor.execute(statement)
+                conn.commit()
+                cursor.close()
+            except Exception as e:
+                print(f"Error creating tables: {e}")
+                conn.rollback()
+    finally:
+        connection_pool.putconn(conn)
+
+ensure_tables()
+
+#here is a cat
 #      /\_/\  
 #     ( o.o ) 
 #      > ^ <  
 
 #-------------------------------------------------- Schedulers ---------------------------------------------------
 scheduler = BackgroundScheduler()
-scheduler.add_job(func=ping_self, trigger="interval", minutes=14)
-scheduler.add_job(func=update_popular_videos_cache, trigger="interval", minutes=58)
-scheduler.add_job(func=update_redis_summaries_cache, trigger="interval", minutes=58)
-scheduler.add_job(func=fetch_and_store_trending, trigger="interval", hours=25)
-scheduler.start()
+scheduler.add_job(func=scheduler_heartbeat, trigger="interval", seconds=LEADER_HEARTBEAT_INTERVAL, next_run_time=datetime.now())
+
+def add_leader_job(job, seconds):
+    # Checked at least every LEADER_JOB_CHECK_INTERVAL; leader_only decides whether it's due
+    scheduler.add_job(func=leader_only(job, seconds), trigger="interval", seconds=min(seconds, LEADER_JOB_CHECK_INTERVAL))
+
+add_leader_job(ping_self, 14 * 60)
+add_leader_job(refresh_popular_and_summaries_cache, 58 * 60)
+add_leader_job(fetch_and_store_trending, 25 * 3600)
+if WRITE_BEHIND_ENABLED:
+    add_leader_job(flush_write_behind, WRITE_BEHIND_FLUSH_INTERVAL)
+if PRESUMMARIZE_ENABLED:
+    add_leader_job(presummarize_trending, PRESUMMARIZE_INTERVAL)
+if SCHEDULER_ENABLED:
+    scheduler.start()
+    atexit.register(release_leadership)
 
 #-------------------------------------------------- Flask Api's --------------------------------------------------
 
@@ -923,7 +3360,10 @@ def summarize():
         data = request.get_json()
         url = data.get('url')
         refresh = data.get('refresh', False)
-        print(f"\n\nReceived request to summarize: {url} | Refresh: {refresh}")
+        mode = data.get('mode', SUMMARY_MODE)
+        if mode not in SUMMARY_MODES:
+            return jsonify({"error": f"Unknown mode {mode}, expected one of {', '.join(SUMMARY_MODES)}"}), 400
+        print(f"\n\nReceived request to summarize: {url} | Refresh: {refresh} | Mode: {mode}")
         print(f"Time to get URL and parse JSON: {time.time() - step_start:.2f}s")
 
         # Get Video ID
@@ -931,120 +3371,57 @@ def summarize():
         video_id = extract_video_id(url)
         print(f"Time to extract video ID: {time.time() - step_start:.2f}s")
 
+        # Opt-in Server-Sent Events mode
+        if data.get('stream', False):
+            return Response(
+                summarize_video_stream(video_id, refresh, mode),
+                mimetype="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
+
         # Only attempt to use cache if refresh is False
         if not refresh:
             step_start = time.time()
             print("Checking cache...")
             cached = get_cached_summary(video_id)
             print(f"Time to check cache: {time.time() - step_start:.2f}s")
+            SUMMARIZE_STAGE_SECONDS.labels(stage="cache_lookup").observe(time.time() - step_start)
             if cached:
                 print("Returning cached summary.")
                 print(f"Total processing time: {time.time() - start_total:.2f}s")
-                return {
-                    "title": cached["youtube_title"],
-                    "description": cached["description"],
-                    "key_points": cached["keypoints"],
-                    "faqs": cached["faqs"],
-                    "video_id": video_id,
-                    "needs_logging": False,
-                }
+                return cached_summary_payload(video_id, cached)
             else:
                 print("Summary not in Cache")
 
-        # Get video title and XML URL
-        step_start = time.time()
-        title, xml_url, duration = get_video_title_and_xmlUrl(video_id) #TODO: Eventually switch to youtube api
-        print(f"Time to get video title and XML URL: {time.time() - step_start:.2f}s")
-        print(f"Youtube Title: {title}, Video Duration: {duration}")
-        print(f"Video ID: {video_id}")
-
-        if int(duration) > 2700:
-            duration_limit_error_messages = [
-                "Nice try, but I don’t do marathons. Keep it under 45 minutes.",
-                "I summarize videos, not cinematic universes. 45 minutes max!",
-                "Attention span exceeded. Try something snack-sized (< 45 mins).",
-                "If it needs popcorn, it's too long. 45-minute limit in effect.",
-                "This ain’t a podcast. Keep it under 45 mins, champ.",
-            ]
-            return jsonify({
-                "error": "45 mins exceeded",
-                "message": random.choice(duration_limit_error_messages)
-            }), 400
-
-        # Generate FAQs
-        step_start = time.time()
-        faq_dict = generate_faqs(title)
-        print(f"Time to generate FAQs: {time.time() - step_start:.2f}s")
-
-        transcript = ""
-
-        # Get transcript from XML URL if available
-        if xml_url:
-            print(f"There is an XML URL: {xml_url}\n")
-            step_start = time.time()
-            transcript = get_transcript_from_xml_url(xml_url)
-            print(f"Time to get transcript: {time.time() - step_start:.2f}s")
-            if transcript:
-                print("XML Succeeded")
-            else:
-                print("XML FAILED")
-        else:
-            print("There is NO XML URL")
-
-        # Fallback transcript if no XML transcript
-        if not transcript:
-            print("Fallback transcript fetch through api")
-            step_start = time.time()
-            transcript = roundRobinTranscript(video_id)
-            print(f"Time to get fallback transcript: {time.time() - step_start:.2f}s")
-
-        #TODO: throw exception if there's still no summary
-
-        # Generate summary using AI
-        step_start = time.time()
-        response = gemini_summary(transcript, faq_dict)
-        print(f"Time to generate summary: {time.time() - step_start:.2f}s")
-
-        # Fix spacing and extract parts
-        step_start = time.time()
-        description = response["description"]
-        key_points = fix_bullet_spacing(response["key_points"])
-        faqs = response["faqs"]
-        print(f"Time to validate output: {time.time() - step_start:.2f}s")
-
-        # Exception handling for missing data
-        missing_fields = []
-        if not description:
-            missing_fields.append("description")
-        if not key_points:
-            missing_fields.append("key_points")
-        if not faqs:
-            missing_fields.append("faqs")
-
-        if missing_fields:
-            missing_str = ", ".join(missing_fields)
-            return jsonify({
-                "message": random.choice(errors_messages),
-                "error": f"Missing fields: {missing_str}",
-                "video_id": video_id
-            }), 400
+        # Opt-in job mode: queue the work and hand back a job id to poll
+        if data.get('async', False):
+            payload, status = submit_summary_job(video_id, mode)
+            print(f"Total processing time: {time.time() - start_total:.2f}s")
+            return jsonify(payload), status
 
+        payload, status = single_flight(video_id, mode, lambda: summarize_video(video_id, mode))
         print(f"Total processing time: {time.time() - start_total:.2f}s")
-
-        return jsonify({
-            "title": title,
-            "description": description,
-            "key_points": key_points,
-            "faqs": faqs,
-            "video_id": video_id,
-            "needs_logging": True,
-        })
+        return jsonify(payload), status
 
     except Exception as e:
-        return jsonify({
-            "error": str(e),
-            "message": random.choice(errors_messages),
-        }), 400
+        return jsonify(error_payload(e)), 400
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def summary_job(job_id):
+    job = get_summary_job(job_id)
+    if not job:
+        return jsonify({"error": f"Unknown job {job_id}"}), 404
+    return jsonify(job)
+
+# Each follower holds a sync worker, so the stream closes after SUMMARY_JOB_SYNC_EVENTS_TIMEOUT and
+# the client reconnects; asgi.py serves this route on the event loop for the full timeout
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def summary_job_events_route(job_id):
+    return Response(
+        summary_job_events(job_id, SUMMARY_JOB_SYNC_EVENTS_TIMEOUT),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 # Flask route to handle the ping
 @app.route("/ping")
@@ -1063,7 +3440,7 @@ def faq():
     
     if title:
         print("testing function")
-        faqs = generate_faqs(title)
+        faqs = get_faqs(title)
         return faqs
     else:
         return "No transcript provided."
@@ -1073,58 +3450,29 @@ def popular_videos():
     start_time = time.time()
 
     try:
+        # Optional ?page=N lets clients rotate through the pre-shuffled pages
+        page = request.args.get('page', type=int)
+
         # Check Redis cache first
-        cached = redis_client.get("cache:popular_videos")
+        cached = get_popular_page(page)
         if cached:
             print("Returning cached popular videos")
             total_time = time.time() - start_time
             print(f"API total time (cache hit): {total_time:.4f}s")
-            return jsonify(json.loads(cached))
-
-        # Cache miss → Query the database
-        conn = connection_pool.getconn()
-        cursor = conn.cursor()
-        cursor.execute("""
-            WITH recent_videos AS (
-                SELECT *
-                FROM trending_videos
-                WHERE published_at >= NOW() - INTERVAL '30 days'
-            ),
-            unique_channel_videos AS (
-                SELECT DISTINCT ON (channel_id) video_id, title, channel_id
-                FROM recent_videos
-                ORDER BY channel_id, RANDOM()  -- pick random video per channel
-            ),
-            first_8 AS (
-                SELECT *
-                FROM unique_channel_videos
-                ORDER BY RANDOM()   -- randomize channel selection
-                LIMIT 8
-            ),
-            remaining AS (
-                SELECT video_id, title
-                FROM recent_videos
-                WHERE video_id NOT IN (SELECT video_id FROM first_8)
-            )
-            SELECT video_id, title AS youtube_title
-            FROM first_8
-            UNION ALL
-            SELECT video_id, title AS youtube_title
-            FROM remaining
-            LIMIT 8;
-        """)
-
-        rows = cursor.fetchall()
-        cursor.close()
-        connection_pool.putconn(conn)
+            POPULAR_VIDEOS_SECONDS.labels(result="hit").observe(total_time)
+            return jsonify(cached)
 
-        results = [{"video_id": row[0], "youtube_title": row[1]} for row in rows]
+        # Cache miss → Build pages from the candidate pool
+        pages = build_popular_pages()
+        pipe = redis_client.pipeline(transaction=True)
+        store_popular_pages(pages, pipe)
+        pipe.execute()
 
-        # Cache the result with TTL (e.g., 3600 seconds = 1 hour)
-        redis_client.set("cache:popular_videos", json.dumps(results), ex=3600)
+        results = pages[page % len(pages)] if page is not None else pages[0]
 
         total_time = time.time() - start_time
         print(f"API total time (cache miss): {total_time:.4f}s")
+        POPULAR_VIDEOS_SECONDS.labels(result="miss").observe(total_time)
         return jsonify(results)
 
     except Exception as e:
@@ -1133,6 +3481,30 @@ def popular_videos():
         print(f"API total time (error): {total_time:.4f}s")
         return jsonify({"error": "Failed to fetch popular videos"}), 500
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    registry = REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+@app.route('/scheduler_jobs', methods=['GET'])
+def scheduler_jobs():
+    return jsonify(get_job_registry())
+
+@app.route('/quota', methods=['GET'])
+def quota():
+    return jsonify(get_quota_usage())
+
+@app.route('/http_stats', methods=['GET'])
+def http_stats_route():
+    return jsonify(get_http_stats())
+
+@app.route('/cache_stats', methods=['GET'])
+def cache_stats():
+    return jsonify(get_summary_cache_stats())
+
 @app.route('/log_summary', methods=['POST'])
 def log_summary():
     data = request.get_json()
@@ -1159,9 +3531,15 @@ def log_status():
     # Extract fields from request JSON
     video_title = data.get('video_title')
     video_url = data.get('video_url')
-    status_code = data.get('status_code')
+    try:
+        status_code = parse_status_code(data.get('status_code'))
+    except (TypeError, ValueError):
+        return jsonify({"error": "status_code must be an HTTP status code"}), 400
 
-    success = insert_log_entry(video_title, video_url, status_code)
+    if WRITE_BEHIND_ENABLED:
+        success = enqueue_write("log", video_title=video_title, video_url=video_url, status_code=status_code)
+    else:
+        success = insert_log_entry(video_title, video_url, status_code)
 
     if success:
         return jsonify({"status": "logged"}), 200
@@ -1175,7 +3553,10 @@ def increment_count():
     # Extract fields from request JSON
     video_id = data.get('video_id')
 
-    success = increment_times_summarized(video_id)
+    if WRITE_BEHIND_ENABLED:
+        success = enqueue_write("increment", video_id=video_id)
+    else:
+        success = increment_times_summarized(video_id)
 
     if success:
         return jsonify({"status": "successfully incremented"}), 200
@@ -0,0 +1,892 @@
+"""
+Async execution mode. /summarize runs on an asyncio pipeline (httpx, redis.asyncio, asyncpg and
+Gemini's async API), so one process can hold hundreds of cache misses in flight while they wait on
+RapidAPI and the model, instead of pinning a sync worker each. /jobs/<id>/events follows a job's
+updates on the event loop too. Every other route is the Flask app, mounted through WSGIMiddleware.
+
+    uvicorn asgi:application --workers 2
+    gunicorn -k uvicorn.workers.UvicornWorker asgi:application
+
+Prompts, parsing, validation, repair planning, cache keys, Redis scripts and metrics are shared with
+app.py, so both modes read and write the same caches and tables and coalesce on the same
+single-flight keys. Only the I/O is async here.
+
+Metrics: several uvicorn workers merge their samples through PROMETHEUS_MULTIPROC_DIR, as under
+gunicorn. Without gunicorn.conf.py to set it, this module defaults it to a directory named after the
+uvicorn supervisor's pid (a single process's own, cleared on start), so each run starts with an empty
+one; set it explicitly to pick the path.
+
+The scheduler starts in each worker's lifespan (when SCHEDULER_ENABLED), not when app.py is
+imported, and stops on shutdown, handing leadership to another worker straight away.
+"""
+import asyncio
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+import uuid
+import zlib
+import xml.etree.ElementTree as ET
+from urllib.parse import urlparse
+
+import asyncpg
+import httpx
+import redis
+import redis.asyncio as aioredis
+from starlette.applications import Starlette
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.wsgi import WSGIMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route, request_response
+
+# Both are read when app.py is imported. prometheus_client picks its storage on import, so the
+# directory only applies if nothing imported it first (the benchmarks load app.py before this).
+# Under --workers it's named after the uvicorn supervisor, which each run starts fresh; a single
+# process names it after itself and clears it, as gunicorn.conf.py does, since pids get reused
+if "prometheus_client" not in sys.modules and "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+    supervisor = multiprocessing.parent_process()
+    metrics_dir = f"/tmp/prometheus_multiproc_{supervisor.pid if supervisor else os.getpid()}"
+    if not supervisor:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = metrics_dir
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
+os.environ["SCHEDULER_ENABLED"] = "false"
+
+import app as sync_app
+from app import (
+    DEFAULT_STAGE_TIMEOUT, DEFAULT_UPSTREAM, FAQ_CACHE_TTL, HTTP_RETRY_BACKOFF, HTTP_RETRY_STATUSES,
+    RAPIDAPI_KEY, SINGLE_FLIGHT_LOCK_TTL, SINGLE_FLIGHT_RENEW_INTERVAL, SINGLE_FLIGHT_RESULT_TTL,
+    SINGLE_FLIGHT_WAIT, STAGE_TIMEOUTS, SUMMARY_GENERATION_CACHE_SECONDS, SUMMARY_GENERATION_KEY,
+    SUMMARY_JSON_SECTIONS, SUMMARY_MODE, SUMMARY_MODES, SUMMARY_JOB_EVENTS_RETRY_MS, SUMMARY_JOB_EVENTS_TIMEOUT,
+    SUMMARY_NEGATIVE_TTL, TRANSCRIPT_CACHE_TTL, TRANSCRIPT_LANGUAGE, TRANSCRIPT_RACE_TIMEOUT, UPSTREAMS,
+    QuotaExceededError, StageTimeoutError,
+    FAQ_CACHE_LOOKUPS, LLM_CALLS, SUMMARIZE_STAGE_SECONDS, SUMMARY_CACHE_LOOKUPS, SUMMARY_OUTCOMES,
+    SUMMARY_REPAIRS, TRANSCRIPT_PROVIDER_CALLS,
+    build_chunk_prompt, build_faqs_prompt, build_section_repair_prompt, build_summary_json_prompt,
+    build_summary_payload, cached_summary_payload, check_summary_inputs, compress_transcript,
+    decompress_transcript, error_payload, extract_video_id, faq_cache_key, finish_summary, generation_config,
+    hedge_delay, is_valid_transcript, join_chunk_notes, json_column, log_pipeline_timings, normalize_transcript,
+    observe_provider_call, parse_faqs_response, parse_section_repair, parse_video_info, plan_summary_repairs,
+    plan_transcript_chunks, prepare_transcript, queue_provider_sample, queue_summary_write_back, quota_keys,
+    record_http_call, record_llm_usage, repair_questions, single_flight_keys, single_flight_message,
+    single_flight_result, sse_event, summary_cache_lookup_keys, summary_error, summary_from_row,
+    summary_job_channel, summary_job_status, summary_lookup_result, summary_result_event,
+    summary_section_schema, title_hash, transcript_cache_key,
+)
+from captions import caption_format, iter_caption_segments
+from prometheus_client import multiprocess
+
+#-------------------------------------------------- Configurations -------------------------------------------------
+ASYNC_DB_POOL_SIZE = int(os.getenv("ASYNC_DB_POOL_SIZE", "20"))
+ASYNC_HTTP_MAX_CONNECTIONS = int(os.getenv("ASYNC_HTTP_MAX_CONNECTIONS", "200"))
+ASYNC_REDIS_MAX_CONNECTIONS = int(os.getenv("ASYNC_REDIS_MAX_CONNECTIONS", "200"))
+
+# Blocking pools: past the cap, commands wait for a free connection instead of raising
+redis_client = aioredis.from_url(
+    sync_app.redis_url, decode_responses=True,
+    connection_pool_class=aioredis.BlockingConnectionPool, max_connections=ASYNC_REDIS_MAX_CONNECTIONS,
+)
+redis_binary_client = aioredis.from_url(
+    sync_app.redis_url,
+    connection_pool_class=aioredis.BlockingConnectionPool, max_connections=ASYNC_REDIS_MAX_CONNECTIONS,
+)
+
+# Same Lua as app.py, registered on the async client
+summary_cache_lookup_script = redis_client.register_script(sync_app.summary_cache_lookup_script.script)
+acquire_budget_script = redis_client.register_script(sync_app.acquire_budget_script.script)
+release_lock_script = redis_client.register_script(sync_app.release_lock_script.script)
+renew_lock_script = redis_client.register_script(sync_app.renew_lock_script.script)
+
+# Created on startup, inside the worker's event loop
+db_pool = None
+http_client = None
+single_flight_listener = None
+# channel -> futures of the requests in this process waiting on a message on it
+channel_waiters = {}
+
+#------------------------------------------------- Python Functions -------------------------------------------------
+async def startup():
+    global db_pool, http_client, single_flight_listener
+    db_pool = await asyncpg.create_pool(sync_app.DATABASE_URL, min_size=1, max_size=ASYNC_DB_POOL_SIZE)
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=ASYNC_HTTP_MAX_CONNECTIONS, max_keepalive_connections=ASYNC_HTTP_MAX_CONNECTIONS),
+        follow_redirects=True,
+    )
+    single_flight_listener = asyncio.create_task(listen_single_flight())
+    if SCHEDULER_ENABLED and not sync_app.scheduler.running:
+        sync_app.scheduler.start()
+
+async def shutdown():
+    if sync_app.scheduler.running:
+        sync_app.scheduler.shutdown(wait=False)
+        sync_app.release_leadership()
+    single_flight_listener.cancel()
+    await http_client.aclose()
+    await db_pool.close()
+    await redis_client.aclose()
+    await redis_binary_client.aclose()
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        # What gunicorn.conf.py's child_exit does for gunicorn workers
+        multiprocess.mark_process_dead(os.getpid())
+
+@contextlib.asynccontextmanager
+async def lifespan(_):
+    await startup()
+    try:
+        yield
+    finally:
+        await shutdown()
+
+async def acquire_budget(host, cost=1):
+    """Async acquire_budget: same shared budget, but waits for the rate limit without blocking the loop."""
+    budget = UPSTREAMS.get(host, {}).get("budget")
+    if not budget:
+        return
+
+    deadline = time.time() + budget["max_wait"]
+    while True:
+        try:
+            result = await acquire_budget_script(keys=quota_keys(host), args=[
+                budget["per_second"],
+                budget["burst"],
+                cost,
+                int(time.time() * 1000),
+                budget["daily"] or 0,
+                budget["monthly"] or 0,
+            ])
+        except redis.RedisError as e:
+            print(f"Budget check for {host} failed, allowing the call: {e}")
+            return
+        if result[0] == 1:
+            return
+        if result[0] == -1:
+            raise QuotaExceededError(f"{host} {result[1]} budget exhausted")
+
+        wait_seconds = int(result[1]) / 1000
+        if time.time() + wait_seconds > deadline:
+            raise QuotaExceededError(f"{host} rate limit reached ({budget['per_second']}/s)")
+        await asyncio.sleep(wait_seconds)
+
+async def http_get(url, cost=1, stream=False, **kwargs):
+    """
+    Async http_get: per-host (connect, read) timeouts and GET retries on transport errors and
+    429/5xx from UPSTREAMS, charging the host's budget for every attempt. Records the same
+    per-host stats. With stream=True the body is left unread and the caller closes the response.
+    """
+    host = urlparse(url).hostname
+    upstream = UPSTREAMS.get(host, DEFAULT_UPSTREAM)
+    connect_timeout, read_timeout = upstream["timeout"]
+    kwargs.setdefault("timeout", httpx.Timeout(read_timeout, connect=connect_timeout))
+
+    retries = upstream["retries"]
+    for attempt in range(retries + 1):
+        await acquire_budget(host, cost)
+        start = time.time()
+        try:
+            response = await http_client.send(http_client.build_request("GET", url, **kwargs), stream=stream)
+        except httpx.TransportError:
+            record_http_call(host, time.time() - start, ok=False)
+            if attempt == retries:
+                raise
+        else:
+            ok = response.status_code < 500 and response.status_code != 429
+            record_http_call(host, time.time() - start, ok=ok)
+            if response.status_code not in HTTP_RETRY_STATUSES or attempt == retries:
+                return response
+            await response.aclose()
+        await asyncio.sleep(HTTP_RETRY_BACKOFF * 2 ** attempt)
+
+async def get_summary_generation():
+    cache = sync_app.summary_generation
+    if time.time() - cache["fetched_at"] > SUMMARY_GENERATION_CACHE_SECONDS:
+        cache["value"] = await redis_client.get(SUMMARY_GENERATION_KEY) or "0"
+        cache["fetched_at"] = time.time()
+    return cache["value"]
+
+async def get_cached_summary(video_id):
+    keys = summary_cache_lookup_keys(await get_summary_generation(), video_id)
+    answered, summary = summary_lookup_result(await summary_cache_lookup_script(keys=keys), keys[0])
+    if answered:
+        return summary
+
+    row = await db_pool.fetchrow(
+        "SELECT youtube_title, description, key_points, faqs FROM summaries WHERE video_id = $1 LIMIT 1",
+        video_id
+    )
+    if not row:
+        await redis_client.set(keys[1], "1", ex=SUMMARY_NEGATIVE_TTL)
+        SUMMARY_CACHE_LOOKUPS.labels(result="miss").inc()
+        return None
+
+    summary = summary_from_row(*row)
+    pipe = redis_client.pipeline()
+    queue_summary_write_back(pipe, video_id, summary)
+    await pipe.execute()
+    SUMMARY_CACHE_LOOKUPS.labels(result="db_hit").inc()
+    return summary
+
+async def fetch_video_metadata(video_id):
+    try:
+        response = await http_get(
+            "https://yt-api.p.rapidapi.com/video/info",
+            headers={"x-rapidapi-key": RAPIDAPI_KEY, "x-rapidapi-host": "yt-api.p.rapidapi.com"},
+            params={"id": video_id},
+        )
+        response.raise_for_status()
+        metadata = parse_video_info(response.json())
+    except (httpx.HTTPError, KeyError, ValueError) as e:
+        raise ValueError(f"Could not fetch video metadata for {video_id}") from e
+
+    title, caption_url, duration = metadata
+    print(f"Youtube Title: {title}, Video Duration: {duration}")
+    print(f"Video ID: {video_id}")
+    return metadata
+
+async def generate_faqs(title):
+    try:
+        response = await sync_app.model.generate_content_async(build_faqs_prompt(title))
+        faq_dict = parse_faqs_response(response.text)
+        LLM_CALLS.labels(call="faqs", outcome="success").inc()
+        record_llm_usage("faqs", response)
+        return faq_dict
+    except Exception as e:
+        print(f"Error occurred while fetching the faqs: {e}")
+        LLM_CALLS.labels(call="faqs", outcome="error").inc()
+        return None
+
+async def get_cached_faqs(title):
+    key_hash = title_hash(title)
+    redis_key = faq_cache_key(key_hash)
+    try:
+        cached = await redis_client.get(redis_key)
+        if cached:
+            FAQ_CACHE_LOOKUPS.labels(result="hit").inc()
+            return json.loads(cached)
+    except redis.RedisError as e:
+        print(f"Failed to read FAQ cache: {e}")
+
+    try:
+        row = await db_pool.fetchrow("SELECT questions FROM faq_questions WHERE title_hash = $1", key_hash)
+    except asyncpg.PostgresError as e:
+        print(f"Failed to read stored FAQs: {e}")
+        row = None
+
+    if not row:
+        FAQ_CACHE_LOOKUPS.labels(result="miss").inc()
+        return None
+
+    FAQ_CACHE_LOOKUPS.labels(result="db_hit").inc()
+    faqs = json_column(row["questions"])
+    try:
+        await redis_client.set(redis_key, json.dumps(faqs), ex=FAQ_CACHE_TTL)
+    except redis.RedisError as e:
+        print(f"Failed to write FAQ cache: {e}")
+    return faqs
+
+async def store_faqs(title, faqs):
+    key_hash = title_hash(title)
+    questions = json.dumps(faqs)
+    try:
+        await db_pool.execute("""
+            INSERT INTO faq_questions (title_hash, title, questions)
+            VALUES ($1, $2, $3)
+            ON CONFLICT (title_hash)
+            DO UPDATE SET questions = EXCLUDED.questions, created_at = NOW()
+        """, key_hash, title, questions)
+    except asyncpg.PostgresError as e:
+        print(f"Failed to store FAQs: {e}")
+
+    try:
+        await redis_client.set(faq_cache_key(key_hash), questions, ex=FAQ_CACHE_TTL)
+    except redis.RedisError as e:
+        print(f"Failed to write FAQ cache: {e}")
+
+async def get_faqs(title):
+    faqs = await get_cached_faqs(title)
+    if faqs:
+        return faqs
+
+    faqs = await generate_faqs(title)
+    if faqs:
+        await store_faqs(title, faqs)
+    return faqs
+
+async def get_stored_transcript(video_id, language=TRANSCRIPT_LANGUAGE):
+    redis_key = transcript_cache_key(video_id, language)
+    try:
+        cached = await redis_binary_client.get(redis_key)
+        if cached:
+            print(f"Transcript cache hit for {redis_key}")
+            return decompress_transcript(cached)
+    except (redis.RedisError, zlib.error) as e:
+        print(f"Failed to read transcript cache: {e}")
+
+    try:
+        row = await db_pool.fetchrow(
+            "SELECT transcript FROM transcripts WHERE video_id = $1 AND language = $2", video_id, language
+        )
+    except Exception as e:
+        print(f"Failed to read stored transcript: {e}")
+        row = None
+
+    if not row:
+        return None
+
+    print(f"Transcript DB hit for {video_id}")
+    try:
+        await redis_binary_client.set(redis_key, compress_transcript(row["transcript"]), ex=TRANSCRIPT_CACHE_TTL)
+    except redis.RedisError as e:
+        print(f"Failed to write transcript cache: {e}")
+    return row["transcript"]
+
+async def store_transcript(video_id, transcript, source, language=TRANSCRIPT_LANGUAGE):
+    try:
+        await redis_binary_client.set(transcript_cache_key(video_id, language), compress_transcript(transcript), ex=TRANSCRIPT_CACHE_TTL)
+    except redis.RedisError as e:
+        print(f"Failed to write transcript cache: {e}")
+
+    try:
+        await db_pool.execute("""
+            INSERT INTO transcripts (video_id, language, transcript, source, fetched_at)
+            VALUES ($1, $2, $3, $4, NOW())
+            ON CONFLICT (video_id, language)
+            DO UPDATE SET
+                transcript = EXCLUDED.transcript,
+                source = EXCLUDED.source,
+                fetched_at = EXCLUDED.fetched_at
+        """, video_id, language, transcript, source)
+    except Exception as e:
+        print(f"Failed to store transcript: {e}")
+        return False
+    return True
+
+class StreamedBody(io.RawIOBase):
+    """
+    A streamed httpx response's body as a blocking file object, for parsers running in a worker
+    thread: each read waits for the event loop to pull the next chunk off the connection.
+    """
+    def __init__(self, response, loop):
+        self.chunks = response.aiter_bytes()
+        self.loop = loop
+        self.pending = b""
+        self.eof = False
+
+    def readable(self):
+        return True
+
+    async def next_chunk(self):
+        try:
+            return await self.chunks.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    def readinto(self, buffer):
+        while not self.pending and not self.eof:
+            chunk = asyncio.run_coroutine_threadsafe(self.next_chunk(), self.loop).result()
+            if chunk is None:
+                self.eof = True
+            else:
+                self.pending = chunk
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        return size
+
+async def get_transcript_from_caption_url(caption_url):
+    """Async get_transcript_from_xml_url: the track is parsed and normalized in a thread as it downloads."""
+    try:
+        response = await http_get(caption_url, stream=True)
+        try:
+            if response.status_code != 200:
+                return None
+            fmt = caption_format(caption_url, response.headers.get("Content-Type", ""))
+            body = StreamedBody(response, asyncio.get_running_loop())
+            return await asyncio.to_thread(lambda: normalize_transcript(iter_caption_segments(body, fmt)))
+        finally:
+            await response.aclose()
+    except (httpx.HTTPError, QuotaExceededError, ET.ParseError, ValueError) as e:
+        print(f"Error processing caption track: {e}")
+        return None
+
+# Async counterparts of the sync transcript providers. They share names with them, so both modes
+# rank providers on the same rolling stats
+async def Youtube_Transcripts(video_id):
+    response = await http_get(
+        "https://youtube-transcripts.p.rapidapi.com/youtube/transcript",
+        headers={"x-rapidapi-key": RAPIDAPI_KEY, "x-rapidapi-host": "youtube-transcripts.p.rapidapi.com"},
+        params={"videoId": video_id, "chunkSize": "500"},
+    )
+    response.raise_for_status()
+    return [item["text"] for item in response.json().get("content", [])]
+
+async def Youtube_Transcript(video_id):
+    response = await http_get(
+        "https://youtube-transcript3.p.rapidapi.com/api/transcript",
+        headers={"x-rapidapi-key": RAPIDAPI_KEY, "x-rapidapi-host": "youtube-transcript3.p.rapidapi.com"},
+        params={"videoId": video_id},
+    )
+    return [entry["text"] for entry in response.json().get("transcript", [])]
+
+transcript_providers = {func.__name__: func for func in (Youtube_Transcripts, Youtube_Transcript)}
+
+async def run_transcript_provider(func, video_id):
+    start = time.time()
+    try:
+        transcript = await func(video_id)
+    except QuotaExceededError as e:
+        print(f"Skipped {func.__name__}: {e}")
+        TRANSCRIPT_PROVIDER_CALLS.labels(provider=func.__name__, outcome="quota").inc()
+        return None
+    except Exception as e:
+        print(f"Error occurred while trying {func.__name__}: {e}")
+        transcript = None
+    ok = is_valid_transcript(transcript)
+    elapsed = time.time() - start
+
+    try:
+        pipe = redis_client.pipeline()
+        queue_provider_sample(pipe, func.__name__, ok, elapsed)
+        await pipe.execute()
+    except redis.RedisError as e:
+        print(f"Failed to record stats for {func.__name__}: {e}")
+    observe_provider_call(func.__name__, ok, elapsed)
+    return transcript
+
+async def hedged_transcript(video_id):
+    """Async hedgedTranscript: same ranking and hedge delays, with tasks instead of threads."""
+    ranked, stats = await asyncio.to_thread(sync_app.rank_transcript_providers)
+    queue = [transcript_providers[func.__name__] for func in ranked if func.__name__ in transcript_providers]
+
+    deadline = time.time() + TRANSCRIPT_RACE_TIMEOUT
+    running = {}
+    launch_next = False
+
+    try:
+        while queue or running:
+            if queue and (not running or launch_next):
+                func = queue.pop(0)
+                running[asyncio.create_task(run_transcript_provider(func, video_id))] = func
+                delay = hedge_delay(stats[func.__name__])
+
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            timeout = min(delay, remaining) if queue else remaining
+            done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            launch_next = True
+            for task in done:
+                func = running.pop(task)
+                transcript = task.result()
+                if is_valid_transcript(transcript):
+                    print(f"Transcript from {func.__name__}")
+                    return transcript
+    finally:
+        for task in running:
+            task.cancel()
+
+    print("Failed to retrieve transcript using all available methods.")
+    return None
+
+async def fetch_transcript(video_id, caption_url):
+    """Async fetch_transcript: store first, then the caption track, then the provider race."""
+    transcript = await get_stored_transcript(video_id)
+    if transcript:
+        return transcript
+
+    if caption_url:
+        print(f"There is an XML URL: {caption_url}\n")
+        transcript = await get_transcript_from_caption_url(caption_url)
+        if transcript:
+            print("XML Succeeded")
+            await store_transcript(video_id, transcript, "xml")
+            return transcript
+        print("XML FAILED")
+    else:
+        print("There is NO XML URL")
+
+    print("Fallback transcript fetch through api")
+    transcript = await asyncio.to_thread(normalize_transcript, await hedged_transcript(video_id))
+    if transcript:
+        await store_transcript(video_id, transcript, "provider")
+    return transcript
+
+async def request_summary_json(prompt, sections, call):
+    response = await sync_app.model.generate_content_async(prompt, generation_config={
+        **generation_config,
+        "response_mime_type": "application/json",
+        "response_schema": summary_section_schema(sections),
+    })
+    LLM_CALLS.labels(call=call, outcome="success").inc()
+    record_llm_usage(call, response)
+    return json.loads(response.text)
+
+async def repair_summary_section(section, transcript, questions, sections=None, title=None):
+    print(f"Repairing summary section: {section}")
+    try:
+        data = await request_summary_json(build_section_repair_prompt(section, transcript, questions, sections, title), (section,), "repair")
+        value = parse_section_repair(section, data, questions, title)
+    except Exception as e:
+        print(f"Error repairing summary section {section}: {e}")
+        LLM_CALLS.labels(call="repair", outcome="error").inc()
+        value = None
+
+    SUMMARY_REPAIRS.labels(section=section, outcome="success" if value else "failed").inc()
+    return value
+
+async def gemini_summary(transcript, faqs):
+    """Async gemini_summary; the section repairs run concurrently instead of one after another."""
+    questions = list((faqs or {}).values())
+    try:
+        data = await request_summary_json(build_summary_json_prompt(transcript, questions), SUMMARY_JSON_SECTIONS, "summary")
+    except Exception as e:
+        print(f"Error occurred while fetching the summary and FAQs: {e}")
+        LLM_CALLS.labels(call="summary", outcome="error").inc()
+        SUMMARY_OUTCOMES.labels(outcome="failed").inc()
+        return None
+
+    plan = plan_summary_repairs(data, questions)
+    if not plan:
+        return None
+    questions, sections, answers, missing = plan
+
+    repairs = await asyncio.gather(*[
+        repair_summary_section(section, transcript, repair_questions(section, questions, answers), sections)
+        for section in missing
+    ])
+    return finish_summary(questions, sections, answers, missing, repairs)
+
+async def gemini_summary_single_pass(transcript, title):
+    try:
+        data = await request_summary_json(build_summary_json_prompt(transcript, [], title=title), SUMMARY_JSON_SECTIONS, "summary_single_pass")
+    except Exception as e:
+        print(f"Error occurred while fetching the single-pass summary: {e}")
+        LLM_CALLS.labels(call="summary_single_pass", outcome="error").inc()
+        SUMMARY_OUTCOMES.labels(outcome="failed").inc()
+        return None
+
+    plan = plan_summary_repairs(data, [], single_pass=True)
+    if not plan:
+        return None
+    questions, sections, answers, missing = plan
+
+    repairs = await asyncio.gather(*[
+        repair_summary_section(section, transcript, questions, sections, title) for section in missing
+    ])
+    return finish_summary(questions, sections, answers, missing, repairs, single_pass=True)
+
+async def summarize_chunk(chunk, index, total):
+    response = await sync_app.model.generate_content_async(build_chunk_prompt(chunk, index, total))
+    LLM_CALLS.labels(call="chunk", outcome="success").inc()
+    record_llm_usage("chunk", response)
+    return response.text.strip()
+
+async def condense_transcript(transcript):
+    """Async condense_transcript: the chunks are condensed concurrently on the event loop."""
+    chunks = plan_transcript_chunks(transcript)
+    if not chunks:
+        return transcript
+
+    step_start = time.time()
+    notes = await asyncio.gather(*[summarize_chunk(chunk, i, len(chunks)) for i, chunk in enumerate(chunks)])
+    print(f"Time to condense {len(chunks)} transcript chunks: {time.time() - step_start:.2f}s")
+    return join_chunk_notes(notes)
+
+async def summarize_transcript(transcript, faqs, mode="two_pass", title=None):
+    transcript = prepare_transcript(transcript)
+    if not transcript:
+        return None
+    try:
+        condensed = await condense_transcript(transcript)
+    except Exception as e:
+        print(f"Error occurred while condensing the transcript: {e}")
+        LLM_CALLS.labels(call="chunk", outcome="error").inc()
+        return None
+    if mode == "single_pass":
+        return await gemini_summary_single_pass(condensed, title)
+    return await gemini_summary(condensed, faqs)
+
+async def timed_stage(name, coro, timings, on_stage=None):
+    """Await one pipeline stage under its STAGE_TIMEOUTS budget, with run_stage_graph's logging and on_stage callback."""
+    start = time.time()
+    try:
+        result = await asyncio.wait_for(coro, STAGE_TIMEOUTS.get(name, DEFAULT_STAGE_TIMEOUT))
+    except asyncio.TimeoutError:
+        raise StageTimeoutError(f"Stage timed out: {name}")
+    finally:
+        timings[name] = time.time() - start
+        print(f"Time to {name}: {timings[name]:.2f}s")
+        SUMMARIZE_STAGE_SECONDS.labels(stage=name).observe(timings[name])
+    if on_stage:
+        on_stage(name)
+    return result
+
+async def summarize_video(video_id, mode=None, on_stage=None):
+    """
+    Async summarize_video: metadata, then FAQs and transcript side by side, then the summary.
+    :param mode: one of SUMMARY_MODES, defaults to SUMMARY_MODE
+    :param on_stage: called with each stage's name as it finishes, for progress reporting
+    """
+    mode = mode or SUMMARY_MODE
+    try:
+        pipeline_start = time.time()
+        timings = {}
+        title, caption_url, duration = await timed_stage("metadata", fetch_video_metadata(video_id), timings, on_stage)
+
+        transcript_task = asyncio.create_task(timed_stage("transcript", fetch_transcript(video_id, caption_url), timings, on_stage))
+        faqs_task = asyncio.create_task(timed_stage("faqs", get_faqs(title), timings, on_stage)) if mode != "single_pass" else None
+        try:
+            faq_dict = await faqs_task if faqs_task else None
+            transcript = await transcript_task
+        finally:
+            for task in (faqs_task, transcript_task):
+                if task:
+                    task.cancel()
+
+        check_summary_inputs(video_id, transcript, faq_dict, mode)
+        response = await timed_stage("summary", summarize_transcript(transcript, faq_dict, mode, title), timings, on_stage)
+        log_pipeline_timings(pipeline_start, timings)
+
+        return build_summary_payload(video_id, title, response)
+    except Exception as e:
+        return summary_error(e)
+
+async def keep_lock_alive(lock_key, token):
+    while True:
+        await asyncio.sleep(SINGLE_FLIGHT_RENEW_INTERVAL)
+        if not await renew_lock_script(keys=[lock_key], args=[token, SINGLE_FLIGHT_LOCK_TTL]):
+            return
+
+async def listen_single_flight():
+    """
+    One pattern subscription per process for every single-flight result and job update, handed to
+    the waiting requests' futures, so waiters don't each hold a Redis connection.
+    """
+    while True:
+        pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.psubscribe("singleflight:channel:*", "job:channel:*")
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message:
+                    for future in channel_waiters.pop(message["channel"], []):
+                        if not future.done():
+                            future.set_result(message["data"])
+        except redis.RedisError as e:
+            print(f"Single-flight listener lost its subscription: {e}")
+            await asyncio.sleep(1)
+        finally:
+            await pubsub.aclose()
+
+async def single_flight(video_id, mode, compute):
+    """Async single_flight, on the same keys and channel, so sync and async workers coalesce together."""
+    lock_key, result_prefix, channel = single_flight_keys(video_id, mode)
+    token = str(uuid.uuid4())
+
+    async def lead():
+        renewer = asyncio.create_task(keep_lock_alive(lock_key, token))
+        try:
+            payload, status = await compute()
+            message = single_flight_message(token, payload, status)
+            await redis_client.set(f"{result_prefix}:{token}", message, ex=SINGLE_FLIGHT_RESULT_TTL)
+            await redis_client.publish(channel, message)
+            return payload, status
+        finally:
+            renewer.cancel()
+            await release_lock_script(keys=[lock_key], args=[token])
+
+    if await redis_client.set(lock_key, token, nx=True, ex=SINGLE_FLIGHT_LOCK_TTL):
+        return await lead()
+
+    future = None
+    try:
+        leader = await redis_client.get(lock_key)
+        deadline = time.time() + SINGLE_FLIGHT_WAIT
+        while time.time() < deadline:
+            message = await redis_client.get(f"{result_prefix}:{leader}") if leader else None
+            if message:
+                return single_flight_result(message, leader)
+
+            # The listener hands each message on the channel to every waiting future, so wait on
+            # a fresh one after a message from another run
+            if future is None or future.done():
+                future = asyncio.get_running_loop().create_future()
+                channel_waiters.setdefault(channel, []).append(future)
+            try:
+                result = single_flight_result(await asyncio.wait_for(asyncio.shield(future), 1.0), leader)
+            except asyncio.TimeoutError:
+                result = None
+            if result:
+                return result
+
+            current = await redis_client.get(lock_key)
+            if current:
+                leader = current
+                continue
+            if leader and await redis_client.exists(f"{result_prefix}:{leader}"):
+                continue
+            if await redis_client.set(lock_key, token, nx=True, ex=SINGLE_FLIGHT_LOCK_TTL):
+                return await lead()
+    finally:
+        waiters = channel_waiters.get(channel, [])
+        if future in waiters:
+            waiters.remove(future)
+        if not waiters:
+            channel_waiters.pop(channel, None)
+
+    return await compute()
+
+async def get_summary_job(job_id):
+    job = await redis_client.hgetall(f"job:{job_id}")
+    return summary_job_status(job) if job else None
+
+async def summary_job_events(job_id):
+    """
+    Async summary_job_events: waits on the shared listener instead of a subscription per follower,
+    so a follower costs a future rather than a worker and a Redis connection.
+    """
+    channel = summary_job_channel(job_id)
+    future = None
+    try:
+        yield f"retry: {SUMMARY_JOB_EVENTS_RETRY_MS}\n\n"
+        sent = None
+        deadline = time.time() + SUMMARY_JOB_EVENTS_TIMEOUT
+        while time.time() < deadline:
+            # Register before reading, so an update published in between isn't missed
+            if future is None or future.done():
+                future = asyncio.get_running_loop().create_future()
+                channel_waiters.setdefault(channel, []).append(future)
+            job = await get_summary_job(job_id)
+            if not job:
+                yield sse_event("error", {"error": f"Unknown job {job_id}"})
+                return
+            if job != sent:
+                yield sse_event("status", job)
+                sent = job
+            if job["status"] in ("done", "failed"):
+                return
+            try:
+                await asyncio.wait_for(asyncio.shield(future), 15.0)
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+    finally:
+        waiters = channel_waiters.get(channel, [])
+        if future in waiters:
+            waiters.remove(future)
+        if not waiters:
+            channel_waiters.pop(channel, None)
+
+async def summarize_video_stream(video_id, refresh=False, mode=None):
+    """Async summarize_video_stream: the same events, with the run as a task on the event loop."""
+    mode = mode or SUMMARY_MODE
+    start_total = time.time()
+    try:
+        if not refresh:
+            cached = await get_cached_summary(video_id)
+            if cached:
+                yield sse_event("done", cached_summary_payload(video_id, cached))
+                return
+
+        events = asyncio.Queue()
+
+        def on_stage(name):
+            events.put_nowait(("stage", {"stage": name}))
+
+        async def run():
+            try:
+                result = await single_flight(video_id, mode, lambda: summarize_video(video_id, mode, on_stage))
+            except Exception as e:
+                result = error_payload(e), 500
+            events.put_nowait(("result", result))
+
+        task = asyncio.create_task(run())
+        while True:
+            try:
+                event, data = await asyncio.wait_for(events.get(), 15.0)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if event == "result":
+                yield summary_result_event(*data)
+                break
+            yield sse_event(event, data)
+        await task
+        print(f"Total processing time: {time.time() - start_total:.2f}s")
+
+    except Exception as e:
+        yield sse_event("error", error_payload(e))
+
+#-------------------------------------------------- ASGI Api's ----------------------------------------------------
+async def summarize(request):
+    try:
+        start_total = time.time()
+        data = await request.json()
+        url = data.get('url')
+        refresh = data.get('refresh', False)
+        mode = data.get('mode', SUMMARY_MODE)
+        if mode not in SUMMARY_MODES:
+            return JSONResponse({"error": f"Unknown mode {mode}, expected one of {', '.join(SUMMARY_MODES)}"}, status_code=400)
+        print(f"\n\nReceived request to summarize: {url} | Refresh: {refresh} | Mode: {mode}")
+
+        video_id = extract_video_id(url)
+
+        if data.get('stream', False):
+            return StreamingResponse(
+                summarize_video_stream(video_id, refresh, mode),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
+
+        if not refresh:
+            step_start = time.time()
+            cached = await get_cached_summary(video_id)
+            SUMMARIZE_STAGE_SECONDS.labels(stage="cache_lookup").observe(time.time() - step_start)
+            if cached:
+                print("Returning cached summary.")
+                print(f"Total processing time: {time.time() - start_total:.2f}s")
+                return JSONResponse(cached_summary_payload(video_id, cached))
+            print("Summary not in Cache")
+
+        if data.get('async', False):
+            payload, status = await asyncio.to_thread(sync_app.submit_summary_job, video_id, mode)
+            print(f"Total processing time: {time.time() - start_total:.2f}s")
+            return JSONResponse(payload, status_code=status)
+
+        payload, status = await single_flight(video_id, mode, lambda: summarize_video(video_id, mode))
+        print(f"Total processing time: {time.time() - start_total:.2f}s")
+        return JSONResponse(payload, status_code=status)
+
+    except Exception as e:
+        return JSONResponse(error_payload(e), status_code=400)
+
+async def summary_job_events_route(request):
+    return StreamingResponse(
+        summary_job_events(request.path_params["job_id"]),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# flask-cors covers the mounted routes; the async routes need their own CORS handling
+application = Starlette(
+    routes=[
+        Route(
+            "/summarize",
+            CORSMiddleware(request_response(summarize), allow_origins=["*"], allow_methods=["*"], allow_headers=["*"]),
+            methods=["POST", "OPTIONS"],
+        ),
+        # Served here rather than by the mounted Flask route, which holds a thread per follower
+        Route(
+            "/jobs/{job_id}/events",
+            CORSMiddleware(request_response(summary_job_events_route), allow_origins=["*"], allow_methods=["*"], allow_headers=["*"]),
+            methods=["GET", "OPTIONS"],
+        ),
+        Mount("/", WSGIMiddleware(sync_app.app)),
+    ],
+    lifespan=lifespan,
+)
@@ -0,0 +1,94 @@
+"""
+Cache-miss /summarize throughput of the sync app against the async path in asgi.py, with the
+same fake upstreams and fake model (benchmarks/fakes.py) behind both.
+
+    BENCH_DATABASE_URL=postgresql://localhost/yt_bench python benchmarks/bench_async_concurrency.py \
+        --sync-workers 4 --concurrency 25 50 200
+
+The sync path is driven with --sync-workers concurrent requests, the number of requests a
+gunicorn deployment with that many sync workers can hold in flight. The async path runs in one
+process and event loop, with each --concurrency level of requests in flight at once. Every
+request is a distinct video, so every one goes through metadata, FAQs, transcript and the model.
+
+The fake upstream server, fakeredis and transcript normalization all share this process, so once
+the async path is CPU-bound (about 50 in flight at the default latencies) req/s stops growing and
+latency grows instead. That ceiling is per process; run more uvicorn workers to go past it.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fakes import install_async_fakes
+from load_test import drive, percentile, prepare_app, setup_environment, summarize_request
+
+def report_row(name, concurrency, latencies, statuses, wall_time):
+    print(f"{name:<7} {concurrency:>11} {len(latencies) / wall_time:>9.1f} "
+          f"{percentile(latencies, 50) * 1000:>9.0f} {percentile(latencies, 95) * 1000:>9.0f}  statuses={statuses}")
+
+async def drive_async(client, requests_to_send, concurrency):
+    latencies = []
+    statuses = {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(request_spec):
+        method, path, body = request_spec
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.request(method, path, json=body)
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[send(request_spec) for request_spec in requests_to_send])
+    return latencies, statuses, time.perf_counter() - start
+
+async def run_async(levels, requests_per_level, run_id, upstream):
+    import httpx
+    import asgi
+
+    await asgi.startup()
+    install_async_fakes(asgi, upstream)
+    try:
+        transport = httpx.ASGITransport(app=asgi.application)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for concurrency in levels:
+                requests_to_send = [summarize_request(f"async{run_id}c{concurrency}n{i}") for i in range(requests_per_level)]
+                report_row("async", concurrency, *await drive_async(client, requests_to_send, concurrency))
+    finally:
+        await asgi.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL", "postgresql://localhost/yt_bench"))
+    parser.add_argument("--redis", choices=["fake", "local"], default="fake")
+    parser.add_argument("--redis-url", default=os.getenv("BENCH_REDIS_URL", "redis://localhost:6379/15"))
+    parser.add_argument("--sync-workers", type=int, default=4, help="requests the sync deployment holds in flight")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[25, 50, 200], help="async in-flight levels")
+    parser.add_argument("--requests", type=int, default=500, help="requests per level")
+    parser.add_argument("--gemini-latency", type=float, default=0.4, help="seconds per fake model call")
+    parser.add_argument("--upstream-latency", type=float, default=0.05, help="seconds per fake HTTP call")
+    parser.add_argument("--with-budgets", action="store_true", help="keep the upstream quota/rate budgets active")
+    args = parser.parse_args()
+    args.drop_section_rate = 0.0
+
+    setup_environment(args)
+    app, upstream, _ = prepare_app(args)
+    run_id = uuid.uuid4().hex[:6]
+
+    print(f"{'path':<7} {'concurrency':>11} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    try:
+        # The sync path is slow by design at low worker counts; a fraction of the requests is enough
+        sync_requests = [summarize_request(f"sync{run_id}n{i}") for i in range(max(args.sync_workers * 5, args.requests // 10))]
+        report_row("sync", args.sync_workers, *drive(app, sync_requests, args.sync_workers))
+        asyncio.run(run_async(args.concurrency, args.requests, run_id, upstream))
+    finally:
+        upstream.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Compare the old caption handling (download the whole document, ET.fromstring / json.loads, join)
+against the streaming parsers in captions.py, on generated multi-hour tracks in each format.
+
+    python benchmarks/bench_caption_parser.py [hours ...]
+
+Reports parse time (best of 3) and peak Python heap (tracemalloc) for each.
+"""
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from captions import iter_caption_segments
+
+WORDS = "so today we are looking at how the new chip compares to last year's model and what it means for battery life".split()
+
+def make_segments(hours):
+    # One caption line every ~3 seconds, as in auto-generated tracks
+    count = int(hours * 3600 / 3)
+    return [(i * 3.0, 3.2, " ".join(WORDS[(i + j) % len(WORDS)] for j in range(8))) for i in range(count)]
+
+def to_xml(segments):
+    lines = "".join(f'<text start="{start:.2f}" dur="{dur:.2f}">{escape(text)}</text>' for start, dur, text in segments)
+    return f'<?xml version="1.0" encoding="utf-8" ?><transcript>{lines}</transcript>'.encode("utf-8")
+
+def to_srv3(segments):
+    paragraphs = "".join(
+        f'<p t="{int(start * 1000)}" d="{int(dur * 1000)}" w="1">'
+        + "".join(f'<s t="{k * 300}" ac="0">{" " if k else ""}{escape(word)}</s>' for k, word in enumerate(text.split()))
+        + "</p>"
+        for start, dur, text in segments
+    )
+    return (f'<?xml version="1.0" encoding="utf-8" ?><timedtext format="3"><head></head>'
+            f'<body>{paragraphs}</body></timedtext>').encode("utf-8")
+
+def to_json3(segments):
+    events = [{
+        "tStartMs": int(start * 1000),
+        "dDurationMs": int(dur * 1000),
+        "segs": [{"utf8": word if k == 0 else f" {word}"} for k, word in enumerate(text.split())],
+    } for start, dur, text in segments]
+    return json.dumps({"wireMagic": "pb3", "events": events}).encode("utf-8")
+
+def old_xml(document):
+    root = ET.fromstring(document.decode("utf-8"))
+    return [elem.text for elem in root.iter() if elem.text]
+
+def old_json3(document):
+    events = json.loads(document.decode("utf-8"))["events"]
+    return ["".join(seg.get("utf8", "") for seg in event.get("segs", [])) for event in events]
+
+def measure(func):
+    best = None
+    for _ in range(3):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    result = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, result if isinstance(result, int) else len(result)
+
+def main():
+    hours_list = [float(arg) for arg in sys.argv[1:]] or [1, 3, 6]
+    print(f"{'hours':>5} {'format':<6} {'size':>9} {'parser':<10} {'time':>9} {'peak heap':>11} {'segments':>9}")
+
+    for hours in hours_list:
+        segments = make_segments(hours)
+        for fmt, document, old in (
+            ("xml", to_xml(segments), old_xml),
+            ("srv3", to_srv3(segments), old_xml),
+            ("json3", to_json3(segments), old_json3),
+        ):
+            size = f"{len(document) / 1e6:.1f}MB"
+            parse_format = "json3" if fmt == "json3" else "xml"
+
+            # The old path holds the full body (as bytes and str) plus the tree; the streaming path
+            # reads the body a chunk at a time. Segments are counted, not kept, so the streaming peak
+            # is the parser's own working set
+            runs = (
+                ("buffered", lambda: old(bytes(document))),
+                ("streaming", lambda: sum(1 for _ in iter_caption_segments(io.BytesIO(document), parse_format))),
+            )
+            for name, func in runs:
+                elapsed, peak, count = measure(func)
+                print(f"{hours:>5} {fmt:<6} {size:>9} {name:<10} {elapsed * 1000:>7.0f}ms {peak / 1e6:>9.1f}MB {count:>9}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Compare the per-row trending_videos upsert loop against bulk_upsert_trending_videos().
+
+Needs a throwaway Postgres (the trending_videos table in it is truncated between runs):
+    BENCH_DATABASE_URL=postgresql://localhost/yt_bench python benchmarks/bench_insert_trending.py
+"""
+import os
+import sys
+import time
+import random
+from datetime import datetime, timezone, timedelta
+
+DATABASE_URL = os.getenv("BENCH_DATABASE_URL", "postgresql://localhost/yt_bench")
+
+# app.py reads these at import time; point it at the throwaway database
+os.environ["YOUTUBE_STATISTICS_DB_URL"] = DATABASE_URL
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/15")
+os.environ.setdefault("GEMINI_API_KEY", "bench")
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import psycopg2
+import app
+
+SIZES = [100, 1000, 10000]
+
+def make_videos(n):
+    now = datetime.now(timezone.utc)
+    return [{
+        "id": f"bench{i:07d}",
+        "title": f"Benchmark video {i}",
+        "channelTitle": f"Channel {i % 40}",
+        "channel_id": f"UCbench{i % 40:03d}",
+        "duration_minutes": round(random.uniform(4, 60), 2),
+        "views": random.randint(0, 10_000_000),
+        "likes": random.randint(0, 100_000),
+        "comments": random.randint(0, 10_000),
+        "published_at": (now - timedelta(days=random.randint(0, 30))).isoformat(),
+    } for i in range(n)]
+
+def per_row_upsert(cursor, video_list):
+    """The original insert_trending_videos loop: one statement per video."""
+    for video in video_list:
+        cursor.execute("""
+            INSERT INTO trending_videos
+                (video_id, title, channel_id, channel_name, duration_minutes, views, likes, comments, published_at, fetched_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (video_id)
+            DO UPDATE SET
+                title = EXCLUDED.title,
+                channel_name = EXCLUDED.channel_name,
+                channel_id = EXCLUDED.channel_id,
+                duration_minutes = EXCLUDED.duration_minutes,
+                views = EXCLUDED.views,
+                likes = EXCLUDED.likes,
+                comments = EXCLUDED.comments,
+                fetched_at = EXCLUDED.fetched_at
+        """, (
+            video["id"], video["title"], video.get("channel_id"), video["channelTitle"],
+            video["duration_minutes"], video.get("views", 0), video.get("likes", 0),
+            video.get("comments", 0), video.get("published_at"), datetime.now(timezone.utc)
+        ))
+
+def timed(conn, func, videos):
+    cursor = conn.cursor()
+    start = time.perf_counter()
+    func(cursor, videos)
+    conn.commit()
+    elapsed = time.perf_counter() - start
+    cursor.close()
+    return elapsed
+
+def main():
+    conn = psycopg2.connect(DATABASE_URL)
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS trending_videos (
+            video_id TEXT PRIMARY KEY,
+            title TEXT,
+            channel_id TEXT,
+            channel_name TEXT,
+            duration_minutes REAL,
+            views BIGINT,
+            likes BIGINT,
+            comments BIGINT,
+            published_at TIMESTAMPTZ,
+            fetched_at TIMESTAMPTZ
+        )
+    """)
+    conn.commit()
+
+    print(f"{'rows':>6} | {'mode':>6} | {'per-row':>9} | {'bulk':>9} | {'speedup':>7}")
+    for size in SIZES:
+        videos = make_videos(size)
+        for mode in ("insert", "update"):
+            results = {}
+            for name, func in (("per-row", per_row_upsert), ("bulk", app.bulk_upsert_trending_videos)):
+                if mode == "insert":
+                    cursor.execute("TRUNCATE trending_videos")
+                    conn.commit()
+                else:
+                    cursor.execute("TRUNCATE trending_videos")
+                    app.bulk_upsert_trending_videos(cursor, videos)
+                    conn.commit()
+                results[name] = timed(conn, func, videos)
+            print(f"{size:>6} | {mode:>6} | {results['per-row']:>8.3f}s | {results['bulk']:>8.3f}s | "
+                  f"{results['per-row'] / results['bulk']:>6.1f}x")
+
+    cursor.execute("TRUNCATE trending_videos")
+    conn.commit()
+    conn.close()
+
+if __name__ == "__main__":
+    main()
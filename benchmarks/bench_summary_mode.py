@@ -0,0 +1,110 @@
+"""
+Compare the two summary modes on the same transcript: two_pass (generate_faqs, then the summary
+call answers those questions) and single_pass (one call writes and answers the questions).
+
+Against the real model (needs GEMINI_API_KEY and network; costs tokens):
+    BENCH_DATABASE_URL=postgresql://localhost/yt_bench python benchmarks/bench_summary_mode.py \
+        --transcript transcript.txt --title "Video title" --runs 5
+Offline with the fake model (latency model only, token counts are estimates):
+    BENCH_DATABASE_URL=postgresql://localhost/yt_bench python benchmarks/bench_summary_mode.py --fake
+
+Reports p50/p95 end-to-end latency, model calls and prompt/output tokens per summary. In the
+/summarize pipeline the FAQ call overlaps the transcript fetch, so the faqs column shows how much
+of the two-pass latency that overlap can hide.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fakes import FakeGeminiModel, fake_transcript_segments
+from load_test import setup_environment, percentile
+
+def token_totals(registry):
+    totals = {"prompt": 0, "output": 0}
+    for metric in registry.collect():
+        if metric.name != "llm_tokens":
+            continue
+        for sample in metric.samples:
+            if sample.name == "llm_tokens_total":
+                totals[sample.labels["kind"]] += sample.value
+    return totals
+
+def call_count(registry):
+    total = 0
+    for metric in registry.collect():
+        if metric.name == "llm_calls":
+            total += sum(sample.value for sample in metric.samples if sample.name == "llm_calls_total")
+    return total
+
+def run_mode(app, mode, transcript, title, runs):
+    latencies, faq_latencies = [], []
+    tokens = {"prompt": 0, "output": 0}
+    calls = 0
+    failures = 0
+
+    for _ in range(runs):
+        tokens_before, calls_before = token_totals(app.REGISTRY), call_count(app.REGISTRY)
+        start = time.perf_counter()
+        if mode == "two_pass":
+            faqs = app.generate_faqs(title)
+            faq_latencies.append(time.perf_counter() - start)
+            result = app.summarize_transcript(transcript, faqs)
+        else:
+            result = app.summarize_transcript(transcript, None, mode, title)
+        latencies.append(time.perf_counter() - start)
+
+        if not result or not result.get("faqs"):
+            failures += 1
+        tokens_after = token_totals(app.REGISTRY)
+        for kind in tokens:
+            tokens[kind] += tokens_after[kind] - tokens_before[kind]
+        calls += call_count(app.REGISTRY) - calls_before
+
+    return {
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "faqs_p50": percentile(faq_latencies, 50),
+        "calls": calls / runs,
+        "prompt_tokens": tokens["prompt"] / runs,
+        "output_tokens": tokens["output"] / runs,
+        "failures": failures,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL", "postgresql://localhost/yt_bench"))
+    parser.add_argument("--redis", choices=["fake", "local"], default="fake")
+    parser.add_argument("--redis-url", default=os.getenv("BENCH_REDIS_URL", "redis://localhost:6379/15"))
+    parser.add_argument("--transcript", help="text file with a transcript; defaults to a generated 12-minute one")
+    parser.add_argument("--title", default="I tested the new phone for a month")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--fake", action="store_true", help="use the fake model instead of Gemini")
+    parser.add_argument("--gemini-latency", type=float, default=0.8, help="seconds per fake model call")
+    args = parser.parse_args()
+
+    setup_environment(args)
+    import app
+    if args.fake:
+        app.model = FakeGeminiModel(base_latency=args.gemini_latency)
+
+    if args.transcript:
+        with open(args.transcript) as f:
+            transcript = f.read()
+    else:
+        transcript = " ".join(text for _, _, text in fake_transcript_segments("bench", 12))
+    # summarize_transcript takes the normalized text fetch_transcript stores
+    transcript = app.normalize_transcript(transcript)
+
+    print(f"{'mode':<12} {'p50':>8} {'p95':>8} {'faqs p50':>9} {'calls':>6} {'prompt tok':>11} {'output tok':>11} {'failed':>7}")
+    for mode in app.SUMMARY_MODES:
+        result = run_mode(app, mode, transcript, args.title, args.runs)
+        faqs_p50 = f"{result['faqs_p50']:.2f}s" if result["faqs_p50"] is not None else "-"
+        print(f"{mode:<12} {result['p50']:>7.2f}s {result['p95']:>7.2f}s {faqs_p50:>9} {result['calls']:>6.1f} "
+              f"{result['prompt_tokens']:>11.0f} {result['output_tokens']:>11.0f} {result['failures']:>7}")
+
+if __name__ == "__main__":
+    main()
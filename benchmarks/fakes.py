@@ -0,0 +1,272 @@
+"""
+Local stand-ins for every external service app.py talks to, for offline benchmarks.
+
+- FakeUpstreamServer: one HTTP server answering for the RapidAPI hosts, the caption host (XML, or
+  srv3/json3 with fmt=) and the YouTube Data API. Requests arrive as http://127.0.0.1:<port>/<original host><original path>
+  (see install_fakes), with a configurable latency per host.
+- FakeGeminiModel: drop-in for app.model with a configurable latency and canned responses in the
+  formats the prompts ask for, including streaming and generate_content_async.
+"""
+import asyncio
+import json
+import re
+import threading
+import time
+import random
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, urlencode
+
+SENTENCES = [
+    "Today we are looking at how the new chip compares to last year's model.",
+    "The battery lasted almost two full days in our testing.",
+    "Thermals were better than expected under sustained load.",
+    "Pricing starts at nine hundred ninety nine dollars for the base configuration.",
+    "The display is brighter outdoors and the refresh rate is now adaptive.",
+    "Overall it is a solid upgrade if you are coming from an older device.",
+]
+
+def fake_transcript_segments(video_id, minutes):
+    """Caption segments covering `minutes` of speech, about one sentence every 4 seconds."""
+    rng = random.Random(video_id)
+    return [(i * 4.0, 4.0, rng.choice(SENTENCES)) for i in range(int(minutes * 15))]
+
+def video_minutes(video_id):
+    # IDs starting with "long" are multi-hour videos; everything else is ~12 minutes
+    return 180 if video_id.startswith("long") else 12
+
+class FakeUpstreamServer:
+    def __init__(self, latencies=None, default_latency=0.05):
+        self.latencies = latencies or {}
+        self.default_latency = default_latency
+        self.calls = {}
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.make_handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+    def make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                host, _, path = parsed.path.lstrip("/").partition("/")
+                params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+                with fake.lock:
+                    fake.calls[host] = fake.calls.get(host, 0) + 1
+                time.sleep(fake.latencies.get(host, fake.default_latency))
+
+                status, content_type, body = fake.respond(host, "/" + path, params)
+                payload = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+    def respond(self, host, path, params):
+        if host == "yt-api.p.rapidapi.com" and path == "/video/info":
+            video_id = params["id"]
+            caption_url = f"https://www.youtube.com/api/timedtext?{urlencode({'v': video_id, 'lang': 'en'})}"
+            return 200, "application/json", json.dumps({
+                "title": f"Benchmark video {video_id}",
+                "lengthSeconds": str(video_minutes(video_id) * 60),
+                "subtitles": {"subtitles": [{"languageCode": "en", "languageName": "English", "url": caption_url}]},
+            })
+
+        if host == "www.youtube.com" and path == "/api/timedtext":
+            segments = fake_transcript_segments(params["v"], video_minutes(params["v"]))
+            if params.get("fmt") == "json3":
+                return 200, "application/json; charset=UTF-8", json.dumps({"wireMagic": "pb3", "events": [
+                    {"tStartMs": int(start * 1000), "dDurationMs": int(dur * 1000), "segs": [{"utf8": text}]}
+                    for start, dur, text in segments
+                ]})
+            if params.get("fmt") == "srv3":
+                paragraphs = "".join(
+                    f'<p t="{int(start * 1000)}" d="{int(dur * 1000)}">{text}</p>' for start, dur, text in segments
+                )
+                return 200, "text/xml", f'<?xml version="1.0" encoding="utf-8" ?><timedtext format="3"><body>{paragraphs}</body></timedtext>'
+            texts = "".join(
+                f'<text start="{start:.2f}" dur="{dur:.2f}">{text}</text>' for start, dur, text in segments
+            )
+            return 200, "text/xml", f'<?xml version="1.0" encoding="utf-8" ?><transcript>{texts}</transcript>'
+
+        if host == "youtube-transcripts.p.rapidapi.com":
+            segments = fake_transcript_segments(params["videoId"], video_minutes(params["videoId"]))
+            return 200, "application/json", json.dumps({"content": [{"text": text} for _, _, text in segments]})
+
+        if host == "youtube-transcript3.p.rapidapi.com":
+            segments = fake_transcript_segments(params["videoId"], video_minutes(params["videoId"]))
+            return 200, "application/json", json.dumps({"transcript": [{"text": text} for _, _, text in segments]})
+
+        if host == "youtube.googleapis.com" and path == "/youtube/v3/search":
+            channel_id = params["channelId"]
+            count = int(params.get("maxResults", 3))
+            return 200, "application/json", json.dumps({
+                "items": [{"id": {"videoId": f"{channel_id[-6:]}v{i}"}} for i in range(count)]
+            })
+
+        if host == "youtube.googleapis.com" and path == "/youtube/v3/videos":
+            return 200, "application/json", json.dumps({"items": [{
+                "id": video_id,
+                "snippet": {
+                    "title": f"Trending video {video_id}",
+                    "publishedAt": "2026-10-01T12:00:00Z",
+                    "channelTitle": f"Channel {video_id[:6]}",
+                    "channelId": f"UC{video_id[:6]}",
+                },
+                "statistics": {"viewCount": str(random.randint(1000, 10**7)), "likeCount": "100", "commentCount": "10"},
+                "contentDetails": {"duration": "PT14M3S"},
+            } for video_id in params["id"].split(",")]})
+
+        return 200, "text/plain", "Pong! Server is alive!"
+
+class FakeResponse:
+    def __init__(self, text, prompt):
+        self.text = text
+        self.usage_metadata = FakeUsage(prompt, text)
+
+class FakeUsage:
+    def __init__(self, prompt, text):
+        self.prompt_token_count = len(prompt) // 4 + 1
+        self.candidates_token_count = len(text) // 4 + 1
+        self.total_token_count = self.prompt_token_count + self.candidates_token_count
+
+class FakeChatSession:
+    def __init__(self, model):
+        self.model = model
+
+    def send_message(self, prompt, stream=False, generation_config=None):
+        if generation_config and generation_config.get("response_mime_type") == "application/json":
+            text = self.model.reply_json(prompt, generation_config["response_schema"])
+        else:
+            text = self.model.reply(prompt)
+        if not stream:
+            time.sleep(self.model.latency_for(prompt))
+            return FakeResponse(text, prompt)
+        return self.stream(text, prompt)
+
+    def stream(self, text, prompt):
+        # First chunk after the time-to-first-token, the rest spread over the remaining latency
+        chunks = [text[i:i + 40] for i in range(0, len(text), 40)]
+        total = self.model.latency_for(prompt)
+        time.sleep(total * 0.2)
+        for chunk in chunks:
+            time.sleep(total * 0.8 / len(chunks))
+            yield FakeResponse(chunk, "")
+
+class FakeGeminiModel:
+    """
+    Stand-in for genai.GenerativeModel. Latency is base_latency plus per_1k_tokens for every
+    1000 prompt tokens, so long transcripts cost more, like the real model.
+    """
+
+    def __init__(self, base_latency=0.4, per_1k_tokens=0.05, drop_section_rate=0.0):
+        self.base_latency = base_latency
+        self.per_1k_tokens = per_1k_tokens
+        # Share of full JSON summaries that come back with one section missing, to exercise repairs
+        self.drop_section_rate = drop_section_rate
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def latency_for(self, prompt):
+        return self.base_latency + self.per_1k_tokens * (len(prompt) / 4 / 1000)
+
+    def start_chat(self):
+        with self.lock:
+            self.calls += 1
+        return FakeChatSession(self)
+
+    def generate_content(self, prompt, stream=False, generation_config=None):
+        return self.start_chat().send_message(prompt, stream=stream, generation_config=generation_config)
+
+    async def generate_content_async(self, prompt, generation_config=None):
+        with self.lock:
+            self.calls += 1
+        if generation_config and generation_config.get("response_mime_type") == "application/json":
+            text = self.reply_json(prompt, generation_config["response_schema"])
+        else:
+            text = self.reply(prompt)
+        await asyncio.sleep(self.latency_for(prompt))
+        return FakeResponse(text, prompt)
+
+    def reply_json(self, prompt, schema):
+        questions = re.findall(r"^\s*\d+\. (.+)$", prompt, re.MULTILINE)
+        if not questions and "video title" in prompt:
+            # Single-pass mode: the model writes the questions itself
+            questions = [f"What is point {i} of this video?" for i in range(1, 4)]
+        sections = {
+            "description": "A benchmark video about a new device, its battery, thermals and price.",
+            "key_points": [
+                {"heading": "Battery", "explanation": "It lasts almost two days in testing."},
+                {"heading": "Thermals", "explanation": "Better than expected under load."},
+                {"heading": "Price", "explanation": "Starts at $999 for the base model."},
+            ],
+            "faqs": [{"question": question, "answer": f"It covers {question.lower()}"} for question in questions],
+        }
+        data = {name: sections[name] for name in schema["properties"]}
+        if len(data) > 1 and random.random() < self.drop_section_rate:
+            del data[random.choice(list(data))]
+        return json.dumps(data)
+
+    def reply(self, prompt):
+        if "---QUESTION---" in prompt:
+            return "\n".join(f"---QUESTION--- What is point {i} of this video?" for i in range(1, 4))
+        if "dense notes" in prompt:
+            return "\n".join(f"- {sentence}" for sentence in SENTENCES[:4])
+        questions = re.findall(r"What is point \d of this video\?", prompt) or ["Q1", "Q2", "Q3"]
+        answers = "\n".join(
+            f"ANSWER{i}: It covers {question.lower()} ---ANSWER_SEPARATOR---" for i, question in enumerate(questions[:3], 1)
+        )
+        return (
+            "**Description:**\nA benchmark video about a new device, its battery, thermals and price.\n\n"
+            "**Key Points:**\n\n"
+            "- **Battery**: It lasts almost two days in testing.\n\n"
+            "- **Thermals**: Better than expected under load.\n\n"
+            "- **Price**: Starts at $999 for the base model.\n\n"
+            f"**Answer Section:**\n{answers}"
+        )
+
+def install_fakes(app_module, upstream, gemini):
+    """Point app.py's outbound HTTP at the fake server and swap in the fake model."""
+    real_get = app_module.http_session.get
+
+    def rewritten_get(url, **kwargs):
+        parsed = urlparse(url)
+        fake_url = f"{upstream.base_url}/{parsed.hostname}{parsed.path}"
+        if parsed.query:
+            fake_url += f"?{parsed.query}"
+        return real_get(fake_url, **kwargs)
+
+    app_module.http_session.get = rewritten_get
+    app_module.model = gemini
+
+def install_async_fakes(asgi_module, upstream):
+    """Same as install_fakes for asgi.py's httpx client; call after asgi.startup()."""
+    real_build_request = asgi_module.http_client.build_request
+
+    # get() and send(stream=True) both build their request here
+    def rewritten_build_request(method, url, **kwargs):
+        parsed = urlparse(str(url))
+        fake_url = f"{upstream.base_url}/{parsed.hostname}{parsed.path}"
+        if parsed.query:
+            fake_url += f"?{parsed.query}"
+        return real_build_request(method, fake_url, **kwargs)
+
+    asgi_module.http_client.build_request = rewritten_build_request
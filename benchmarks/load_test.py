@@ -0,0 +1,302 @@
+"""
+Offline load test for /summarize, /popular_videos and the scheduler jobs.
+
+Every external service is replaced by a local stand-in (benchmarks/fakes.py): RapidAPI, the
+caption host and the YouTube Data API by a fake HTTP server, Gemini by a fake model, Redis by
+fakeredis (or a local Redis with --redis local). Postgres must be a throwaway local database;
+its tables are truncated at the start of the run.
+
+    pip install -r benchmarks/requirements.txt
+    BENCH_DATABASE_URL=postgresql://localhost/yt_bench python benchmarks/load_test.py --save baseline.json
+    BENCH_DATABASE_URL=postgresql://localhost/yt_bench python benchmarks/load_test.py --compare baseline.json
+
+Reports requests/s and p50/p95/p99 per scenario and per /summarize stage.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fakes import FakeUpstreamServer, FakeGeminiModel, install_fakes
+
+SCENARIOS = ["summarize_hit", "summarize_miss", "summarize_duplicate", "summarize_long", "popular_videos", "jobs"]
+
+# Tables app.py expects but doesn't create itself
+BASE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS summaries (
+        id SERIAL PRIMARY KEY,
+        youtube_title TEXT,
+        youtube_url TEXT,
+        video_id TEXT,
+        description TEXT,
+        key_points TEXT,
+        faqs JSONB,
+        times_summarized INTEGER NOT NULL DEFAULT 0,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    );
+    CREATE TABLE IF NOT EXISTS logs (
+        id SERIAL PRIMARY KEY,
+        video_title TEXT,
+        video_url TEXT,
+        status_code INTEGER,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    );
+    CREATE TABLE IF NOT EXISTS trending_videos (
+        video_id TEXT PRIMARY KEY,
+        title TEXT,
+        channel_id TEXT,
+        channel_name TEXT,
+        duration_minutes REAL,
+        views BIGINT,
+        likes BIGINT,
+        comments BIGINT,
+        published_at TIMESTAMPTZ,
+        fetched_at TIMESTAMPTZ
+    );
+"""
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+def summarize_latencies(latencies, wall_time=None):
+    result = {
+        "count": len(latencies),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1) if latencies else None,
+    }
+    if wall_time:
+        result["requests_per_second"] = round(len(latencies) / wall_time, 2)
+    return result
+
+class RecordingHistogram:
+    """Stands in for a labelled prometheus Histogram and keeps every raw sample."""
+
+    def __init__(self):
+        self.samples = {}
+        self.lock = threading.Lock()
+
+    def labels(self, **labels):
+        key = "/".join(str(value) for value in labels.values())
+        recorder = self
+
+        class Child:
+            def observe(self, value):
+                with recorder.lock:
+                    recorder.samples.setdefault(key, []).append(value)
+
+        return Child()
+
+    def drain(self):
+        with self.lock:
+            samples, self.samples = self.samples, {}
+        return samples
+
+def setup_environment(args):
+    os.environ["YOUTUBE_STATISTICS_DB_URL"] = args.database_url
+    os.environ.setdefault("GEMINI_API_KEY", "bench")
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+    os.environ.setdefault("RAPIDAPI_KEY", "bench")
+    os.environ.setdefault("youtube_data_api_key", "bench")
+    os.environ["REDIS_URL"] = args.redis_url
+    # Jobs are driven explicitly by the "jobs" scenario
+    os.environ["SCHEDULER_ENABLED"] = "false"
+
+    if args.redis == "fake":
+        import fakeredis
+        import redis
+        server = fakeredis.FakeServer()
+        redis.from_url = lambda url, **kwargs: fakeredis.FakeRedis(server=server, **kwargs)
+        # asgi.py's clients share the same fake server
+        import redis.asyncio
+        redis.asyncio.from_url = lambda url, **kwargs: fakeredis.FakeAsyncRedis(server=server, **kwargs)
+
+def prepare_app(args):
+    import app
+
+    conn = app.connection_pool.getconn()
+    cursor = conn.cursor()
+    cursor.execute(BASE_SCHEMA)
+    conn.commit()
+    app.ensure_tables()
+    cursor.execute("TRUNCATE summaries, logs, trending_videos, transcripts, faq_questions")
+    conn.commit()
+    cursor.close()
+    app.connection_pool.putconn(conn)
+    app.redis_client.flushdb()
+
+    if not args.with_budgets:
+        for upstream in app.UPSTREAMS.values():
+            upstream.pop("budget", None)
+
+    upstream = FakeUpstreamServer(default_latency=args.upstream_latency).start()
+    gemini = FakeGeminiModel(base_latency=args.gemini_latency, drop_section_rate=args.drop_section_rate)
+    install_fakes(app, upstream, gemini)
+
+    app.SUMMARIZE_STAGE_SECONDS = RecordingHistogram()
+    app.TRANSCRIPT_PROVIDER_SECONDS = RecordingHistogram()
+    return app, upstream, gemini
+
+def drive(app, requests_to_send, concurrency):
+    """Send (method, path, json) requests with `concurrency` threads; returns latencies, statuses, wall time."""
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def send(request_spec):
+        method, path, body = request_spec
+        client = app.app.test_client()
+        start = time.perf_counter()
+        response = client.open(path, method=method, json=body)
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(send, requests_to_send))
+    return latencies, statuses, time.perf_counter() - start
+
+def summarize_request(video_id):
+    return ("POST", "/summarize", {"url": f"https://www.youtube.com/watch?v={video_id}"})
+
+def run_scenario(name, app, args, run_id):
+    n = args.requests
+    if name == "summarize_hit":
+        for i in range(50):
+            app.insert_summary(f"Seeded {i}", f"https://youtu.be/hit{run_id}{i}", f"hit{run_id}{i}",
+                               "A seeded description.", "- **Point**: seeded.", {"Q?": "A."})
+        requests_to_send = [summarize_request(f"hit{run_id}{i % 50}") for i in range(n)]
+    elif name == "summarize_miss":
+        requests_to_send = [summarize_request(f"miss{run_id}{i}") for i in range(n)]
+    elif name == "summarize_duplicate":
+        # Bursts of identical requests, each burst as wide as the concurrency
+        requests_to_send = [summarize_request(f"dup{run_id}{i // args.concurrency}") for i in range(n)]
+    elif name == "summarize_long":
+        requests_to_send = [summarize_request(f"long{run_id}{i}") for i in range(max(1, n // 10))]
+    elif name == "popular_videos":
+        app.fetch_and_store_trending(num_channels=len(app.youtube_channels_data), top_x=5)
+        requests_to_send = [("GET", "/popular_videos", None) for _ in range(n)]
+    else:
+        raise ValueError(name)
+
+    latencies, statuses, wall_time = drive(app, requests_to_send, args.concurrency)
+    result = summarize_latencies(latencies, wall_time)
+    result["statuses"] = statuses
+    return result
+
+def run_jobs(app, repeats=3):
+    results = {}
+    # The scheduler is off; take the lease so the cache refresh can publish its generation
+    app.scheduler_heartbeat()
+    for job in (app.fetch_and_store_trending, app.presummarize_trending, app.refresh_popular_and_summaries_cache):
+        durations = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            job()
+            durations.append(time.perf_counter() - start)
+        results[job.__name__] = summarize_latencies(durations)
+    return results
+
+def print_report(report, baseline=None):
+    def delta(path, value):
+        if baseline is None or value is None:
+            return ""
+        node = baseline
+        for key in path:
+            node = node.get(key, {}) if isinstance(node, dict) else {}
+        if not isinstance(node, (int, float)) or not node:
+            return ""
+        return f" ({(value - node) / node * 100:+.0f}%)"
+
+    print(f"\n{'scenario':<28} {'req/s':>14} {'p50 ms':>16} {'p95 ms':>16} {'p99 ms':>16}")
+    for name, result in report["scenarios"].items():
+        if name == "jobs":
+            continue
+        print(f"{name:<28} "
+              f"{str(result.get('requests_per_second')) + delta(['scenarios', name, 'requests_per_second'], result.get('requests_per_second')):>14} "
+              f"{str(result['p50_ms']) + delta(['scenarios', name, 'p50_ms'], result['p50_ms']):>16} "
+              f"{str(result['p95_ms']) + delta(['scenarios', name, 'p95_ms'], result['p95_ms']):>16} "
+              f"{str(result['p99_ms']) + delta(['scenarios', name, 'p99_ms'], result['p99_ms']):>16}"
+              f"  statuses={result['statuses']}")
+
+    for section in ("stages", "providers", "jobs"):
+        rows = report["scenarios"].get("jobs", {}) if section == "jobs" else report.get(section, {})
+        if not rows:
+            continue
+        print(f"\n{section:<28} {'count':>6} {'p50 ms':>16} {'p95 ms':>16} {'p99 ms':>16}")
+        path = ["scenarios", "jobs"] if section == "jobs" else [section]
+        for name, result in rows.items():
+            print(f"{name:<28} {result['count']:>6} "
+                  f"{str(result['p50_ms']) + delta(path + [name, 'p50_ms'], result['p50_ms']):>16} "
+                  f"{str(result['p95_ms']) + delta(path + [name, 'p95_ms'], result['p95_ms']):>16} "
+                  f"{str(result['p99_ms']) + delta(path + [name, 'p99_ms'], result['p99_ms']):>16}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL", "postgresql://localhost/yt_bench"))
+    parser.add_argument("--redis", choices=["fake", "local"], default="fake")
+    parser.add_argument("--redis-url", default=os.getenv("BENCH_REDIS_URL", "redis://localhost:6379/15"))
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--gemini-latency", type=float, default=0.4, help="seconds per fake model call")
+    parser.add_argument("--drop-section-rate", type=float, default=0.0,
+                        help="share of fake JSON summaries missing a section (exercises the repair path)")
+    parser.add_argument("--upstream-latency", type=float, default=0.05, help="seconds per fake HTTP call")
+    parser.add_argument("--with-budgets", action="store_true", help="keep the upstream quota/rate budgets active")
+    parser.add_argument("--save", help="write the report as JSON (e.g. a baseline)")
+    parser.add_argument("--compare", help="baseline JSON to show deltas against")
+    args = parser.parse_args()
+
+    setup_environment(args)
+    app, upstream, gemini = prepare_app(args)
+    run_id = uuid.uuid4().hex[:6]
+
+    report = {"config": vars(args), "scenarios": {}, "stages": {}, "providers": {}}
+    stage_samples = {}
+    provider_samples = {}
+    try:
+        for name in args.scenarios:
+            print(f"Running {name}...")
+            if name == "jobs":
+                report["scenarios"][name] = run_jobs(app)
+            else:
+                report["scenarios"][name] = run_scenario(name, app, args, run_id)
+            for stage, samples in app.SUMMARIZE_STAGE_SECONDS.drain().items():
+                stage_samples.setdefault(stage, []).extend(samples)
+            for provider, samples in app.TRANSCRIPT_PROVIDER_SECONDS.drain().items():
+                provider_samples.setdefault(provider, []).extend(samples)
+    finally:
+        upstream.stop()
+
+    report["stages"] = {stage: summarize_latencies(samples) for stage, samples in stage_samples.items()}
+    report["providers"] = {provider: summarize_latencies(samples) for provider, samples in provider_samples.items()}
+    report["upstream_calls"] = upstream.calls
+    report["model_calls"] = gemini.calls
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    print(f"\nupstream calls: {upstream.calls}\nmodel calls: {gemini.calls}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved report to {args.save}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Streaming parsers for YouTube caption tracks.
+
+Both parsers read from a file-like object (e.g. a streamed response's .raw) a chunk at a time and
+yield (start, duration, text) segments with times in seconds, so memory stays flat no matter how
+long the track is. Supported formats:
+
+- XML (the default timedtext format): <transcript><text start="1.2" dur="3.4">...</text></transcript>
+- srv3: <timedtext format="3"><body><p t="1200" d="3400">...<s>word</s>...</p></body></timedtext>
+- json3: {"events": [{"tStartMs": 1200, "dDurationMs": 3400, "segs": [{"utf8": "..."}]}, ...]}
+"""
+import codecs
+import json
+import xml.etree.ElementTree as ET
+from urllib.parse import urlparse, parse_qs
+
+CHUNK_SIZE = 64 * 1024
+
+def caption_format(url, content_type=""):
+    """"json3" for JSON caption tracks, "xml" for the XML and srv3 ones."""
+    fmt = parse_qs(urlparse(url).query).get("fmt", [""])[0]
+    if fmt == "json3" or "json" in (content_type or ""):
+        return "json3"
+    return "xml"
+
+def iter_caption_segments(stream, fmt="xml"):
+    if fmt == "json3":
+        return iter_json3_segments(stream)
+    return iter_xml_segments(stream)
+
+def iter_xml_segments(stream):
+    """Parse XML and srv3 tracks with iterparse, dropping each element once it has been read."""
+    parents = []
+    for event, elem in ET.iterparse(stream, events=("start", "end")):
+        if event == "start":
+            parents.append(elem)
+            continue
+
+        parents.pop()
+        if elem.tag == "text":
+            start = float(elem.get("start", 0))
+            duration = float(elem.get("dur", 0))
+        elif elem.tag == "p":
+            start = int(elem.get("t", 0)) / 1000
+            duration = int(elem.get("d", 0)) / 1000
+        else:
+            continue
+
+        text = "".join(elem.itertext()).strip()
+        # Everything before this element in its parent has already been yielded
+        if parents:
+            del parents[-1][:]
+        if text:
+            yield start, duration, text
+
+def iter_json3_segments(stream, chunk_size=CHUNK_SIZE):
+    """
+    Parse json3 tracks one event at a time: skip to the "events" array, then raw_decode each
+    event object from a buffer that is refilled as needed and trimmed behind the read position.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    eof = False
+
+    def read_more():
+        nonlocal buffer, eof
+        data = stream.read(chunk_size)
+        if not data:
+            eof = True
+            buffer += utf8.decode(b"", final=True)
+        else:
+            buffer += utf8.decode(data)
+
+    while True:
+        key = buffer.find('"events"')
+        bracket = buffer.find("[", key) if key != -1 else -1
+        if bracket != -1:
+            buffer = buffer[bracket + 1:]
+            break
+        if eof:
+            return
+        if key == -1:
+            buffer = buffer[-len('"events"'):]
+        read_more()
+
+    pos = 0
+    while True:
+        while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+            pos += 1
+        if pos < len(buffer) and buffer[pos] == "]":
+            return
+
+        try:
+            if pos >= len(buffer):
+                raise json.JSONDecodeError("Incomplete event", buffer, pos)
+            event, pos = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                if pos >= len(buffer):
+                    return
+                raise
+            buffer, pos = buffer[pos:], 0
+            read_more()
+            continue
+
+        if pos > chunk_size:
+            buffer, pos = buffer[pos:], 0
+
+        text = "".join(seg.get("utf8", "") for seg in event.get("segs", [])).strip()
+        if text:
+            yield event.get("tStartMs", 0) / 1000, event.get("dDurationMs", 0) / 1000, text
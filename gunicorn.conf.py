@@ -0,0 +1,18 @@
+# Picked up automatically by gunicorn when started from the repo root.
+import os
+import shutil
+
+# Workers write their metric samples here so /metrics can merge them. Set before anything imports
+# prometheus_client, which reads it at import time.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus_multiproc")
+
+from prometheus_client import multiprocess
+
+def on_starting(server):
+    # Samples from a previous run would otherwise be merged into the new one
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+def child_exit(server, worker):
+    multiprocess.mark_process_dead(worker.pid)
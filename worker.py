@@ -0,0 +1,26 @@
+"""
+Summary job worker: runs the jobs POST /summarize queues with async=true.
+
+    python worker.py
+
+Each process runs SUMMARY_JOB_CONCURRENCY jobs at a time; start more processes to scale the
+workers separately from the web processes. On SIGTERM/SIGINT it stops taking jobs and finishes
+the ones it's running; jobs it never finished are picked up by another worker.
+"""
+import os
+import signal
+import threading
+
+# The web processes run the scheduled jobs
+os.environ.setdefault("SCHEDULER_ENABLED", "false")
+
+import app
+
+def main():
+    stop_event = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stop_event.set())
+    app.run_summary_job_worker(stop_event)
+
+if __name__ == "__main__":
+    main()